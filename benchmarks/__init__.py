@@ -0,0 +1 @@
+"""Benchmarks of schema generation, the CLI and validation (`python -m benchmarks`)."""
@@ -0,0 +1,82 @@
+"""Command line interface of the benchmarks, see `python -m benchmarks -h`."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+
+from benchmarks.run import compare, run
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument("-o", "--out", help="Write the results to this JSON file")
+    run_parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="Multiply the size of every workload (default: 1)",
+    )
+    run_parser.add_argument(
+        "--only", help="Only run benchmarks whose name matches this regex"
+    )
+    run_parser.add_argument(
+        "--compare", metavar="BASELINE", help="Compare with a previous run"
+    )
+
+    compare_parser = commands.add_parser(
+        "compare", help="Compare two runs, failing on regressions"
+    )
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+
+    for parser in (run_parser, compare_parser):
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.25,
+            help="Fail if a time grows by more than this fraction (default: 0.25)",
+        )
+        parser.add_argument(
+            "--memory-threshold",
+            type=float,
+            default=None,
+            help="Fail if a peak memory grows by more than this fraction",
+        )
+    args = arg_parser.parse_args(argv)
+
+    if args.command == "run":
+        current = run(scale=args.scale, only=args.only, log=print)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(current, f, indent=2)
+        if not args.compare:
+            return 0
+        baseline = _load(args.compare)
+    else:
+        baseline, current = _load(args.baseline), _load(args.current)
+
+    lines, regressions = compare(
+        baseline,
+        current,
+        threshold=args.threshold,
+        memory_threshold=args.memory_threshold,
+    )
+    print("\n".join(lines))
+    if regressions:
+        print(f"{len(regressions)} regressions: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
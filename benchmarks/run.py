@@ -0,0 +1,478 @@
+"""Run the benchmark suites and compare results between runs."""
+
+from __future__ import annotations
+
+import copy
+import gc
+import http.client
+import importlib.util
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import typing as t
+import urllib.parse
+
+import dc_schema
+from benchmarks.workloads import (
+    PACKAGE,
+    write_corpus,
+    write_ndjson,
+    write_package,
+    write_records,
+)
+from dc_schema import SchemaCache, get_schema, get_schema_json, get_schemas
+from dc_schema.batch import compile_batch_validator
+from dc_schema.dedupe import dedupe_schema
+from dc_schema.diff import diff_schemas
+from dc_schema.generator import generate_stream
+from dc_schema.persist import PersistentStore
+from dc_schema.scan import _version, file_name, key
+from dc_schema.validator import compile_validator
+
+SUITES = []
+
+
+def suite(f):
+    """Register a suite: a generator of `(name, measure)` pairs, where
+    `measure()` returns a result dict with `time` (seconds) and `peak` (bytes).
+    """
+    SUITES.append(f)
+    return f
+
+
+class Context:
+    def __init__(self, path: str, scale: float) -> None:
+        self.path = path
+        self.scale = scale
+        self.workloads = write_package(path, scale)
+
+
+def measure(fn, *, min_time=0.05, repeat=5):
+    """Median time per call of `fn` and the peak traced memory of one call."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+    times = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"time": statistics.median(times), "peak": peak}
+
+
+def measure_retained(fn):
+    """Time of a call of `fn`, and the traced memory it allocated that is still
+    in use while its result is alive (`retained`, bytes), and its peak.
+
+    For calls too slow to repeat, e.g. filling a cache with many schemas.
+    """
+    gc.collect()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    del result
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = fn()  # noqa: F841
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"time": elapsed, "peak": peak, "retained": retained}
+
+
+_CLI = """
+import os, sys, tracemalloc
+peak_path = os.environ.get("DC_SCHEMA_BENCH_PEAK")
+if peak_path:
+    tracemalloc.start()
+from dc_schema.cli import main
+code = main()
+if peak_path:
+    with open(peak_path, "w") as f:
+        f.write(str(tracemalloc.get_traced_memory()[1]))
+sys.exit(code)
+"""
+
+
+def _cli_env():
+    # run the dc_schema being benchmarked, even if it is not installed
+    root = os.path.dirname(os.path.dirname(dc_schema.__file__))
+    path = os.environ.get("PYTHONPATH")
+    return {**os.environ, "PYTHONPATH": f"{root}{os.pathsep}{path}" if path else root}
+
+
+def measure_cli(argv, *, cwd, repeat=3):
+    """Median wall time of running `dc_schema <argv>` and its peak traced memory.
+
+    Like `measure`, memory is traced in a separate run, so that it does not
+    slow down the timed ones.
+    """
+    env = _cli_env()
+    args = [sys.executable, "-c", _CLI, *argv]
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(args, cwd=cwd, env=env, check=True, capture_output=True)
+        times.append(time.perf_counter() - start)
+    peak_path = os.path.join(cwd, "peak")
+    subprocess.run(
+        args,
+        cwd=cwd,
+        env={**env, "DC_SCHEMA_BENCH_PEAK": peak_path},
+        check=True,
+        capture_output=True,
+    )
+    with open(peak_path) as f:
+        peak = int(f.read())
+    return {"time": statistics.median(times), "peak": peak}
+
+
+@suite
+def generation(ctx):
+    for workload in ctx.workloads:
+        dc = workload.load()
+        yield (
+            f"generate.{workload.name}",
+            lambda dc=dc: measure(lambda: get_schema(dc)),
+        )
+
+
+@suite
+def validation(ctx):
+    for workload in ctx.workloads:
+        if workload.package != PACKAGE:
+            continue
+        schema = get_schema(workload.load())
+        validator = compile_validator(schema)
+        validator(workload.payload)
+        payload = workload.payload
+        yield (
+            f"validate.compile.{workload.name}",
+            lambda schema=schema: measure(lambda: compile_validator(schema)),
+        )
+        deduped = dedupe_schema(schema).schema
+        yield (
+            f"validate.compile.dedupe.{workload.name}",
+            lambda schema=deduped: measure(lambda: compile_validator(schema)),
+        )
+        yield (
+            f"validate.{workload.name}",
+            lambda validator=validator, payload=payload: measure(
+                lambda: validator(payload)
+            ),
+        )
+
+
+@suite
+def batch(ctx):
+    # the failing rows of a batch of flat records, record by record and by
+    # column
+    dc, records = write_records(ctx.path, max(100, int(100_000 * ctx.scale)))
+    validator = compile_validator(dc)
+
+    def by_record():
+        return [i for i, record in enumerate(records) if not validator.is_valid(record)]
+
+    yield ("batch.records", lambda: measure(by_record))
+    columns = compile_batch_validator(dc, use_numpy=False)
+    yield ("batch.columns", lambda: measure(lambda: columns(records)))
+    if importlib.util.find_spec("numpy") is not None:
+        numpy_columns = compile_batch_validator(dc, use_numpy=True)
+        yield ("batch.columns.numpy", lambda: measure(lambda: numpy_columns(records)))
+
+
+@suite
+def synthetic(ctx):
+    # random valid NDJSON records: flat, nested and recursive
+    dc, _ = write_records(ctx.path, 1)
+    lines = max(100, int(10_000 * ctx.scale))
+    models = {
+        "records": dc,
+        **{w.name: w.load() for w in ctx.workloads if w.name in ("deep", "recursive")},
+    }
+    for name, model in models.items():
+        yield (
+            f"synthetic.{name}",
+            lambda model=model: measure_rate(
+                lambda: _consume(generate_stream(model, lines, seed=0)), lines
+            ),
+        )
+    yield (
+        "synthetic.records.workers",
+        lambda: measure_rate(
+            lambda: _consume(generate_stream(dc, lines, seed=0, workers=2)), lines
+        ),
+    )
+
+
+def measure_rate(fn, count):
+    """`measure(fn)` and the rate of `count` records per call (`records_per_s`)."""
+    result = measure(fn, repeat=3)
+    return {**result, "records_per_s": count / result["time"]}
+
+
+def _consume(lines):
+    for _ in lines:
+        pass
+
+
+@suite
+def cli(ctx):
+    out = os.path.join(ctx.path, "schemas")
+    yield (
+        "cli.scan",
+        lambda: measure_cli(
+            ["scan", PACKAGE, "-o", out, "-j", "1", "--force"], cwd=ctx.path
+        ),
+    )
+    (workload,) = (w for w in ctx.workloads if w.name == "deep")
+    path = os.path.join(ctx.path, "deep.ndjson")
+    write_ndjson(path, workload.payload, max(1, int(2000 * ctx.scale)))
+    yield (
+        "cli.validate",
+        lambda: measure_cli(["validate", workload.key, path, "-j", "1"], cwd=ctx.path),
+    )
+
+
+@suite
+def startup(ctx):
+    # all workloads through a new cache, as on the start of a process
+    dcs = [workload.load() for workload in ctx.workloads]
+    persist = os.path.join(ctx.path, "persist")
+    store = PersistentStore(persist, autoflush=False)
+    for dc in dcs:
+        get_schema(dc, cache=SchemaCache(persist=store))
+    store.flush()
+
+    def load():
+        cache = SchemaCache(persist=PersistentStore(persist, autoflush=False))
+        for dc in dcs:
+            get_schema(dc, cache=cache)
+
+    yield ("startup.generate", lambda: measure(lambda: [get_schema(dc) for dc in dcs]))
+    yield ("startup.persist.warm", lambda: measure(load))
+
+
+@suite
+def memory(ctx):
+    # the schemas of a corpus of models held in a cache, as in a long-running
+    # process
+    dcs = write_corpus(ctx.path, max(1, int(5000 * ctx.scale)))
+    for dc in dcs:
+        get_schema(dc)
+
+    def fill(**options):
+        cache = SchemaCache(None, **options)
+        for dc in dcs:
+            cache.get(dc)
+        return cache
+
+    yield ("memory.cache", lambda: measure_retained(lambda: fill(readonly=True)))
+    yield ("memory.cache.lean", lambda: measure_retained(lambda: fill(lean=True)))
+
+
+@suite
+def diff(ctx):
+    # a bundle of every workload, with every 50th definition changed
+    old = get_schemas([workload.load() for workload in ctx.workloads]).schema
+    new = copy.deepcopy(old)
+    for definition in list(new["$defs"].values())[::50]:
+        if "enum" in definition:
+            definition["enum"] = definition["enum"][1:]
+        else:
+            definition.setdefault("required", []).append("extra")
+            definition.setdefault("properties", {})["extra"] = {"type": "string"}
+    yield ("diff.bundle", lambda: measure(lambda: diff_schemas(old, new)))
+
+
+class _Server:
+    """`dc_schema serve` in a subprocess, started on first use."""
+
+    def __init__(self, package: str, cwd: str) -> None:
+        self.package = package
+        self.cwd = cwd
+        self.process: t.Optional[subprocess.Popen[str]] = None
+        self.address = None
+
+    def start(self):
+        if self.process is not None:
+            return
+        self.process = subprocess.Popen(
+            [sys.executable, "-c", _CLI, "serve", self.package, "--port=0", "--quiet"],
+            cwd=self.cwd,
+            env=_cli_env(),
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        line = self.process.stdout.readline()
+        url = re.search(r"http://\S+/", line)
+        if url is None:
+            self.stop()
+            raise RuntimeError(f"dc_schema serve did not start: {line!r}")
+        parsed = urllib.parse.urlsplit(url.group())
+        self.address = (parsed.hostname, parsed.port)
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+            self.process.stdout.close()
+            self.process = None
+
+
+def measure_http(server, path, headers, *, connections=4, duration=1.0):
+    """Requests per second to `GET path` over `connections` keep-alive
+    connections. The result `time` is the inverse.
+    """
+    server.start()
+    counts = [0] * connections
+    deadline = time.perf_counter() + duration
+
+    def client(i):
+        connection = http.client.HTTPConnection(*server.address)
+        try:
+            while time.perf_counter() < deadline:
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status not in (200, 304):
+                    raise RuntimeError(f"GET {path}: {response.status}")
+                counts[i] += 1
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    rps = sum(counts) / (time.perf_counter() - start)
+    return {"time": 1 / rps, "peak": 0, "rps": rps}
+
+
+@suite
+def serve(ctx):
+    server = _Server(PACKAGE, ctx.path)
+    (workload,) = (w for w in ctx.workloads if w.name == "recursive")
+    path = "/" + file_name(key(workload.load()))
+    etag = get_schema_json(workload.load()).etag
+    try:
+        for name, headers in (
+            ("serve.get", {}),
+            ("serve.get.gzip", {"Accept-Encoding": "gzip"}),
+            ("serve.not_modified", {"If-None-Match": etag}),
+        ):
+            yield (
+                name,
+                lambda headers=headers: measure_http(server, path, headers),
+            )
+    finally:
+        server.stop()
+
+
+def run(*, scale=1.0, only=None, log=None):
+    """Run the benchmarks whose name matches the regex `only` (default: all)."""
+    results = {}
+    with tempfile.TemporaryDirectory() as path:
+        ctx = Context(path, scale)
+        for f in SUITES:
+            for name, measure_ in f(ctx):
+                if only is not None and not re.search(only, name):
+                    continue
+                results[name] = measure_()
+                if log is not None:
+                    log(_format_result(name, results[name]))
+        sys.path.remove(path)
+    return {
+        "python": platform.python_version(),
+        "dc_schema": _version(),
+        "scale": scale,
+        "benchmarks": results,
+    }
+
+
+def compare(baseline, current, *, threshold=0.25, memory_threshold=None):
+    """Compare two runs. Returns report lines and the names of regressions.
+
+    A benchmark regresses when its time (or peak memory, with
+    `memory_threshold`) grew by more than the given fraction.
+    """
+    if baseline.get("scale") != current.get("scale"):
+        raise ValueError(
+            f"cannot compare runs at scale {baseline.get('scale')} and "
+            f"{current.get('scale')}"
+        )
+    lines = []
+    regressions = []
+    for name, result in current["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if base is None:
+            lines.append(f"{name:<32} {'(new)':>12} {_format_time(result['time'])}")
+            continue
+        time_change = result["time"] / base["time"] - 1
+        peak_change = result["peak"] / base["peak"] - 1 if base["peak"] else 0.0
+        regressed = time_change > threshold or (
+            memory_threshold is not None and peak_change > memory_threshold
+        )
+        if regressed:
+            regressions.append(name)
+        lines.append(
+            f"{name:<32} {_format_time(base['time'])} -> "
+            f"{_format_time(result['time'])} ({time_change:+7.1%})  "
+            f"peak {_format_bytes(result['peak'])} ({peak_change:+7.1%})"
+            + ("  REGRESSION" if regressed else "")
+        )
+    return lines, regressions
+
+
+def _format_result(name, result):
+    line = (
+        f"{name:<32} {_format_time(result['time'])}  "
+        f"peak {_format_bytes(result['peak'])}"
+    )
+    if "retained" in result:
+        line += f"  retained {_format_bytes(result['retained'])}"
+    if "rps" in result:
+        line += f"  {result['rps']:.0f} requests/s"
+    if "records_per_s" in result:
+        line += f"  {result['records_per_s']:.0f} records/s"
+    return line
+
+
+def _format_time(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.2f}{unit:<2}"
+    return f"{seconds / 1e-9:8.2f}ns"
+
+
+def _format_bytes(n):
+    for unit in ("B", "KiB", "MiB"):
+        if n < 1024:
+            return f"{n:7.1f}{unit}"
+        n /= 1024
+    return f"{n:7.1f}GiB"
@@ -0,0 +1,332 @@
+"""Synthetic dataclass workloads, written out as an importable package.
+
+Each workload is a module of generated source (so that forward references,
+recursion and the CLI work like they do for real models) and a sample
+payload matching the schema of its root dataclass.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import importlib
+import json
+import os
+import sys
+
+PACKAGE = "dc_schema_bench_models"
+# workloads that only make sense for schema generation, kept out of `PACKAGE`
+# so that scanning and validating it stay comparable between runs
+GENERATION_PACKAGE = "dc_schema_bench_generation"
+
+HEADER = """\
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import enum
+import typing as t
+
+from dc_schema import SchemaAnnotation
+"""
+
+
+@dataclasses.dataclass
+class Workload:
+    name: str
+    root: str
+    source: str
+    payload: object
+    package: str = PACKAGE
+
+    @property
+    def key(self):
+        return f"{self.package}.{self.name}:{self.root}"
+
+    def load(self):
+        module = importlib.import_module(f"{self.package}.{self.name}")
+        return getattr(module, self.root)
+
+
+def write_package(path, scale=1.0):
+    """Write the workloads package into the directory `path` and return them.
+
+    `scale` multiplies the size of every workload.
+    """
+    workloads = [
+        wide(int(2000 * scale)),
+        deep(max(2, int(100 * scale))),
+        recursive(max(2, int(50 * scale))),
+        enums(int(5000 * scale)),
+        unions(int(500 * scale)),
+        chain(max(2, int(2000 * scale))),
+    ]
+    for package in (PACKAGE, GENERATION_PACKAGE):
+        package_dir = os.path.join(path, package)
+        os.makedirs(package_dir, exist_ok=True)
+        with open(os.path.join(package_dir, "__init__.py"), "w"):
+            pass
+    for workload in workloads:
+        module_path = os.path.join(path, workload.package, f"{workload.name}.py")
+        with open(module_path, "w") as f:
+            f.write(workload.source)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    for name in list(sys.modules):
+        if name.partition(".")[0] in (PACKAGE, GENERATION_PACKAGE):
+            del sys.modules[name]
+    importlib.invalidate_caches()
+    return workloads
+
+
+_WIDE_FIELDS = [
+    ("int", 1),
+    ("str", "x"),
+    ("t.Optional[float]", None),
+    ("list[int]", [1, 2, 3]),
+    ("t.Annotated[int, SchemaAnnotation(minimum=0, maximum=100)]", 5),
+    ("datetime.date", "2020-01-02"),
+    ("dict[str, str]", {"a": "b"}),
+    ("tuple[int, str]", [1, "a"]),
+]
+
+
+def wide(n):
+    """A single dataclass with `n` fields."""
+    lines = [HEADER, "", "@dataclasses.dataclass", "class Wide:"]
+    payload = {}
+    for i in range(n):
+        type_, value = _WIDE_FIELDS[i % len(_WIDE_FIELDS)]
+        lines.append(f"    f{i}: {type_}")
+        payload[f"f{i}"] = value
+    return Workload("wide", "Wide", "\n".join(lines) + "\n", payload)
+
+
+def deep(n):
+    """A chain of `n` dataclasses, each nesting the next."""
+    lines = [HEADER]
+    for i in range(n):
+        lines += ["", "@dataclasses.dataclass", f"class Deep{i}:", "    value: int"]
+        if i < n - 1:
+            lines.append(f"    child: t.Optional[Deep{i + 1}] = None")
+    payload = {"value": n - 1}
+    for i in reversed(range(n - 1)):
+        payload = {"value": i, "child": payload}
+    return Workload("deep", "Deep0", "\n".join(lines) + "\n", payload)
+
+
+def recursive(n):
+    """A self-referencing tree and a cycle of `n` mutually referencing classes."""
+    lines = [
+        HEADER,
+        "",
+        "@dataclasses.dataclass",
+        "class Tree:",
+        "    value: int",
+        "    children: list[Tree]",
+    ]
+    for i in range(n):
+        lines += [
+            "",
+            "@dataclasses.dataclass",
+            f"class Cycle{i}:",
+            "    value: int",
+            f"    next: t.Optional[Cycle{(i + 1) % n}] = None",
+            f"    same: t.Optional[Cycle{i}] = None",
+        ]
+    lines += [
+        "",
+        "@dataclasses.dataclass",
+        "class Recursive:",
+        "    tree: Tree",
+        "    cycle: Cycle0",
+        "    parent: t.Optional[Recursive] = None",
+    ]
+
+    def tree(depth):
+        children = [tree(depth - 1) for _ in range(3)] if depth else []
+        return {"value": depth, "children": children}
+
+    cycle = {"value": n}
+    for i in range(n):
+        cycle = {"value": i, "next": cycle, "same": {"value": i}}
+    payload = {"tree": tree(6), "cycle": cycle, "parent": None}
+    return Workload("recursive", "Recursive", "\n".join(lines) + "\n", payload)
+
+
+def enums(n):
+    """An enum and a `Literal` with `n` values each."""
+    members = "".join(f"    V{i} = 'v{i}'\n" for i in range(n))
+    literal = ", ".join(f"'l{i}'" for i in range(n))
+    source = (
+        f"{HEADER}\n\nclass Big(enum.Enum):\n{members}\n\n"
+        "@dataclasses.dataclass\n"
+        "class Enums:\n"
+        "    big: Big\n"
+        f"    lit: t.Literal[{literal}]\n"
+        "    bigs: list[Big]\n"
+        "    lits: dict[str, t.Optional[Big]]\n"
+    )
+    payload = {
+        "big": f"v{n - 1}",
+        "lit": f"l{n - 1}",
+        "bigs": [f"v{i}" for i in range(0, n, max(1, n // 100))],
+        "lits": {"a": None, "b": "v0"},
+    }
+    return Workload("enums", "Enums", source, payload)
+
+
+def unions(n):
+    """`n` fields of unions of annotated types."""
+    union = (
+        "t.Union[int, str, t.Annotated[float, SchemaAnnotation(minimum=0)], Leaf, None]"
+    )
+    nested = (
+        "t.Annotated[t.Optional[list[t.Annotated[int, SchemaAnnotation(minimum=0)]]], "
+        "SchemaAnnotation(description='nested')]"
+    )
+    lines = [
+        HEADER,
+        "",
+        "@dataclasses.dataclass",
+        "class Leaf:",
+        "    a: int",
+        "    b: t.Annotated[str, SchemaAnnotation(min_length=1, max_length=10)]",
+        "",
+        "@dataclasses.dataclass",
+        "class Unions:",
+    ]
+    values = [1, "x", 1.5, {"a": 1, "b": "leaf"}, None]
+    payload = {}
+    for i in range(n):
+        if i % 2:
+            lines.append(f"    f{i}: {nested}")
+            payload[f"f{i}"] = [1, 2, 3]
+        else:
+            lines.append(f"    f{i}: {union}")
+            payload[f"f{i}"] = values[i // 2 % len(values)]
+    return Workload("unions", "Unions", "\n".join(lines) + "\n", payload)
+
+
+def chain(n):
+    """A chain of `n` dataclasses, far deeper than the Python recursion limit.
+
+    Only used to benchmark schema generation.
+    """
+    lines = [HEADER]
+    empty = "dataclasses.field(default_factory=list)"
+    for i in range(n):
+        lines += ["", "@dataclasses.dataclass", f"class Chain{i}:", "    value: int"]
+        if i < n - 1:
+            lines += [
+                f"    child: t.Optional[Chain{i + 1}] = None",
+                f"    children: list[Chain{i + 1}] = {empty}",
+            ]
+    return Workload(
+        "chain", "Chain0", "\n".join(lines) + "\n", None, GENERATION_PACKAGE
+    )
+
+
+_CORPUS_FIELDS = [
+    "str",
+    "int",
+    "t.Optional[str] = None",
+    "list[str] = dataclasses.field(default_factory=list)",
+    "t.Annotated[int, SchemaAnnotation(minimum=0)]",
+    "t.Annotated[str, SchemaAnnotation(min_length=1, max_length=255)]",
+    "datetime.datetime",
+    "Status = Status.ACTIVE",
+    "t.Literal['a', 'b', 'c'] = 'a'",
+    "dict[str, float] = dataclasses.field(default_factory=dict)",
+    "bool = False",
+    "t.Optional[float] = None",
+]
+
+
+def write_corpus(path, n):
+    """Write `n` dataclasses of 6 to 12 common fields, each also referencing an
+    earlier one, as a module of the generation package, and return them.
+
+    Call after `write_package`. Used to measure the memory of many schemas.
+    """
+    lines = [
+        HEADER,
+        "",
+        "class Status(enum.Enum):",
+        "    ACTIVE = 'active'",
+        "    INACTIVE = 'inactive'",
+    ]
+    for i in range(n):
+        lines += ["", "@dataclasses.dataclass", f"class Model{i}:"]
+        fields = [
+            (f"f{j}", _CORPUS_FIELDS[(i + j) % len(_CORPUS_FIELDS)])
+            for j in range(6 + i % 7)
+        ]
+        # fields without a default first
+        fields.sort(key=lambda field: " = " in field[1])
+        lines += [f"    {name}: {type_}" for name, type_ in fields]
+        if i:
+            lines.append(f"    parent: t.Optional[Model{(i * 7) % i}] = None")
+    module_path = os.path.join(path, GENERATION_PACKAGE, "corpus.py")
+    with open(module_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    sys.modules.pop(f"{GENERATION_PACKAGE}.corpus", None)
+    importlib.invalidate_caches()
+    module = importlib.import_module(f"{GENERATION_PACKAGE}.corpus")
+    return [getattr(module, f"Model{i}") for i in range(n)]
+
+
+_RECORD = """
+@dataclasses.dataclass
+class Record:
+    id: t.Annotated[int, SchemaAnnotation(minimum=1)]
+    name: t.Annotated[str, SchemaAnnotation(min_length=1, max_length=32)]
+    code: t.Annotated[str, SchemaAnnotation(pattern=r"^[A-Z]{3}$")]
+    price: t.Annotated[float, SchemaAnnotation(exclusive_minimum=0, multiple_of=0.25)]
+    quantity: t.Annotated[int, SchemaAnnotation(minimum=0, maximum=1000)]
+    status: Status
+    note: t.Optional[str] = None
+    kind: t.Literal["a", "b", "c"] = "a"
+"""
+
+
+def write_records(path, n):
+    """Write a flat `Record` dataclass of constrained fields as a module of the
+    generation package, and return it and `n` records of it, every 100th of
+    them invalid.
+
+    Call after `write_package`. Used to measure batch validation.
+    """
+    lines = [
+        HEADER,
+        "",
+        "class Status(enum.Enum):",
+        "    NEW = 'new'",
+        "    DONE = 'done'",
+    ]
+    module_path = os.path.join(path, GENERATION_PACKAGE, "records.py")
+    with open(module_path, "w") as f:
+        f.write("\n".join(lines) + "\n" + _RECORD)
+    sys.modules.pop(f"{GENERATION_PACKAGE}.records", None)
+    importlib.invalidate_caches()
+    module = importlib.import_module(f"{GENERATION_PACKAGE}.records")
+    records = []
+    for i in range(n):
+        record = {
+            "id": i + 1,
+            "name": f"item {i}",
+            "code": "ABC",
+            "price": (i % 40 + 1) / 4,
+            "quantity": i % 1001,
+            "status": "new" if i % 2 else "done",
+            "note": None if i % 3 else "x",
+            "kind": "abc"[i % 3],
+        }
+        if i % 100 == 99:
+            record["quantity"] = -1
+        records.append(record)
+    return module.Record, records
+
+
+def write_ndjson(path, payload, lines):
+    with open(path, "w") as f:
+        f.write((json.dumps(payload) + "\n") * lines)
@@ -1,16 +1,145 @@
 from __future__ import annotations
 
+import contextlib
 import dataclasses
 import datetime
 import enum
+import hashlib
+import inspect
+import itertools
+import json
 import numbers
+import os
+import sys
+import threading
+import types
 import typing as t
+import urllib.parse
+import weakref
+
+from dc_schema.budget import Budget, _Tracker, check_budget
+from dc_schema.dedupe import dedupe_schema
+from dc_schema.hints import type_hints
+
+if t.TYPE_CHECKING:
+    from dc_schema.persist import PersistentStore
 
 _MISSING = dataclasses.MISSING
 
 
-def get_schema(dc):
-    return _GetSchema()(dc)
+def get_schema(
+    dc,
+    *,
+    cache=None,
+    store=None,
+    registry=None,
+    observer=None,
+    dedupe=False,
+    budget=None,
+):
+    if cache is not None:
+        _check_cache_options(store=store, registry=registry, observer=observer)
+        schema = cache.get(dc)
+        if budget is not None:
+            check_budget(schema, budget)
+        return dedupe_schema(schema).schema if dedupe and not cache.dedupe else schema
+    schema = _GetSchema(store, registry, observer=observer, budget=budget)(dc)
+    return dedupe_schema(schema).schema if dedupe else schema
+
+
+def get_schema_json(dc, *, cache=None, store=None, registry=None, dedupe=False):
+    """The canonical JSON encodings of the schema of `dc`, see `SchemaJSON`.
+
+    With a `cache` the encodings are cached along with the schema.
+    """
+    if cache is not None:
+        _check_cache_options(store=store, registry=registry)
+        if cache.dedupe or not dedupe:
+            return cache.get_json(dc)
+    schema = get_schema(dc, cache=cache, store=store, registry=registry, dedupe=dedupe)
+    return SchemaJSON.from_schema(schema)
+
+
+def _check_cache_options(**options):
+    # cached schemas are keyed by dataclass only, so the options generating
+    # them belong to the cache
+    given = [name for name, value in options.items() if value is not None]
+    if given:
+        raise TypeError(
+            f"{', '.join(given)} cannot be combined with cache; "
+            "pass them to SchemaCache instead"
+        )
+
+
+def dumps_schema(schema, *, compact=False, canonical=False):
+    """Serialize `schema` to a JSON string.
+
+    Indented by default, or without any whitespace with `compact=True`. With
+    `canonical=True` keys are sorted, so that equal schemas serialize to the
+    same string whatever order their keys were generated in.
+    """
+    if compact:
+        return json.dumps(schema, sort_keys=canonical, separators=(",", ":"))
+    return json.dumps(schema, sort_keys=canonical, indent=2)
+
+
+def get_schemas(dcs, *, registry=None, observer=None, dedupe=False, budget=None):
+    walker = _GetSchema(
+        registry=registry,
+        def_names=_DefNames(qualified=True),
+        observer=observer,
+        budget=budget,
+    )
+    bundle = walker.bundle(dcs)
+    if dedupe:
+        return SchemaBundle(dedupe_schema(bundle.schema).schema, bundle.refs)
+    return bundle
+
+
+def get_split_schema(
+    dc, *, base_uri="", qualified=False, registry=None, observer=None, dedupe=False
+):
+    """The schema of `dc` as one document per definition, see `SplitSchema`.
+
+    Documents are named after their `$defs` names, `<name>.json`, or after the
+    module and qualified name of their type with `qualified=True`, which keeps
+    the names of shared definitions the same across root dataclasses. Each
+    document's `$id` is its name resolved against `base_uri`.
+    """
+    walker = _GetSchema(
+        registry=registry,
+        def_names=_DefNames(qualified=qualified),
+        observer=observer,
+    )
+    defs = walker.bundle([dc]).schema["$defs"]
+    files = {name: f"{name}.json" for name in defs}
+    root = files[walker.def_name(dc)]
+    documents = {}
+    for name in sorted(defs, key=lambda name: files[name] != root):
+        schema = _external_refs(defs[name], files)
+        if dedupe:
+            schema = dedupe_schema(schema).schema
+        documents[files[name]] = {
+            "$schema": "https://json-schema.org/draft/2020-12/schema",
+            "$id": urllib.parse.urljoin(base_uri, urllib.parse.quote(files[name])),
+            **schema,
+        }
+    return SplitSchema(root, documents)
+
+
+def _external_refs(schema, files):
+    # replace `#/$defs/<name>` references with relative references to files
+    stack = [schema]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            ref = value.get("$ref")
+            if isinstance(ref, str) and ref.startswith("#/$defs/"):
+                value["$ref"] = urllib.parse.quote(files[ref[len("#/$defs/") :]])
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+    return schema
 
 
 _Format = t.Literal[
@@ -32,6 +161,31 @@ _Format = t.Literal[
 ]
 
 
+def _slotted(cls):
+    """`dataclass(slots=True)` (Python 3.10+) for a frozen dataclass: instances
+    without a `__dict__`.
+    """
+    names = tuple(field.name for field in dataclasses.fields(cls))
+
+    def __getstate__(self):
+        return [getattr(self, name) for name in names]
+
+    def __setstate__(self, state):
+        for name, value in zip(names, state):
+            object.__setattr__(self, name, value)
+
+    namespace = {
+        k: v
+        for k, v in vars(cls).items()
+        if k not in names and k not in ("__dict__", "__weakref__")
+    }
+    namespace.update(
+        __slots__=names, __getstate__=__getstate__, __setstate__=__setstate__
+    )
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+@_slotted
 @dataclasses.dataclass(frozen=True)
 class SchemaAnnotation:
     title: t.Optional[str] = None
@@ -54,7 +208,17 @@ class SchemaAnnotation:
     additional_properties: t.Optional[bool] = None
 
     def schema(self):
-        key_map = {
+        return {
+            key: _copy_schema(value)
+            for name, key in _ANNOTATION_KEYWORDS
+            if (value := getattr(self, name)) is not None
+        }
+
+
+_ANNOTATION_KEYWORDS = tuple(
+    (
+        field.name,
+        {
             "min_length": "minLength",
             "max_length": "maxLength",
             "exclusive_minimum": "exclusiveMinimum",
@@ -65,46 +229,979 @@ class SchemaAnnotation:
             "unique_items": "uniqueItems",
             "additional_properties": "additionalProperties",
             "pattern_properties": "patternProperties",
-        }
-        return {
-            key_map.get(k, k): v
-            for k, v in dataclasses.asdict(self).items()
-            if v is not None
-        }
+        }.get(field.name, field.name),
+    )
+    for field in dataclasses.fields(SchemaAnnotation)
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class SchemaJSON:
+    """Canonical (sorted keys, ASCII) JSON encodings of a schema.
+
+    `compact` has no whitespace, `pretty` is indented. `etag` is a strong HTTP
+    entity tag derived from the SHA-256 of `compact`, so it only changes when
+    the schema does.
+    """
+
+    compact: bytes
+    pretty: bytes
+    digest: str
+
+    @classmethod
+    def from_schema(cls, schema: dict) -> SchemaJSON:
+        compact = dumps_schema(schema, compact=True, canonical=True).encode()
+        pretty = dumps_schema(schema, canonical=True).encode()
+        return cls(compact, pretty, hashlib.sha256(compact).hexdigest())
+
+    @property
+    def etag(self):
+        return f'"{self.digest}"'
+
+
+@dataclasses.dataclass(frozen=True)
+class CacheInfo:
+    hits: int
+    misses: int
+    maxsize: t.Optional[int]
+    currsize: int
+
+
+class SchemaCache:
+    """LRU cache of generated schemas, keyed weakly by dataclass.
+
+    Entries are dropped when their dataclass is garbage collected. With
+    `readonly=False` (the default) every read returns a fresh copy of the cached
+    schema; with `readonly=True` the cached schema itself is returned, frozen so
+    that callers cannot corrupt it. With `dedupe=True` the cached schemas are
+    deduplicated (see `dedupe_schema`). `get_json` returns the canonical JSON
+    encodings of a schema, which are computed once and cached with it. With a
+    `persist` store (see `dc_schema.persist.PersistentStore`) schemas missing
+    from the cache are loaded from disk if possible, and generated ones saved.
+    Schemas are generated with the type handlers of `registry` (by default
+    those registered with `register_type_handler`) and the fragments of
+    `store`, if given. With `lean=True` cached schemas are read-only, as with
+    `readonly=True`, and
+    equal subschemas and values are stored once and shared by all schemas in
+    the cache (see `SchemaInterner`), which keeps large numbers of cached
+    schemas small.
+
+    The cache is safe to share between threads. Reading a cached schema takes
+    no lock; if several threads ask for a missing schema at once, one of them
+    generates it and the others wait for it. Eviction approximates LRU (a
+    "second chance" clock), and `hits` may undercount under contention.
+    """
+
+    def __init__(
+        self,
+        maxsize: t.Optional[int] = 256,
+        *,
+        readonly: bool = False,
+        store: t.Optional[FragmentStore] = None,
+        dedupe: bool = False,
+        persist: t.Optional[PersistentStore] = None,
+        lean: bool = False,
+        registry: t.Optional[TypeRegistry] = None,
+    ) -> None:
+        if maxsize is not None and maxsize < 0:
+            raise ValueError("maxsize must be None or >= 0")
+        self.maxsize = maxsize
+        self.readonly = readonly or lean
+        self.interner = SchemaInterner() if lean else None
+        self.store = store
+        self.registry = registry
+        self.dedupe = dedupe
+        self.persist = persist
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[weakref.ref, _CacheEntry] = {}
+        self._pending: dict[weakref.ref, _Pending] = {}
+        # reentrant: the weakref callback can run while the lock is held
+        self._lock = threading.RLock()
+
+        self_ref = weakref.ref(self)
+
+        def remove(key):
+            cache = self_ref()
+            if cache is not None:
+                with cache._lock:
+                    cache._entries.pop(key, None)
+
+        self._remove = remove
+
+    def get(self, dc):
+        schema = self._entry(dc).schema
+        return schema if self.readonly else _copy_schema(schema)
+
+    def get_json(self, dc):
+        entry = self._entry(dc)
+        if entry.json is None:
+            entry.json = SchemaJSON.from_schema(entry.schema)
+        return entry.json
+
+    def invalidate(self, dc):
+        with self._lock:
+            self._entries.pop(weakref.ref(dc), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def __contains__(self, dc: type) -> bool:
+        return weakref.ref(dc) in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _entry(self, dc):
+        key = weakref.ref(dc)
+        entry = self._entries.get(key)
+        if entry is None:
+            return self._miss(dc, key)
+        self.hits += 1
+        entry.used = True
+        return entry
+
+    def _miss(self, dc, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                entry.used = True
+                return entry
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[key] = _Pending()
+                self.misses += 1
+        if not owner:
+            if pending.thread == threading.get_ident():
+                # a handler generating this schema asked for it again
+                return _CacheEntry(self._freeze(self._generate(dc)))
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            if pending.entry is None:
+                # the generating thread was interrupted
+                return self._entry(dc)
+            return pending.entry
+
+        entry = None
+        try:
+            entry = _CacheEntry(self._freeze(self._generate(dc)))
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                if entry is not None:
+                    self._put(dc, entry)
+                del self._pending[key]
+            pending.entry = entry
+            pending.done.set()
+        return entry
+
+    def _generate(self, dc):
+        if self.persist is not None:
+            schema = self.persist.load(dc, dedupe=self.dedupe)
+            if schema is not None:
+                return schema
+        schema = _GetSchema(self.store, self.registry)(dc)
+        if self.dedupe:
+            schema = dedupe_schema(schema).schema
+        if self.persist is not None:
+            self.persist.save(dc, schema, dedupe=self.dedupe)
+        return schema
+
+    def _freeze(self, schema):
+        if self.interner is not None:
+            return self.interner.intern(schema)
+        return _freeze_schema(schema) if self.readonly else schema
+
+    def _put(self, dc, entry):
+        # called with the lock held
+        if self.maxsize == 0:
+            return
+        self._entries[weakref.ref(dc, self._remove)] = entry
+        while self.maxsize is not None and len(self._entries) > self.maxsize:
+            key = next(iter(self._entries))
+            oldest = self._entries.pop(key)
+            if oldest.used:
+                # used since it was last looked at: give it another round
+                oldest.used = False
+                self._entries[key] = oldest
+
+
+class _CacheEntry:
+    __slots__ = ("json", "schema", "used")
+
+    def __init__(self, schema: dict) -> None:
+        self.schema = schema
+        self.json: t.Optional[SchemaJSON] = None
+        self.used = False
+
+
+class _Pending:
+    """A schema being generated by `thread`."""
+
+    __slots__ = ("done", "entry", "error", "thread")
+
+    def __init__(self) -> None:
+        self.thread = threading.get_ident()
+        self.done = threading.Event()
+        self.entry: t.Optional[_CacheEntry] = None
+        self.error: t.Optional[BaseException] = None
+
+
+class _FrozenDict(dict):
+    __slots__ = ("__weakref__",)
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("cached schemas are read-only")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+    __ior__ = _readonly
+
+    def __copy__(self) -> dict:
+        return dict(self)
+
+    def __reduce__(self) -> tuple:
+        return _FrozenDict, (dict(self),)
+
+    def __deepcopy__(self, memo: dict) -> dict:
+        return t.cast(dict, _copy_schema(self))
+
+
+class _FrozenList(list):
+    __slots__ = ("__weakref__",)
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("cached schemas are read-only")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = clear = extend = insert = pop = remove = reverse = sort = _readonly
+
+    def __copy__(self) -> list:
+        return list(self)
+
+    def __reduce__(self) -> tuple:
+        return _FrozenList, (list(self),)
+
+    def __deepcopy__(self, memo: dict) -> list:
+        return t.cast(list, _copy_schema(self))
+
+
+def _copy_schema(value):
+    # Top down, with an explicit stack as schemas can be arbitrarily deep:
+    # every container is copied shallowly, then its items are replaced by
+    # copies in place.
+    if isinstance(value, dict):
+        value = dict(value)
+    elif isinstance(value, list):
+        value = list(value)
+    else:
+        return value
+    stack = [value]
+    while stack:
+        container = stack.pop()
+        items = (
+            container.items() if isinstance(container, dict) else enumerate(container)
+        )
+        for k, v in items:
+            if isinstance(v, dict):
+                v = container[k] = dict(v)
+                stack.append(v)
+            elif isinstance(v, list):
+                v = container[k] = list(v)
+                stack.append(v)
+    return value
+
+
+def _freeze_schema(value):
+    return _rebuild_schema(value, _FrozenDict, _FrozenList)
+
+
+def _rebuild_schema(value, make_dict, make_list, leaf=None):
+    """Rebuild the containers of `value` bottom up, without recursion.
+
+    `make_dict` is called with the `(key, value)` pairs of a dict and
+    `make_list` with the items of a list, both already rebuilt, and `leaf`
+    (if given) with any other value.
+    """
+    results = []
+    stack = [(value, False)]
+    while stack:
+        value, built = stack.pop()
+        if built:
+            # the children are the last `len(value)` results
+            start = len(results) - len(value)
+            items = results[start:]
+            del results[start:]
+            if isinstance(value, dict):
+                results.append(make_dict(zip(value, items)))
+            else:
+                results.append(make_list(items))
+        elif isinstance(value, dict):
+            stack.append((value, True))
+            stack.extend((v, False) for v in reversed(value.values()))
+        elif isinstance(value, list):
+            stack.append((value, True))
+            stack.extend((v, False) for v in reversed(value))
+        else:
+            results.append(value if leaf is None else leaf(value))
+    return results[0]
+
+
+class SchemaInterner:
+    """Stores equal schema values once.
+
+    `intern(schema)` returns a read-only copy of `schema` (see
+    `SchemaCache(readonly=True)`) made of shared parts: every dict or list
+    equal to one in a schema interned before is that same object, and strings
+    are interned with `sys.intern`. Shared parts are held weakly, for as long
+    as some interned schema uses them. An interner can be shared between
+    threads.
+    """
+
+    def __init__(self) -> None:
+        self._values: weakref.WeakValueDictionary[tuple, t.Any] = (
+            weakref.WeakValueDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def intern(self, schema):
+        with self._lock:
+            return _rebuild_schema(
+                schema, self._intern_dict, self._intern_list, self._intern_leaf
+            )
+
+    # Containers are keyed by their items, with the (already interned)
+    # containers they hold referred to by identity.
+
+    def _intern_dict(self, items):
+        items = [(sys.intern(k), v) for k, v in items]
+        key = (
+            dict,
+            *itertools.chain.from_iterable((k, _intern_key(v)) for k, v in items),
+        )
+        return self._shared(key, _FrozenDict, items)
+
+    def _intern_list(self, items):
+        return self._shared((list, *map(_intern_key, items)), _FrozenList, items)
+
+    @staticmethod
+    def _intern_leaf(value: t.Any) -> t.Any:
+        return sys.intern(value) if isinstance(value, str) else value
+
+    def _shared(self, key, frozen, items):
+        shared = self._values.get(key)
+        if shared is None:
+            shared = self._values[key] = frozen(items)
+        return shared
+
+
+def _intern_key(value):
+    if isinstance(value, (dict, list)):
+        return id(value)
+    try:
+        hash(value)
+    except TypeError:
+        # not JSON, never shared
+        return (object, id(value))
+    # `True == 1`, but is not the same JSON value
+    return (type(value), value)
+
+
+schema_cache = SchemaCache()
+
+
+class TypeRegistry:
+    """Maps field types to the handlers that generate their schema.
+
+    A handler is called as `handler(walker, type_, default, annotation)` and
+    returns the schema for `type_`, merged with `annotation.schema()`. `default`
+    is the field default or `dataclasses.MISSING`. Nested types are generated
+    with `walker.get_field_schema(type_, default, annotation)`, or, to keep the
+    walk off the Python stack for deeply nested models, by making the handler
+    a generator that yields `(type_, default, annotation)` and receives the
+    schema back.
+
+    Generic aliases are looked up by their origin (`list[int]` -> `list`).
+    Handlers registered with `subclasses=True` also apply to subclasses of the
+    registered type, following the MRO (and `issubclass` for ABCs such as
+    `numbers.Number`). Resolved handlers are cached per type.
+    """
+
+    def __init__(
+        self, dataclass_handler: t.Optional[t.Callable[..., t.Any]] = None
+    ) -> None:
+        self.dataclass_handler = dataclass_handler
+        self._handlers: dict[t.Any, t.Callable[..., t.Any]] = {}
+        self._subclass_handlers: dict[type, t.Callable[..., t.Any]] = {}
+        self._resolved: weakref.WeakKeyDictionary[t.Any, t.Callable[..., t.Any]] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def register(self, type_, handler=None, *, subclasses=True):
+        if handler is None:
+
+            def decorator(handler):
+                self.register(type_, handler, subclasses=subclasses)
+                return handler
+
+            return decorator
+
+        with self._lock:
+            self._handlers[type_] = handler
+            if subclasses and isinstance(type_, type):
+                self._subclass_handlers[type_] = handler
+            else:
+                self._subclass_handlers.pop(type_, None)
+            self._resolved.clear()
+            self._version += 1
+        return handler
+
+    def copy(self):
+        registry = TypeRegistry(self.dataclass_handler)
+        registry._handlers.update(self._handlers)
+        registry._subclass_handlers.update(self._subclass_handlers)
+        return registry
+
+    def resolve(self, type_):
+        try:
+            return self._resolved[type_]
+        except (KeyError, TypeError):
+            pass
+        version = self._version
+        handler = self._lookup(type_)
+        # Types which are not hashable or cannot be weakly referenced (e.g.
+        # `None`, or `Annotated` with unhashable metadata) are not cached, nor
+        # are handlers looked up while another one was registered.
+        with self._lock, contextlib.suppress(TypeError):
+            if version == self._version:
+                self._resolved[type_] = handler
+        return handler
+
+    def _lookup(self, type_):
+        origin = t.get_origin(type_)
+        key = type_ if origin is None else origin
+        handler = self._handlers.get(key)
+        if handler is not None:
+            return handler
+        if isinstance(key, type):
+            if self.dataclass_handler is not None and dataclasses.is_dataclass(key):
+                return self.dataclass_handler
+            for base in key.__mro__[1:]:
+                if base in self._subclass_handlers:
+                    return self._subclass_handlers[base]
+            for base, handler in self._subclass_handlers.items():
+                if issubclass(key, base):
+                    return handler
+        raise NotImplementedError(f"field type '{type_}' not implemented")
+
+
+@dataclasses.dataclass(frozen=True)
+class SchemaBundle:
+    """Schemas for several dataclasses sharing a single `$defs`.
+
+    `schema` holds every definition; `refs` maps each requested dataclass to a
+    `$ref` into it.
+    """
+
+    schema: dict
+    refs: dict
+
+
+@dataclasses.dataclass(frozen=True)
+class SplitSchema:
+    """A schema split into documents that reference each other.
+
+    `documents` maps file names to schemas, every definition having its own
+    document with a relative external `$ref` (e.g. `{"$ref": "Other.json"}`)
+    wherever it is used, so documents can be loaded and cached independently.
+    `root` is the name of the document of the dataclass itself.
+    """
+
+    root: str
+    documents: dict
+
+    def write(self, out_dir, *, compact=False, canonical=False):
+        """Write the documents into `out_dir`, see `dumps_schema`."""
+        os.makedirs(out_dir, exist_ok=True)
+        for name, schema in self.documents.items():
+            with open(os.path.join(out_dir, name), "w") as f:
+                f.write(dumps_schema(schema, compact=compact, canonical=canonical))
+
+
+class _DefNames:
+    """Assigns collision-free `$defs` names to types.
+
+    By default a type is named after its `__name__`, falling back to its
+    qualified name if that is already taken by another type. With
+    `qualified=True` the qualified name is always used.
+    """
+
+    def __init__(self, qualified: bool = False) -> None:
+        self.qualified = qualified
+        self.names: dict[type, str] = {}
+        self.taken: set[str] = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, type_: type) -> str:
+        try:
+            return self.names[type_]
+        except KeyError:
+            pass
+        with self._lock:
+            return self.names.get(type_) or self._assign(type_)
+
+    def _assign(self, type_):
+        qualname = f"{type_.__module__}.{type_.__qualname__}".replace("<locals>.", "")
+        name = (
+            qualname
+            if self.qualified or type_.__name__ in self.taken
+            else type_.__name__
+        )
+        if name in self.taken:
+            name = next(
+                f"{qualname}_{i}"
+                for i in itertools.count(2)
+                if f"{qualname}_{i}" not in self.taken
+            )
+        self.names[type_] = name
+        self.taken.add(name)
+        return name
+
+
+class FragmentStore:
+    """Shared store of `$defs` fragments, reused across `get_schema` calls.
+
+    Every dataclass and enum definition built during a walk is recorded once,
+    together with the definitions it references. Later walks copy the recorded
+    fragments into their `$defs` instead of walking the types again. The store
+    can be shared by walks in several threads.
+
+    Fragments depend on the type handlers that generated them, so a store is
+    bound to one `TypeRegistry`: `registry`, or that of the first walk using
+    it. Walks with another registry raise a `ValueError`.
+    """
+
+    def __init__(self, registry: t.Optional[TypeRegistry] = None) -> None:
+        self.registry = registry
+        self.def_names = _DefNames()
+        self._fragments: dict[type, _Fragment] = {}
+        self._closures: dict[type, dict[type, _Fragment]] = {}
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, type_: type) -> bool:
+        return type_ in self._fragments
+
+    def bind(self, registry):
+        """Check that the fragments of this store are generated by `registry`."""
+        if self.registry is None:
+            with self._lock:
+                if self.registry is None:
+                    self.registry = registry
+        if self.registry is not registry:
+            raise ValueError(
+                "this FragmentStore holds fragments generated with another "
+                "TypeRegistry"
+            )
+
+    def __len__(self) -> int:
+        return len(self._fragments)
+
+    def get(self, type_):
+        return self._fragments.get(type_)
+
+    def add(self, type_, name, schema, deps):
+        if type_ not in self._fragments:
+            fragment = _Fragment(name, _copy_schema(schema), deps)
+            with self._lock:
+                self._fragments.setdefault(type_, fragment)
+
+    def invalidate(self, type_):
+        with self._lock:
+            self._fragments.pop(type_, None)
+            self._closures.clear()
+            self._version += 1
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+            self._closures.clear()
+            self._version += 1
+
+    def closure(self, type_):
+        """The fragments of all types `type_` depends on, by type, or None if
+        any of them is not stored."""
+        closure = self._closures.get(type_)
+        if closure is not None:
+            return closure
+        version = self._version
+        fragments = {}
+        stack = [type_]
+        while stack:
+            dep = stack.pop()
+            if dep in fragments:
+                continue
+            fragment = self._fragments.get(dep)
+            if fragment is None:
+                return None
+            fragments[dep] = fragment
+            stack.extend(fragment.deps)
+        with self._lock:
+            # not cached if a fragment was invalidated meanwhile
+            if version == self._version:
+                self._closures[type_] = fragments
+        return fragments
+
+
+@dataclasses.dataclass(frozen=True)
+class _Fragment:
+    name: str
+    schema: dict
+    deps: tuple
+
+
+@dataclasses.dataclass
+class _Frame:
+    deps: dict = dataclasses.field(default_factory=dict)
+    uses_root: bool = False
+
+
+class WalkObserver:
+    """Receives the events of schema generation, e.g. to profile it.
+
+    Pass an instance to `get_schema(dc, observer=...)`. Every `enter` is
+    followed by the matching `exit`, and events nest. `kind` is one of:
+
+    - "class": building the schema of a dataclass, `key` is the class
+    - "enum": building the schema of an enum, `key` is the enum
+    - "field": building the schema of a field, `key` is `(dataclass, name)`
+    - "handler": a type handler, `key` is `(handler, type)`
+    - "type_hints": resolving the annotations of a dataclass, `key` is the class
+
+    Walks without an observer are not instrumented at all.
+    """
+
+    def enter(self, kind: str, key: t.Any) -> None:
+        pass
+
+    def exit(self, kind: str, key: t.Any) -> None:  # noqa: A003
+        pass
+
+    def lookup(self, type_: type, hit: t.Optional[str]) -> None:
+        """A lookup of the `$defs` entry of `type_`.
+
+        `hit` is "defs" if it was already in the schema, "store" if it was
+        copied from the `FragmentStore` and None if it was created.
+        """
+
+
+def _observed(observer, kind, key, step):
+    observer.enter(kind, key)
+    try:
+        return (yield step)
+    finally:
+        observer.exit(kind, key)
 
 
 class _GetSchema:
+    """A walk of a dataclass graph.
+
+    The state of the walk (`root`, `defs`, ...) lives on the instance, and every
+    entry point creates its own instance. Everything shared between walks (the
+    `TypeRegistry`, `FragmentStore` and caches) is safe to use from several
+    threads at once.
+    """
+
+    def __init__(
+        self,
+        store: t.Optional[FragmentStore] = None,
+        registry: t.Optional[TypeRegistry] = None,
+        def_names: t.Optional[_DefNames] = None,
+        observer: t.Optional[WalkObserver] = None,
+        budget: t.Optional[Budget] = None,
+    ) -> None:
+        self.store = store
+        self.registry = type_handlers if registry is None else registry
+        if store is not None:
+            store.bind(self.registry)
+        if def_names is None:
+            def_names = _DefNames() if store is None else store.def_names
+        self.def_name = def_names
+        self.budget = budget
+        if observer is not None:
+            self.observe(observer)
+        if budget is not None:
+            self.limit(budget)
+
+    def observe(self, observer):
+        # Replaces the hooks with instrumented versions on this instance only.
+        def timed(kind, key, function, *args):
+            if inspect.isgeneratorfunction(function):
+                return _observed(observer, kind, key, function(*args))
+            observer.enter(kind, key)
+            try:
+                return function(*args)
+            finally:
+                observer.exit(kind, key)
+
+        create_dc_schema = self.create_dc_schema
+        create_enum_schema = self.create_enum_schema
+        get_type_hints = self.get_type_hints
+        field_request = self.field_request
+        add_def = self.add_def
+
+        def call_handler(type_, default, annotation):
+            handler = self.registry.resolve(type_)
+            return timed(
+                "handler", (handler, type_), handler, self, type_, default, annotation
+            )
+
+        def observed_field_request(dc, field, type_):
+            def step():
+                return (yield field_request(dc, field, type_))
+
+            return _observed(observer, "field", (dc, field.name), step())
+
+        def observed_add_def(type_, create):
+            if self.def_name(type_) in self.defs or type_ in self.in_progress:
+                observer.lookup(type_, "defs")
+                return add_def(type_, create)
+            step = add_def(type_, create)
+            observer.lookup(type_, None if step is not None else "store")
+            return step
+
+        self.create_dc_schema = lambda dc: timed("class", dc, create_dc_schema, dc)
+        self.create_enum_schema = lambda type_: timed(
+            "enum", type_, create_enum_schema, type_
+        )
+        self.get_type_hints = lambda dc: timed("type_hints", dc, get_type_hints, dc)
+        self.field_request = observed_field_request
+        self.call_handler = call_handler
+        self.add_def = observed_add_def
+
+    def limit(self, budget):
+        # Checks the budget after every field and `$defs` entry, on this
+        # instance only.
+        tracker = _Tracker(budget)
+        field_request = self.field_request
+        add_def = self.add_def
+
+        def limited_field_request(dc, field, type_):
+            def step():
+                schema = yield field_request(dc, field, type_)
+                tracker.field(dc, field.name, schema)
+                return schema
+
+            return step()
+
+        def limited_add_def(type_, create):
+            step = add_def(type_, create)
+            # definitions copied from a `FragmentStore` are added at once
+            tracker.defs(len(self.defs))
+            if step is None:
+                return None
+
+            def counted():
+                yield step
+                tracker.defs(len(self.defs))
+
+            return counted()
+
+        self.field_request = limited_field_request
+        self.add_def = limited_add_def
+
     def __call__(self, dc):  # noqa: ANN204
         self.root = dc
         self.seen_root = False
 
         self.defs = {}
-        schema = self.get_dc_schema(dc, SchemaAnnotation())
+        self.frames = []
+        self.in_progress = set()
+        self.tainted = set()
+        schema = self.run(self.get_dc_schema(dc, _MISSING, SchemaAnnotation()))
         if self.defs:
             schema["$defs"] = self.defs
 
-        return {
+        schema = {
             "$schema": "https://json-schema.org/draft/2020-12/schema",
             **schema,
         }
+        if self.budget is not None:
+            check_budget(schema, self.budget)
+        return schema
+
+    def bundle(self, dcs):
+        self.root = None
+        self.seen_root = False
+
+        self.defs = {}
+        self.frames = []
+        self.in_progress = set()
+        self.tainted = set()
+        refs = {}
+        for dc in dcs:
+            self.run(self.add_def(dc, self.create_dc_schema))
+            refs[dc] = {"$ref": f"#/$defs/{self.def_name(dc)}"}
+
+        schema = {
+            "$schema": "https://json-schema.org/draft/2020-12/schema",
+            "$defs": self.defs,
+        }
+        if self.budget is not None:
+            check_budget(schema, self.budget)
+        return SchemaBundle(schema, refs)
 
-    def get_dc_schema(self, dc, annotation):
+    def run(self, step):
+        """Run the generator `step` to completion, without recursion.
+
+        Handlers and the steps of the walk are generators when they need the
+        schema of other types. They yield a `(type_, default, annotation)`
+        request, which is answered with its schema, or another generator (or
+        None, a no-op), which is run and answered with its return value. The
+        pending generators are kept on an explicit stack, so the depth of the
+        model graph is not limited by the Python stack.
+        """
+        if step is None:
+            return None
+        call_handler = self.call_handler
+        stack = [step]
+        value = error = None
+        while stack:
+            try:
+                if error is None:
+                    request = stack[-1].send(value)
+                else:
+                    thrown, error = error, None
+                    request = stack[-1].throw(thrown)
+            except StopIteration as stop:
+                stack.pop()
+                value = stop.value
+                continue
+            except Exception as e:
+                stack.pop()
+                if not stack:
+                    raise
+                error = e
+                continue
+            if type(request) is tuple:
+                try:
+                    request = call_handler(*request)
+                except Exception as e:
+                    error = e
+                    continue
+                if not isinstance(request, types.GeneratorType):
+                    value = request
+                    continue
+            elif request is None:
+                value = None
+                continue
+            stack.append(request)
+            value = None
+        return value
+
+    def call_handler(self, type_, default, annotation):
+        return self.registry.resolve(type_)(self, type_, default, annotation)
+
+    def get_dc_schema(self, dc, default, annotation):
         if dc == self.root:
             if self.seen_root:
+                self.taint_frames()
                 return {"allOf": [{"$ref": "#"}], **annotation.schema()}
             else:
                 self.seen_root = True
-                schema = self.create_dc_schema(dc)
+                schema = yield self.build_fragment(dc, self.create_dc_schema)
                 return schema
         else:
-            if dc.__name__ not in self.defs:
-                schema = self.create_dc_schema(dc)
-                self.defs[dc.__name__] = schema
+            yield self.add_def(dc, self.create_dc_schema)
             return {
-                "allOf": [{"$ref": f"#/$defs/{dc.__name__}"}],
+                "allOf": [{"$ref": f"#/$defs/{self.def_name(dc)}"}],
                 **annotation.schema(),
             }
 
+    def add_def(self, type_, create):
+        """Add the `$defs` entry of `type_`, if missing.
+
+        Returns None if there is nothing (left) to do, or a step of the walk
+        creating the entry.
+        """
+        if self.frames:
+            self.frames[-1].deps[type_] = None
+        if self.def_name(type_) in self.defs:
+            if type_ in self.tainted:
+                self.taint_frames()
+            return None
+        if type_ in self.in_progress:
+            return None
+        if self.store is not None and self.reuse_fragment(type_):
+            return None
+        return self.create_def(type_, create)
+
+    def create_def(self, type_, create):
+        self.defs[self.def_name(type_)] = yield self.build_fragment(type_, create)
+
+    def build_fragment(self, type_, create):
+        # Definitions that reference the root ("#") only make sense within this
+        # walk, so they (and everything that depends on them) are not stored.
+        frame = _Frame()
+        self.frames.append(frame)
+        self.in_progress.add(type_)
+        try:
+            schema = create(type_)
+            if isinstance(schema, types.GeneratorType):
+                schema = yield schema
+        finally:
+            self.in_progress.discard(type_)
+            self.frames.pop()
+        if frame.uses_root:
+            self.tainted.add(type_)
+        elif self.store is not None:
+            self.store.add(type_, self.def_name(type_), schema, tuple(frame.deps))
+        return schema
+
+    def taint_frames(self):
+        for frame in self.frames:
+            frame.uses_root = True
+
+    def reuse_fragment(self, type_):
+        fragments = self.store.closure(type_)
+        if fragments is None or self.root in fragments:
+            return False
+        self.insert_fragment(type_, fragments)
+        return True
+
+    def insert_fragment(self, type_, fragments):
+        # insert the dependencies first, depth first with an explicit stack
+        self.in_progress.add(type_)
+        stack = [(type_, iter(fragments[type_].deps))]
+        while stack:
+            current, deps = stack[-1]
+            for dep in deps:
+                if self.def_name(dep) not in self.defs and dep not in self.in_progress:
+                    self.in_progress.add(dep)
+                    stack.append((dep, iter(fragments[dep].deps)))
+                    break
+            else:
+                stack.pop()
+                self.in_progress.discard(current)
+                fragment = fragments[current]
+                self.defs[fragment.name] = _copy_schema(fragment.schema)
+
     def create_dc_schema(self, dc):
         if hasattr(dc, "SchemaConfig"):
             if not hasattr(dc.SchemaConfig, "annotation"):
@@ -119,11 +1216,10 @@ class _GetSchema:
             "properties": {},
             "required": [],
         }
-        type_hints = t.get_type_hints(dc, include_extras=True)
+        type_hints = self.get_type_hints(dc)
         for field in dataclasses.fields(dc):
-            type_ = type_hints[field.name]
-            schema["properties"][field.name] = self.get_field_schema(
-                type_, field.default, SchemaAnnotation()
+            schema["properties"][field.name] = yield self.field_request(
+                dc, field, type_hints[field.name]
             )
             field_is_optional = (
                 field.default is not _MISSING or field.default_factory is not _MISSING
@@ -134,45 +1230,21 @@ class _GetSchema:
             schema.pop("required")
         return schema
 
+    @staticmethod
+    def get_type_hints(dc: type) -> dict[str, t.Any]:
+        return type_hints.get(dc)
+
+    @staticmethod
+    def field_request(dc: type, field: dataclasses.Field, type_: t.Any) -> tuple:
+        return (type_, field.default, SchemaAnnotation())
+
     def get_field_schema(self, type_, default, annotation):
-        if dataclasses.is_dataclass(type_):
-            return self.get_dc_schema(type_, annotation)
-        if t.get_origin(type_) == t.Union:
-            return self.get_union_schema(type_, default, annotation)
-        if t.get_origin(type_) == t.Literal:
-            return self.get_literal_schema(type_, default, annotation)
-        if t.get_origin(type_) == t.Annotated:
-            return self.get_annotated_schema(type_, default)
-        elif type_ == dict or t.get_origin(type_) == dict:
-            return self.get_dict_schema(type_, annotation)
-        elif type_ == list or t.get_origin(type_) == list:
-            return self.get_list_schema(type_, annotation)
-        elif type_ == tuple or t.get_origin(type_) == tuple:
-            return self.get_tuple_schema(type_, default, annotation)
-        elif type_ == set or t.get_origin(type_) == set:
-            return self.get_set_schema(type_, annotation)
-        elif type_ is None or type_ == type(None):
-            return self.get_none_schema(default, annotation)
-        elif type_ == str:
-            return self.get_str_schema(default, annotation)
-        elif type_ == bool:
-            return self.get_bool_schema(default, annotation)
-        elif type_ == int:
-            return self.get_int_schema(default, annotation)
-        elif type_ == t.Any:
-            return self.get_any_schema(default, annotation)
-        elif issubclass(type_, numbers.Number):
-            return self.get_number_schema(default, annotation)
-        elif issubclass(type_, enum.Enum):
-            return self.get_enum_schema(type_, default, annotation)
-        elif issubclass(type_, datetime.datetime):
-            return self.get_datetime_schema(annotation)
-        elif issubclass(type_, datetime.date):
-            return self.get_date_schema(annotation)
-        else:
-            raise NotImplementedError(f"field type '{type_}' not implemented")
+        schema = self.call_handler(type_, default, annotation)
+        if isinstance(schema, types.GeneratorType):
+            return self.run(schema)
+        return schema
 
-    def get_any_schema(self, default, annotation):
+    def get_any_schema(self, type_, default, annotation):
         ret = {
             "type": [
                 "null",
@@ -190,21 +1262,14 @@ class _GetSchema:
         return ret
 
     def get_union_schema(self, type_, default, annotation):
-        args = t.get_args(type_)
+        any_of = []
+        for arg in t.get_args(type_):
+            any_of.append((yield (arg, _MISSING, SchemaAnnotation())))
         if default is _MISSING:
-            return {
-                "anyOf": [
-                    self.get_field_schema(arg, _MISSING, SchemaAnnotation())
-                    for arg in args
-                ],
-                **annotation.schema(),
-            }
+            return {"anyOf": any_of, **annotation.schema()}
         else:
             return {
-                "anyOf": [
-                    self.get_field_schema(arg, _MISSING, SchemaAnnotation())
-                    for arg in args
-                ],
+                "anyOf": any_of,
                 "default": default,
                 **annotation.schema(),
             }
@@ -218,28 +1283,26 @@ class _GetSchema:
         args = t.get_args(type_)
         return {"enum": list(args), **schema}
 
-    def get_dict_schema(self, type_, annotation):
+    def get_dict_schema(self, type_, default, annotation):
         args = t.get_args(type_)
         assert len(args) in (0, 2), args
         if args:
             assert args[0] == str, args
             return {
                 "type": "object",
-                "additionalProperties": self.get_field_schema(
-                    args[1], _MISSING, SchemaAnnotation()
-                ),
+                "additionalProperties": (yield (args[1], _MISSING, SchemaAnnotation())),
                 **annotation.schema(),
             }
         else:
             return {"type": "object", **annotation.schema()}
 
-    def get_list_schema(self, type_, annotation):
+    def get_list_schema(self, type_, default, annotation):
         args = t.get_args(type_)
         assert len(args) in (0, 1)
         if args:
             return {
                 "type": "array",
-                "items": self.get_field_schema(args[0], _MISSING, SchemaAnnotation()),
+                "items": (yield (args[0], _MISSING, SchemaAnnotation())),
                 **annotation.schema(),
             }
         else:
@@ -255,16 +1318,16 @@ class _GetSchema:
         if args and len(args) == 2 and args[1] is ...:
             schema = {
                 "type": "array",
-                "items": self.get_field_schema(args[0], _MISSING, SchemaAnnotation()),
+                "items": (yield (args[0], _MISSING, SchemaAnnotation())),
                 **schema,
             }
         elif args:
+            prefix_items = []
+            for arg in args:
+                prefix_items.append((yield (arg, _MISSING, SchemaAnnotation())))
             schema = {
                 "type": "array",
-                "prefixItems": [
-                    self.get_field_schema(arg, _MISSING, SchemaAnnotation())
-                    for arg in args
-                ],
+                "prefixItems": prefix_items,
                 "minItems": len(args),
                 "maxItems": len(args),
                 **schema,
@@ -273,74 +1336,97 @@ class _GetSchema:
             schema = {"type": "array", **schema}
         return schema
 
-    def get_set_schema(self, type_, annotation):
+    def get_set_schema(self, type_, default, annotation):
         args = t.get_args(type_)
         assert len(args) in (0, 1)
         if args:
             return {
                 "type": "array",
-                "items": self.get_field_schema(args[0], _MISSING, SchemaAnnotation()),
+                "items": (yield (args[0], _MISSING, SchemaAnnotation())),
                 "uniqueItems": True,
                 **annotation.schema(),
             }
         else:
             return {"type": "array", "uniqueItems": True, **annotation.schema()}
 
-    def get_none_schema(self, default, annotation):
+    def get_none_schema(self, type_, default, annotation):
         if default is _MISSING:
             return {"type": "null", **annotation.schema()}
         else:
             return {"type": "null", "default": default, **annotation.schema()}
 
-    def get_str_schema(self, default, annotation):
+    def get_str_schema(self, type_, default, annotation):
         if default is _MISSING:
             return {"type": "string", **annotation.schema()}
         else:
             return {"type": "string", "default": default, **annotation.schema()}
 
-    def get_bool_schema(self, default, annotation):
+    def get_bool_schema(self, type_, default, annotation):
         if default is _MISSING:
             return {"type": "boolean", **annotation.schema()}
         else:
             return {"type": "boolean", "default": default, **annotation.schema()}
 
-    def get_int_schema(self, default, annotation):
+    def get_int_schema(self, type_, default, annotation):
         if default is _MISSING:
             return {"type": "integer", **annotation.schema()}
         else:
             return {"type": "integer", "default": default, **annotation.schema()}
 
-    def get_number_schema(self, default, annotation):
+    def get_number_schema(self, type_, default, annotation):
         if default is _MISSING:
             return {"type": "number", **annotation.schema()}
         else:
             return {"type": "number", "default": default, **annotation.schema()}
 
     def get_enum_schema(self, type_, default, annotation):
-        if type_.__name__ not in self.defs:
-            self.defs[type_.__name__] = {
-                "title": type_.__name__,
-                "enum": [v.value for v in type_],
-            }
+        yield self.add_def(type_, self.create_enum_schema)
         if default is _MISSING:
             return {
-                "allOf": [{"$ref": f"#/$defs/{type_.__name__}"}],
+                "allOf": [{"$ref": f"#/$defs/{self.def_name(type_)}"}],
                 **annotation.schema(),
             }
         else:
             return {
-                "allOf": [{"$ref": f"#/$defs/{type_.__name__}"}],
+                "allOf": [{"$ref": f"#/$defs/{self.def_name(type_)}"}],
                 "default": default.value,
                 **annotation.schema(),
             }
 
-    def get_annotated_schema(self, type_, default):
+    def create_enum_schema(self, type_):
+        return {"title": type_.__name__, "enum": [v.value for v in type_]}
+
+    def get_annotated_schema(self, type_, default, annotation):
         args = t.get_args(type_)
         assert len(args) == 2
-        return self.get_field_schema(args[0], default, args[1])
+        return (yield (args[0], default, args[1]))
 
-    def get_datetime_schema(self, annotation):
+    def get_datetime_schema(self, type_, default, annotation):
         return {"type": "string", "format": "date-time", **annotation.schema()}
 
-    def get_date_schema(self, annotation):
+    def get_date_schema(self, type_, default, annotation):
         return {"type": "string", "format": "date", **annotation.schema()}
+
+
+type_handlers = TypeRegistry(dataclass_handler=_GetSchema.get_dc_schema)
+type_handlers.register(t.Union, _GetSchema.get_union_schema)
+type_handlers.register(t.Literal, _GetSchema.get_literal_schema)
+type_handlers.register(t.Annotated, _GetSchema.get_annotated_schema)
+type_handlers.register(t.Any, _GetSchema.get_any_schema, subclasses=False)
+type_handlers.register(None, _GetSchema.get_none_schema)
+type_handlers.register(type(None), _GetSchema.get_none_schema, subclasses=False)
+type_handlers.register(dict, _GetSchema.get_dict_schema, subclasses=False)
+type_handlers.register(list, _GetSchema.get_list_schema, subclasses=False)
+type_handlers.register(tuple, _GetSchema.get_tuple_schema, subclasses=False)
+type_handlers.register(set, _GetSchema.get_set_schema, subclasses=False)
+type_handlers.register(str, _GetSchema.get_str_schema, subclasses=False)
+type_handlers.register(bool, _GetSchema.get_bool_schema, subclasses=False)
+type_handlers.register(int, _GetSchema.get_int_schema, subclasses=False)
+type_handlers.register(enum.Enum, _GetSchema.get_enum_schema)
+type_handlers.register(numbers.Number, _GetSchema.get_number_schema)
+type_handlers.register(datetime.date, _GetSchema.get_date_schema)
+type_handlers.register(datetime.datetime, _GetSchema.get_datetime_schema)
+if hasattr(types, "UnionType"):
+    type_handlers.register(types.UnionType, _GetSchema.get_union_schema)
+
+register_type_handler = type_handlers.register
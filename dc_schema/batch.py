@@ -0,0 +1,458 @@
+"""Validate batches of records of one dataclass column by column."""
+
+from __future__ import annotations
+
+import array
+import dataclasses
+import itertools
+import operator
+import re
+import typing as t
+
+from dc_schema import get_schema
+from dc_schema.validator import (
+    _ARRAY_KEYWORDS,
+    _NUMBER_KEYWORDS,
+    _OBJECT_KEYWORDS,
+    _STRING_KEYWORDS,
+    ValidationError,
+    _Compiler,
+    _hashable_keys,
+    _in_enum,
+    _not_multiple,
+    _type_check,
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_MISSING = object()
+# keywords validated per value, by the compiled validator
+_NESTED_KEYWORDS = {
+    "$ref",
+    "allOf",
+    "anyOf",
+    "oneOf",
+    *_ARRAY_KEYWORDS,
+    *_OBJECT_KEYWORDS,
+}
+# classes that certainly pass a type check, to skip checking value by value
+_TYPE_CLASSES = {
+    "string": {str},
+    "integer": {int},
+    "number": {int, float},
+    "boolean": {bool},
+    "null": {type(None)},
+    "object": {dict},
+    "array": {list},
+}
+_BOUNDS = (
+    ("minimum", operator.lt),
+    ("maximum", operator.gt),
+    ("exclusiveMinimum", operator.le),
+    ("exclusiveMaximum", operator.ge),
+)
+# floats represent integers exactly up to 2**53
+_MAX_EXACT = 2**53
+# values that are equal only if they are equal in JSON (unlike `True == 1`), so
+# that a column can be checked by its distinct values
+_DISTINCT_CLASSES = {str, int, float}
+
+
+@dataclasses.dataclass
+class BatchResult:
+    """The failing rows of a batch.
+
+    `failures` maps `(field, keyword)` to the sorted indices of the records
+    failing it, e.g. `("price", "minimum")`, with field `""` for the record
+    itself. Values validated by the compiled validator fail `"schema"`.
+    """
+
+    rows: int
+    failures: dict
+
+    @property
+    def valid(self):
+        return not self.failures
+
+    def invalid_rows(self):
+        return sorted(set().union(*self.failures.values()))
+
+
+class BatchValidator:
+    """Validates a list of records of one dataclass, see
+    `compile_batch_validator`.
+    """
+
+    def __init__(
+        self,
+        schema: dict,
+        columns: list[_Column],
+        additional: t.Optional[t.Callable[[dict], bool]],
+        use_numpy: bool,
+    ) -> None:
+        self.schema = schema
+        self.columns = columns
+        self.additional = additional
+        self.use_numpy = use_numpy
+
+    def __call__(self, records: list) -> BatchResult:
+        failures: dict[tuple[str, str], list[int]] = {}
+        count = len(records)
+        rows: t.Sequence[int] = range(count)
+        if not set(map(type, records)) <= {dict}:
+            is_object = [isinstance(record, dict) for record in records]
+            _fail(failures, "", "type", rows, is_object)
+            rows = list(itertools.compress(rows, is_object))
+            records = list(itertools.compress(records, is_object))
+        if self.additional is not None:
+            _fail(
+                failures,
+                "",
+                "additionalProperties",
+                rows,
+                map(self.additional, records),
+            )
+        for column in self.columns:
+            try:
+                values = list(map(column.get, records))
+                missing = False
+            except KeyError:
+                values = [record.get(column.name, _MISSING) for record in records]
+                missing = True
+            column.check(failures, rows, values, self.use_numpy, missing)
+        return BatchResult(count, failures)
+
+
+def compile_batch_validator(dc, *, registry=None, use_numpy=None):
+    """Compile a batch validator for a dataclass, or for an already generated
+    schema of an object.
+
+    Records are transposed into one column per property, and the constraints
+    of each property are checked for the whole column at once: `required`,
+    `type`, `enum`/`const`, the bounds and `multipleOf` of numbers and the
+    lengths and `pattern` of strings. Numeric columns are packed into `array`s
+    and compared with NumPy if it is installed (`use_numpy=None`), or with
+    `map` over the arrays otherwise. Nested dataclasses, lists and other
+    properties are validated value by value with `compile_validator`.
+    """
+    schema = dc if isinstance(dc, dict) else get_schema(dc, registry=registry)
+    if use_numpy and np is None:
+        raise ImportError("use_numpy=True requires numpy")
+    extra = _NESTED_KEYWORDS.intersection(schema) - {
+        "properties",
+        "required",
+        "additionalProperties",
+    }
+    additional = schema.get("additionalProperties", True)
+    if schema.get("type") != "object" or extra or additional not in (True, False):
+        raise ValueError("batch validation requires an object schema of properties")
+
+    defs = schema.get("$defs", {})
+    required = set(schema.get("required", ()))
+    columns = []
+    nested = {}
+    for name, property_schema in schema.get("properties", {}).items():
+        simple, nullable = _unwrap(property_schema, defs)
+        column = _Column(name, name in required, nullable)
+        if simple is None:
+            nested[name] = column
+        else:
+            column.constraints(simple)
+        columns.append(column)
+    for name in sorted(required - set(schema.get("properties", {}))):
+        columns.append(_Column(name, True, False))
+    if nested:
+        compiler = _Compiler(schema)
+        names = {name: compiler.function(schema["properties"][name]) for name in nested}
+        compiler.pending.append(("root", schema))
+        source = compiler.drain()
+        exec(compile(source, "<dc_schema batch validator>", "exec"), compiler.namespace)
+        for name, column in nested.items():
+            column.nested = compiler.namespace[f"_f_{names[name]}"]
+
+    if additional is False:
+        additional = frozenset(schema.get("properties", {})).issuperset
+    else:
+        additional = None
+    return BatchValidator(
+        schema, columns, additional, np is not None and use_numpy is not False
+    )
+
+
+class _Column:
+    def __init__(self, name: str, required: bool, nullable: bool) -> None:
+        self.name = name
+        self.get = operator.itemgetter(name)
+        self.required = required
+        self.nullable = nullable
+        self.type_check = None
+        self.type_classes: set[type] = set()
+        self.enum = None
+        self.numbers: list[tuple[str, t.Callable, t.Any]] = []
+        self.multiple_of = None
+        self.lengths: list[tuple[str, t.Callable, int]] = []
+        self.pattern = None
+        self.nested = None
+
+    def constraints(self, schema):
+        type_ = schema.get("type")
+        check = _type_check(type_, "v")
+        if check is not None:
+            self.type_check = _predicate(check)
+            types = [type_] if isinstance(type_, str) else type_
+            self.type_classes = set().union(*(_TYPE_CLASSES[t] for t in types))
+        if "enum" in schema or "const" in schema:
+            values = schema["enum"] if "enum" in schema else [schema["const"]]
+            keyword = "enum" if "enum" in schema else "const"
+            self.enum = (keyword, _hashable_keys(values), values)
+        self.numbers = [(k, op, schema[k]) for k, op in _BOUNDS if k in schema]
+        self.multiple_of = schema.get("multipleOf")
+        for keyword, op in (("minLength", operator.lt), ("maxLength", operator.gt)):
+            if keyword in schema:
+                self.lengths.append((keyword, op, schema[keyword]))
+        if "pattern" in schema:
+            self.pattern = re.compile(schema["pattern"])
+
+    def check(self, failures, rows, values, use_numpy, missing):
+        name = self.name
+        if missing:
+            present = list(map(operator.is_not, values, itertools.repeat(_MISSING)))
+            if self.required:
+                _fail(failures, name, "required", rows, present)
+            rows = list(itertools.compress(rows, present))
+            values = list(itertools.compress(values, present))
+        classes = set(map(type, values))
+        if self.nullable and type(None) in classes:
+            present = list(map(operator.is_not, values, itertools.repeat(None)))
+            rows = list(itertools.compress(rows, present))
+            values = list(itertools.compress(values, present))
+            classes.discard(type(None))
+        if not values:
+            return
+
+        if self.nested is not None:
+            _fail(
+                failures,
+                name,
+                "schema",
+                rows,
+                map(_passes, values, itertools.repeat(self.nested)),
+            )
+            return
+        if self.type_check is not None and not classes <= self.type_classes:
+            passed = list(map(self.type_check, values))
+            _fail(failures, name, "type", rows, passed)
+            rows = list(itertools.compress(rows, passed))
+            values = list(itertools.compress(values, passed))
+            classes = set(map(type, values))
+        if self.enum is not None:
+            keyword, keys, enum = self.enum
+            if classes <= _DISTINCT_CLASSES:
+                # each distinct value once
+                invalid = {v for v in set(values) if not _in_enum(v, keys, enum)}
+                _add(failures, name, keyword, _rows_in(rows, values, invalid))
+            else:
+                _fail(
+                    failures,
+                    name,
+                    keyword,
+                    rows,
+                    map(
+                        _in_enum,
+                        values,
+                        itertools.repeat(keys),
+                        itertools.repeat(enum),
+                    ),
+                )
+        if self.numbers or self.multiple_of is not None:
+            number_rows, numbers = _select(rows, values, classes, _is_number)
+            column = _Numbers(number_rows, numbers, use_numpy)
+            for keyword, op, limit in self.numbers:
+                _add(failures, name, keyword, column.failing(op, limit))
+            if self.multiple_of is not None:
+                _add(
+                    failures,
+                    name,
+                    "multipleOf",
+                    column.not_multiple(self.multiple_of),
+                )
+        if self.lengths or self.pattern is not None:
+            string_rows, strings = _select(rows, values, classes, _is_string)
+            if self.lengths:
+                lengths = _Numbers(
+                    string_rows, array.array("q", map(len, strings)), use_numpy
+                )
+                for keyword, op, limit in self.lengths:
+                    _add(failures, name, keyword, lengths.failing(op, limit))
+            if self.pattern is not None:
+                search = self.pattern.search
+                invalid = {s for s in set(strings) if not search(s)}
+                _add(failures, name, "pattern", _rows_in(string_rows, strings, invalid))
+
+
+class _Numbers:
+    """A column of numbers and the rows they are from."""
+
+    def __init__(
+        self, rows: t.Sequence[int], values: t.Sequence, use_numpy: bool
+    ) -> None:
+        self.rows = rows
+        self.values = values if isinstance(values, array.array) else _pack(values)
+        self.use_numpy = use_numpy and isinstance(self.values, array.array)
+        if self.use_numpy:
+            self.array = np.frombuffer(self.values, dtype=self.values.typecode)
+
+    def failing(self, op, limit):
+        if self.use_numpy:
+            return self.select(op(self.array, limit))
+        return list(
+            itertools.compress(self.rows, map(op, self.values, itertools.repeat(limit)))
+        )
+
+    def not_multiple(self, multiple_of):
+        values = self.values
+        if not isinstance(values, array.array):
+            failing = map(_not_multiple, values, itertools.repeat(multiple_of))
+            return list(itertools.compress(self.rows, failing))
+        if values.typecode == "q" and isinstance(multiple_of, int):
+            if self.use_numpy:
+                return self.select(self.array % multiple_of != 0)
+            failing = map(operator.mod, values, itertools.repeat(multiple_of))
+            return list(itertools.compress(self.rows, failing))
+        if self.use_numpy:
+            # huge quotients overflow to infinity, and are checked below
+            with np.errstate(over="ignore"):
+                quotient = self.array / multiple_of
+            indices = np.flatnonzero(
+                ~np.isfinite(quotient) | (quotient != np.trunc(quotient))
+            ).tolist()
+        else:
+            quotients = map(operator.truediv, values, itertools.repeat(multiple_of))
+            failing = map(operator.not_, map(float.is_integer, quotients))
+            indices = itertools.compress(itertools.count(), failing)
+        # the (few) failing values are checked again exactly, as a quotient
+        # overflowing to infinity may still be that of a multiple
+        return [self.rows[i] for i in indices if _not_multiple(values[i], multiple_of)]
+
+    def select(self, mask):
+        return [self.rows[i] for i in np.flatnonzero(mask).tolist()]
+
+
+def _pack(values):
+    # an array of int64 or float64 for NumPy and compact storage, if exact
+    classes = set(map(type, values))
+    if classes <= {int}:
+        try:
+            return array.array("q", values)
+        except OverflowError:
+            return values
+    if classes <= {int, float} and all(
+        -_MAX_EXACT <= v <= _MAX_EXACT for v in values if v.__class__ is int
+    ):
+        return array.array("d", values)
+    return values
+
+
+def _predicate(check):
+    namespace = {}
+    exec(f"def check(v):\n    return {check}\n", namespace)
+    return namespace["check"]
+
+
+_is_number = _predicate(_type_check("number", "v"))
+_is_string = _predicate(_type_check("string", "v"))
+
+
+def _select(rows, values, classes, predicate):
+    if not values:
+        # every value failed the type check
+        return [], []
+    if classes <= _TYPE_CLASSES["number"] or classes <= _TYPE_CLASSES["string"]:
+        if predicate(values[0]):
+            return rows, values
+        return [], []
+    selected = list(map(predicate, values))
+    if all(selected):
+        return rows, values
+    return (
+        list(itertools.compress(rows, selected)),
+        list(itertools.compress(values, selected)),
+    )
+
+
+def _rows_in(rows, values, invalid):
+    if not invalid:
+        return []
+    return list(itertools.compress(rows, map(invalid.__contains__, values)))
+
+
+def _passes(value, validate):
+    try:
+        validate(value, None, None)
+    except ValidationError:
+        return False
+    return True
+
+
+def _fail(failures, field, keyword, rows, passed):
+    # the rows where `passed` is false
+    _add(
+        failures,
+        field,
+        keyword,
+        list(itertools.compress(rows, map(operator.not_, passed))),
+    )
+
+
+def _add(failures, field, keyword, rows):
+    if rows:
+        failures[field, keyword] = rows
+
+
+def _unwrap(schema, defs):
+    """`(schema, nullable)`, the constraints of a property that can be checked
+    by column, or `(None, False)`.
+    """
+    nullable = False
+    while True:
+        if schema is True:
+            return {}, nullable
+        if not isinstance(schema, dict):
+            return None, False
+        nested = _NESTED_KEYWORDS.intersection(schema)
+        if not nested:
+            return schema, nullable
+        if len(nested) != 1 or _extra_keywords(schema, *nested):
+            return None, False
+        if "allOf" in nested:
+            # e.g. an enum, `{"allOf": [{"$ref": "#/$defs/Color"}]}`
+            branches = schema["allOf"]
+            ref = branches[0].get("$ref", "") if len(branches) == 1 else ""
+            name = ref[len("#/$defs/") :]
+            if (
+                len(branches[0]) != 1
+                or not ref.startswith("#/$defs/")
+                or name not in defs
+            ):
+                return None, False
+            schema = defs[name]
+            continue
+        if "anyOf" not in nested:
+            return None, False
+        # `Optional[...]`
+        branches = [b for b in schema["anyOf"] if b != {"type": "null"}]
+        if len(branches) != 1 or len(schema["anyOf"]) != 2:
+            return None, False
+        nullable = True
+        schema = branches[0]
+
+
+def _extra_keywords(schema, keyword):
+    # validation keywords besides `keyword`
+    return any(
+        k in schema
+        for k in ("type", "enum", "const", *_NUMBER_KEYWORDS, *_STRING_KEYWORDS)
+    )
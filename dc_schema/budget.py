@@ -0,0 +1,182 @@
+"""Limit the size of generated schemas, and measure it."""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+import typing as t
+
+
+@dataclasses.dataclass(frozen=True)
+class Budget:
+    """Limits on a generated schema, see `get_schema(dc, budget=...)`.
+
+    - `max_nodes`: JSON values (objects, arrays and scalars) in the schema
+    - `max_depth`: nesting of objects and arrays within one definition
+    - `max_defs`: `$defs` entries
+    - `max_size`: bytes of the schema as compact JSON
+
+    None means no limit.
+    """
+
+    max_nodes: t.Optional[int] = None
+    max_depth: t.Optional[int] = None
+    max_defs: t.Optional[int] = None
+    max_size: t.Optional[int] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class Cost:
+    """The size of a definition or field of a schema."""
+
+    name: str
+    nodes: int
+    size: int
+    depth: int
+
+
+class BudgetExceeded(ValueError):
+    """A schema exceeded `limit`, a field of its `Budget`.
+
+    `fields` are the costliest fields seen, largest first. If generation was
+    stopped early, `at` is the field it stopped after.
+    """
+
+    def __init__(
+        self,
+        limit: str,
+        maximum: int,
+        actual: int,
+        fields: list[Cost],
+        at: t.Optional[str] = None,
+    ) -> None:
+        self.limit = limit
+        self.maximum = maximum
+        self.actual = actual
+        self.fields = fields
+        self.at = at
+        super().__init__(self.report())
+
+    def report(self, limit=5):
+        at = f" at {self.at}" if self.at is not None else ""
+        lines = [f"schema exceeds {self.limit}={self.maximum} ({self.actual}{at})"]
+        if self.fields[:limit]:
+            lines.append("largest fields:")
+            lines += [
+                f"  {c.name}: {c.nodes} nodes, {c.size} bytes, depth {c.depth}"
+                for c in self.fields[:limit]
+            ]
+        return "\n".join(lines)
+
+
+@dataclasses.dataclass(frozen=True)
+class SchemaStats:
+    """The size of a schema, its root and each `$defs` entry (`definitions`) and
+    each of their properties (`fields`), largest first.
+    """
+
+    nodes: int
+    size: int
+    depth: int
+    definitions: list[Cost]
+    fields: list[Cost]
+
+
+def schema_stats(schema):
+    """The size of `schema` and its parts, see `SchemaStats`."""
+    nodes, size, _ = cost(schema)
+    definitions = []
+    fields = []
+    defs = schema.get("$defs", {})
+    root = {k: v for k, v in schema.items() if k != "$defs"}
+    for name, definition in [(schema.get("title", "#"), root), *defs.items()]:
+        definitions.append(Cost(name, *cost(definition)))
+        properties = (
+            definition.get("properties") if isinstance(definition, dict) else None
+        )
+        if isinstance(properties, dict):
+            for field, field_schema in properties.items():
+                fields.append(Cost(f"{name}.{field}", *_field_cost(field_schema)))
+    definitions.sort(key=_largest)
+    fields.sort(key=_largest)
+    depth = max((c.depth for c in definitions), default=0)
+    return SchemaStats(nodes, size, depth, definitions, fields)
+
+
+def check_budget(schema, budget):
+    """Raise `BudgetExceeded` if `schema` exceeds `budget`."""
+    stats = schema_stats(schema)
+    for limit, actual in (
+        ("max_defs", len(schema.get("$defs", {}))),
+        ("max_depth", stats.depth),
+        ("max_nodes", stats.nodes),
+        ("max_size", stats.size),
+    ):
+        maximum = getattr(budget, limit)
+        if maximum is not None and actual > maximum:
+            raise BudgetExceeded(limit, maximum, actual, stats.fields)
+
+
+def cost(value):
+    """`(nodes, size, depth)` of a JSON value, see `Budget`."""
+    nodes = 0
+    depth = 0
+    stack = [(value, 1)]
+    while stack:
+        item, level = stack.pop()
+        nodes += 1
+        if isinstance(item, dict):
+            depth = max(depth, level)
+            stack.extend((v, level + 1) for v in item.values())
+        elif isinstance(item, list):
+            depth = max(depth, level)
+            stack.extend((v, level + 1) for v in item)
+    # defaults that are not JSON are written by `repr` here
+    size = len(json.dumps(value, separators=(",", ":"), default=repr))
+    return nodes, size, depth
+
+
+class _Tracker:
+    """Checks a `Budget` during a walk, after every field and definition.
+
+    Counts are a lower bound of those of the final schema (which is checked
+    with `check_budget` once complete), so that generation stops as soon as a
+    limit is certainly exceeded.
+    """
+
+    def __init__(self, budget: Budget) -> None:
+        self.budget = budget
+        self.nodes = 0
+        self.size = 0
+        self.fields: list[Cost] = []
+        self.at: t.Optional[str] = None
+
+    def field(self, dc, name, schema):
+        field_cost = Cost(f"{dc.__qualname__}.{name}", *_field_cost(schema))
+        self.fields.append(field_cost)
+        self.at = field_cost.name
+        self.nodes += field_cost.nodes
+        self.size += field_cost.size
+        self.check("max_depth", field_cost.depth)
+        self.check("max_nodes", self.nodes)
+        self.check("max_size", self.size)
+
+    def defs(self, count):
+        self.check("max_defs", count)
+
+    def check(self, limit, actual):
+        maximum = getattr(self.budget, limit)
+        if maximum is not None and actual > maximum:
+            raise BudgetExceeded(
+                limit, maximum, actual, sorted(self.fields, key=_largest), self.at
+            )
+
+
+def _field_cost(schema):
+    # within its definition, a field is nested in `properties`
+    nodes, size, depth = cost(schema)
+    return nodes, size, depth + 2
+
+
+def _largest(c):
+    return (-c.size, -c.nodes, c.name)
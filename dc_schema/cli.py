@@ -1,21 +1,501 @@
 import argparse
+import contextlib
 import json
+import os
+import sys
+import time
+import typing as t
 
-from dc_schema import get_schema
+from dc_schema import dumps_schema, get_schema, get_schemas, get_split_schema
+from dc_schema.budget import Budget, BudgetExceeded, check_budget, schema_stats
+from dc_schema.dedupe import dedupe_schema
+from dc_schema.diff import MODES, diff_documents, load_schemas
+from dc_schema.generator import _generate_chunks
+from dc_schema.profile import Profiler
+from dc_schema.scan import find_dataclasses, import_package, load, scan
+from dc_schema.serve import serve
+from dc_schema.stream import validate_stream
+from dc_schema.watch import watch
 
 
-def main():
-    arg_parser = argparse.ArgumentParser()
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in _COMMANDS:
+        return _COMMANDS[argv[0]](argv[1:])
+
+    arg_parser = argparse.ArgumentParser(
+        epilog=f"other commands: {', '.join(_COMMANDS)} (see `dc_schema <command> -h`)"
+    )
     arg_parser.add_argument(
         "file_path", help="The path to the python file containing the dataclass"
     )
     arg_parser.add_argument(
         "dataclass", help="The name of the dataclass to generate the schema"
     )
-    args = arg_parser.parse_args()
+    arg_parser.add_argument(
+        "--split",
+        metavar="DIR",
+        help="Write every definition as its own file into DIR, referenced with "
+        "relative $refs, and print the path of the root schema",
+    )
+    arg_parser.add_argument(
+        "--base-uri",
+        default="",
+        help="The URI the files written with --split are served at, for their $id",
+    )
+    _add_output_arguments(arg_parser)
+    _add_profile_arguments(arg_parser)
+    args = arg_parser.parse_args(argv)
 
     with open(args.file_path) as r:
         exec(r.read(), locals())
 
-    schema = get_schema(locals()[args.dataclass])
-    print(json.dumps(schema, indent=2), end=None)
+    profiler = _profiler(args)
+    if args.split:
+        split = get_split_schema(
+            locals()[args.dataclass],
+            base_uri=args.base_uri,
+            observer=profiler,
+            dedupe=args.dedupe,
+        )
+        split.write(args.split, compact=args.compact, canonical=args.canonical)
+        print(os.path.join(args.split, split.root))
+        _report(profiler, args)
+        return
+    schema = get_schema(locals()[args.dataclass], observer=profiler)
+    if args.dedupe:
+        result = dedupe_schema(schema)
+        schema = result.schema
+        print(
+            f"dedupe: {result.hoisted} shared definitions, saved {result.saved} of "
+            f"{result.size} bytes ({result.saved / result.size:.1%})",
+            file=sys.stderr,
+        )
+    print(dumps_schema(schema, compact=args.compact, canonical=args.canonical))
+    _report(profiler, args)
+
+
+def scan_command(argv):
+    arg_parser = argparse.ArgumentParser(
+        prog="dc_schema scan",
+        description="Generate the schema of every dataclass in a package.",
+    )
+    arg_parser.add_argument("package", help="The importable name of the package")
+    arg_parser.add_argument(
+        "-o", "--out", default="schemas", help="The output directory"
+    )
+    arg_parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="The number of worker processes (default: number of CPUs)",
+    )
+    arg_parser.add_argument(
+        "--bundle",
+        action="store_true",
+        help="Write a single bundle.json with shared $defs instead of one file "
+        "per dataclass",
+    )
+    arg_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Regenerate schemas even if their source has not changed",
+    )
+    _add_output_arguments(arg_parser)
+    _add_profile_arguments(arg_parser)
+    args = arg_parser.parse_args(argv)
+
+    _import_from_cwd()
+    profiler = _profiler(args)
+    result = scan(
+        args.package,
+        args.out,
+        workers=args.workers,
+        bundle=args.bundle,
+        force=args.force,
+        observer=profiler,
+        dedupe=args.dedupe,
+        compact=args.compact,
+        canonical=args.canonical,
+    )
+    print(
+        f"{len(result.generated) + len(result.skipped)} dataclasses in "
+        f"{result.modules} modules: {len(result.generated)} generated, "
+        f"{len(result.skipped)} unchanged, {result.elapsed:.2f}s"
+    )
+    _report(profiler, args)
+
+
+def serve_command(argv):
+    arg_parser = argparse.ArgumentParser(
+        prog="dc_schema serve",
+        description="Serve the schema of every dataclass in a package over HTTP. "
+        "Schemas are generated once at startup and served from memory.",
+    )
+    arg_parser.add_argument("package", help="The importable name of the package")
+    arg_parser.add_argument(
+        "--host", default="127.0.0.1", help="The address to listen on"
+    )
+    arg_parser.add_argument(
+        "--port", type=int, default=8000, help="The port to listen on (0: any)"
+    )
+    arg_parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="Move repeated identical subschemas into $defs",
+    )
+    arg_parser.add_argument(
+        "--quiet", action="store_true", help="Do not log every request"
+    )
+    args = arg_parser.parse_args(argv)
+
+    _import_from_cwd()
+    serve(args.package, args.host, args.port, dedupe=args.dedupe, quiet=args.quiet)
+
+
+def watch_command(argv):
+    arg_parser = argparse.ArgumentParser(
+        prog="dc_schema watch",
+        description="Write the schema of every dataclass in a package, and "
+        "regenerate the affected schemas whenever its source changes.",
+    )
+    arg_parser.add_argument("package", help="The importable name of the package")
+    arg_parser.add_argument(
+        "-o", "--out", default="schemas", help="The output directory"
+    )
+    arg_parser.add_argument(
+        "--interval",
+        type=float,
+        default=1.0,
+        help="Seconds between checks for changed files",
+    )
+    _add_output_arguments(arg_parser)
+    args = arg_parser.parse_args(argv)
+
+    _import_from_cwd()
+    watch(
+        args.package,
+        args.out,
+        interval=args.interval,
+        dedupe=args.dedupe,
+        compact=args.compact,
+        canonical=args.canonical,
+    )
+
+
+def validate_command(argv):
+    arg_parser = argparse.ArgumentParser(
+        prog="dc_schema validate",
+        description="Validate a newline-delimited JSON file against the schema of "
+        "a dataclass. Prints one line per error and exits with status 1 if there "
+        "are any.",
+    )
+    arg_parser.add_argument(
+        "dataclass",
+        help="The dataclass as `module:qualname`, or a JSON schema file with --schema",
+    )
+    arg_parser.add_argument(
+        "file", nargs="?", default="-", help="The NDJSON file (default: stdin)"
+    )
+    arg_parser.add_argument(
+        "--schema",
+        action="store_true",
+        help="Read the schema from the file given instead of a dataclass",
+    )
+    arg_parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="The number of worker processes (default: number of CPUs)",
+    )
+    arg_parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=1000,
+        help="The number of lines validated per task",
+    )
+    args = arg_parser.parse_args(argv)
+
+    if args.schema:
+        with open(args.dataclass) as f:
+            schema = json.load(f)
+    else:
+        _import_from_cwd()
+        schema = get_schema(load(args.dataclass))
+
+    start = time.perf_counter()
+    f = sys.stdin.buffer if args.file == "-" else open(args.file, "rb")  # noqa: SIM115
+    lines = _Counted(f)
+    errors = 0
+    with lines:
+        for error in validate_stream(
+            lines, schema, workers=args.workers, chunk_size=args.chunk_size
+        ):
+            errors += 1
+            print(error)
+    print(
+        f"{errors} errors in {lines.count} lines, {time.perf_counter() - start:.2f}s",
+        file=sys.stderr,
+    )
+    return 1 if errors else 0
+
+
+def generate_command(argv):
+    arg_parser = argparse.ArgumentParser(
+        prog="dc_schema generate",
+        description="Write random newline-delimited JSON records that are valid "
+        "against the schema of a dataclass, e.g. for load tests.",
+    )
+    arg_parser.add_argument("dataclass", help="The dataclass as `module:qualname`")
+    arg_parser.add_argument(
+        "-n",
+        "--count",
+        type=int,
+        default=None,
+        help="The number of records (default: until interrupted)",
+    )
+    arg_parser.add_argument(
+        "-o", "--output", default="-", help="The NDJSON file (default: stdout)"
+    )
+    arg_parser.add_argument(
+        "--seed", default=None, help="Seed the random generator, for repeatable output"
+    )
+    arg_parser.add_argument(
+        "--max-depth",
+        type=int,
+        default=3,
+        help="The deepest nesting of dataclasses, for recursive models",
+    )
+    arg_parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=1,
+        help="The number of worker processes",
+    )
+    arg_parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=1000,
+        help="The number of records generated per task",
+    )
+    args = arg_parser.parse_args(argv)
+
+    _import_from_cwd()
+    dc = load(args.dataclass)
+    start = time.perf_counter()
+    count = 0
+    with (
+        contextlib.nullcontext(sys.stdout.buffer)
+        if args.output == "-"
+        else open(args.output, "wb")
+    ) as f:
+        try:
+            for chunk in _generate_chunks(
+                dc,
+                args.count,
+                seed=args.seed,
+                max_depth=args.max_depth,
+                workers=args.workers,
+                chunk_size=args.chunk_size,
+            ):
+                f.write(chunk)
+                count += chunk.count(b"\n")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            f.flush()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{count} records in {elapsed:.2f}s, {count / elapsed:.0f} records/s",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def diff_command(argv):
+    arg_parser = argparse.ArgumentParser(
+        prog="dc_schema diff",
+        description="Compare two versions of schemas and classify every change as "
+        "breaking or compatible. Exits with status 1 if any change is breaking.",
+    )
+    for name in ("old", "new"):
+        arg_parser.add_argument(
+            name,
+            help="A JSON schema file, a directory of them (e.g. written by `scan`), "
+            "or a package as `name` or `name@path` (imported from the source tree "
+            "at path)",
+        )
+    arg_parser.add_argument(
+        "--mode",
+        choices=MODES,
+        default="backward",
+        help="backward: breaking if data valid against old may be invalid against "
+        "new (default); forward: the other way around; full: both",
+    )
+    arg_parser.add_argument(
+        "--breaking", action="store_true", help="Only print breaking changes"
+    )
+    args = arg_parser.parse_args(argv)
+
+    _import_from_cwd()
+    result = diff_documents(
+        load_schemas(args.old), load_schemas(args.new), mode=args.mode
+    )
+    for change in result.changes:
+        if change.breaking or not args.breaking:
+            print(change)
+    breaking = len(result.breaking)
+    print(
+        f"{result.compared} definitions compared, {result.unchanged} unchanged: "
+        f"{breaking} breaking and {len(result.changes) - breaking} compatible "
+        f"changes, {result.elapsed:.2f}s",
+        file=sys.stderr,
+    )
+    return 1 if breaking else 0
+
+
+def stats_command(argv):
+    arg_parser = argparse.ArgumentParser(
+        prog="dc_schema stats",
+        description="Print the size of a schema and of its largest definitions "
+        "and fields. With limits, exits with status 1 if the schema exceeds any.",
+    )
+    arg_parser.add_argument(
+        "target",
+        help="A dataclass as `module:qualname`, a package (all of its dataclasses "
+        "in one bundle), or a JSON schema file with --schema",
+    )
+    arg_parser.add_argument(
+        "--schema",
+        action="store_true",
+        help="Read the schema from the file given instead of generating it",
+    )
+    arg_parser.add_argument(
+        "-n",
+        "--limit",
+        type=int,
+        default=10,
+        help="The number of definitions and fields to print",
+    )
+    for limit, help_ in (
+        ("nodes", "JSON values in the schema"),
+        ("depth", "nesting of objects and arrays in a definition"),
+        ("defs", "$defs entries"),
+        ("size", "bytes of compact JSON"),
+    ):
+        arg_parser.add_argument(
+            f"--max-{limit}", type=int, metavar="N", help=f"Limit the {help_}"
+        )
+    args = arg_parser.parse_args(argv)
+
+    if args.schema:
+        with open(args.target) as f:
+            schema = json.load(f)
+    else:
+        _import_from_cwd()
+        if ":" in args.target:
+            schema = get_schema(load(args.target))
+        else:
+            schema = get_schemas(find_dataclasses(import_package(args.target))).schema
+    stats = schema_stats(schema)
+    print(
+        f"{stats.nodes} nodes, {stats.size} bytes, depth {stats.depth}, "
+        f"{len(schema.get('$defs', {}))} $defs"
+    )
+    for title, costs in (("definition", stats.definitions), ("field", stats.fields)):
+        if costs:
+            print(f"{'nodes':>8} {'bytes':>10} {'depth':>6}  {title}")
+            for c in costs[: args.limit]:
+                print(f"{c.nodes:8} {c.size:10} {c.depth:6}  {c.name}")
+
+    budget = Budget(args.max_nodes, args.max_depth, args.max_defs, args.max_size)
+    try:
+        check_budget(schema, budget)
+    except BudgetExceeded as e:
+        print(e.report(limit=0), file=sys.stderr)
+        return 1
+    return 0
+
+
+class _Counted:
+    """Iterates the lines of a binary file, counting them."""
+
+    def __init__(self, f: t.BinaryIO) -> None:
+        self.f = f
+        self.count = 0
+
+    def __iter__(self):  # noqa: ANN204
+        for line in self.f:
+            self.count += 1
+            yield line
+
+    def __enter__(self):  # noqa: ANN204
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        if self.f is not sys.stdin.buffer:
+            self.f.close()
+
+
+def _add_output_arguments(arg_parser):
+    arg_parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="Move repeated identical subschemas into $defs",
+    )
+    arg_parser.add_argument(
+        "--compact", action="store_true", help="Write JSON without whitespace"
+    )
+    arg_parser.add_argument(
+        "--canonical",
+        action="store_true",
+        help="Sort keys, so that equal schemas are written identically",
+    )
+
+
+def _add_profile_arguments(arg_parser):
+    arg_parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print the most expensive classes, fields and types of schema "
+        "generation to stderr (generates schemas in a single process)",
+    )
+    arg_parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="Write a Chrome trace (chrome://tracing, ui.perfetto.dev) of schema "
+        "generation to FILE",
+    )
+
+
+def _profiler(args):
+    if args.profile or args.trace:
+        return Profiler(trace=bool(args.trace))
+    return None
+
+
+def _report(profiler, args):
+    if args.profile:
+        print(profiler.report(), file=sys.stderr)
+    if args.trace:
+        profiler.write_chrome_trace(args.trace)
+
+
+def _import_from_cwd():
+    # behave like `python -m`: packages in the working directory are importable
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+
+
+_COMMANDS = {
+    "diff": diff_command,
+    "generate": generate_command,
+    "scan": scan_command,
+    "serve": serve_command,
+    "stats": stats_command,
+    "validate": validate_command,
+    "watch": watch_command,
+}
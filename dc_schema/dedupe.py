@@ -0,0 +1,280 @@
+"""Hoist repeated identical subschemas into `$defs`."""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+import typing as t
+import urllib.parse
+
+# keywords whose value is a subschema, a list of subschemas or a map of them
+_SCHEMA = frozenset(
+    {
+        "items",
+        "additionalProperties",
+        "not",
+        "if",
+        "then",
+        "else",
+        "contains",
+        "propertyNames",
+        "unevaluatedItems",
+        "unevaluatedProperties",
+        "contentSchema",
+    }
+)
+_SCHEMA_LISTS = frozenset({"allOf", "anyOf", "oneOf", "prefixItems"})
+_SCHEMA_MAPS = frozenset(
+    {"properties", "patternProperties", "$defs", "dependentSchemas"}
+)
+
+# positions of a value in a schema document
+_SCHEMA_POS, _LIST_POS, _MAP_POS, _DATA_POS = range(4)
+
+
+@dataclasses.dataclass(frozen=True)
+class DedupeResult:
+    """A deduplicated schema. Sizes are in bytes of compact JSON."""
+
+    schema: dict
+    size: int
+    saved: int
+    hoisted: int
+
+
+def dedupe_schema(schema, *, min_size=64):
+    """Move subschemas that occur more than once into `$defs`.
+
+    Every occurrence of a repeated subschema of at least `min_size` bytes (as
+    compact JSON) is replaced with a `$ref`, if that makes the schema smaller.
+    Occurrences of an existing `$defs` entry elsewhere are replaced with a
+    `$ref` to it as well. `schema` is not modified.
+    """
+    nodes = _Nodes()
+    root = nodes.intern(schema, _SCHEMA_POS)
+
+    defs = {}
+    existing = {}
+    root_defs = nodes.child(root, "$defs")
+    if root_defs is not None:
+        for name, body in nodes.items(root_defs):
+            existing.setdefault(body, name)
+            defs[name] = body
+
+    # Parents are interned after their children, so walking the nodes
+    # backwards visits every parent before its children. A node is written
+    # out once per occurrence of its nearest shared ancestor (or the root).
+    shared = {}
+    emitted = [0] * len(nodes.keys)
+    for node in reversed(range(len(nodes.keys))):
+        if node == root or node in existing:
+            emitted[node] = 1
+            if node in existing and nodes.sizes[node] >= min_size:
+                shared[node] = existing[node]
+            continue
+        emitted[node] = count = sum(
+            1 if parent in shared else emitted[parent] for parent in nodes.parents[node]
+        )
+        if nodes.hoistable(node) and _saves(nodes.sizes[node], count, min_size):
+            shared[node] = None
+
+    names = set(defs)
+    for node, name in shared.items():
+        if name is None:
+            shared[node] = name = _def_name(nodes, node, names)
+            names.add(name)
+            defs[name] = node
+
+    result = nodes.build(root, _SCHEMA_POS, shared, root_defs=root_defs)
+    if defs:
+        result["$defs"] = {
+            name: nodes.build(body, _SCHEMA_POS, shared, define=True)
+            for name, body in defs.items()
+        }
+    size = nodes.sizes[root]
+    return DedupeResult(
+        result,
+        size,
+        size - len(json.dumps(result, separators=(",", ":"))),
+        len(defs) - len(existing),
+    )
+
+
+def _saves(size, count, min_size, name=8):
+    # a `{"$ref":"#/$defs/<name>"}` per occurrence and a `"<name>":` entry
+    ref = 19 + name
+    entry = 4 + name
+    return size >= min_size and count > 1 and count * size > size + entry + count * ref
+
+
+def _def_name(nodes, node, taken):
+    title = nodes.child_value(node, "title")
+    if isinstance(title, str) and title and title not in taken:
+        return title
+    for i in range(1, len(taken) + 2):
+        name = f"Shared{i}"
+        if name not in taken:
+            return name
+    raise AssertionError("unreachable")
+
+
+class _Nodes:
+    """Hash-consed schema tree: every distinct subtree gets one integer id.
+
+    A node is keyed by its position (the same dict can be a schema or data),
+    its kind and its items, with children referred to by id.
+    """
+
+    def __init__(self) -> None:
+        # by node id: the key, the value of scalars, the JSON size and the
+        # parents in the schema
+        self.ids: dict[tuple, int] = {}
+        self.keys: list[tuple] = []
+        self.values: list[t.Any] = []
+        self.sizes: list[int] = []
+        self.parents: list[list[int]] = []
+
+    def intern(self, value, pos):
+        # Children before their parents, with an explicit stack as schemas
+        # can be arbitrarily deep: the ids of the children of a container are
+        # the last results when it is popped the second time.
+        results = []
+        stack = [(value, pos, False)]
+        while stack:
+            value, pos, expanded = stack.pop()
+            if expanded:
+                start = len(results) - len(value)
+                ids = results[start:]
+                del results[start:]
+                results.append(self.add(value, pos, ids))
+            elif isinstance(value, dict):
+                stack.append((value, pos, True))
+                stack.extend(
+                    (v, _child_pos(pos, k), False) for k, v in reversed(value.items())
+                )
+            elif isinstance(value, list):
+                stack.append((value, pos, True))
+                item_pos = _item_pos(pos)
+                stack.extend((v, item_pos, False) for v in reversed(value))
+            else:
+                results.append(self.add(value, pos, ()))
+        return results[0]
+
+    def add(self, value, pos, ids):
+        """The node of `value`, whose children are the nodes `ids`."""
+        if isinstance(value, dict):
+            items = tuple(zip(value, ids))
+            key = (pos, "d", items)
+            size = _container_size(len(items)) + sum(
+                len(json.dumps(k)) + 1 + self.sizes[c] for k, c in items
+            )
+            children = ids
+        elif isinstance(value, list):
+            items = tuple(ids)
+            key = (pos, "l", items)
+            size = _container_size(len(items)) + sum(self.sizes[c] for c in items)
+            children = items
+        else:
+            try:
+                text = json.dumps(value)
+            except (TypeError, ValueError):
+                # not JSON, kept as is and never shared
+                key = (pos, "o", id(value))
+                size = 0
+            else:
+                key = (pos, "s", text)
+                size = len(text)
+            children = ()
+        node = self.ids.get(key)
+        if node is None:
+            node = self.ids[key] = len(self.keys)
+            self.keys.append(key)
+            self.values.append(value if key[1] in ("s", "o") else None)
+            self.sizes.append(size)
+            self.parents.append([])
+            if pos != _DATA_POS:
+                for child in children:
+                    if self.keys[child][0] != _DATA_POS:
+                        self.parents[child].append(node)
+        return node
+
+    def hoistable(self, node):
+        pos, kind, _ = self.keys[node]
+        return pos == _SCHEMA_POS and kind == "d"
+
+    def items(self, node):
+        _, kind, items = self.keys[node]
+        return items if kind == "d" else ()
+
+    def child(self, node, name):
+        for k, child in self.items(node):
+            if k == name:
+                return child
+        return None
+
+    def child_value(self, node, name):
+        child = self.child(node, name)
+        return None if child is None else self.values[child]
+
+    def build(self, node, pos, shared, *, define=False, root_defs=None):
+        # Top down: every container is created with its keys (or length) in
+        # order, and filled as its children are built.
+        result = [None]
+        stack = [(result, 0, node, pos)]
+        while stack:
+            parent, index, node, pos = stack.pop()
+            if pos == _SCHEMA_POS and not define and node in shared:
+                value = {"$ref": f"#/$defs/{urllib.parse.quote(shared[node])}"}
+            else:
+                key = self.keys[node]
+                kind = key[1]
+                if kind == "d":
+                    items = [
+                        (k, child)
+                        for k, child in key[2]
+                        if not (
+                            root_defs is not None
+                            and child == root_defs
+                            and k == "$defs"
+                        )
+                    ]
+                    value = dict.fromkeys(k for k, _ in items)
+                    stack.extend(
+                        (value, k, child, _child_pos(pos, k)) for k, child in items
+                    )
+                elif kind == "l":
+                    value = [None] * len(key[2])
+                    item_pos = _item_pos(pos)
+                    stack.extend(
+                        (value, i, child, item_pos) for i, child in enumerate(key[2])
+                    )
+                else:
+                    value = self.values[node]
+            parent[index] = value
+            # `define` and `root_defs` only apply to the root
+            define = False
+            root_defs = None
+        return result[0]
+
+
+def _child_pos(pos, key):
+    if pos == _SCHEMA_POS:
+        if key in _SCHEMA:
+            return _SCHEMA_POS
+        if key in _SCHEMA_LISTS:
+            return _LIST_POS
+        if key in _SCHEMA_MAPS:
+            return _MAP_POS
+        return _DATA_POS
+    if pos == _MAP_POS:
+        return _SCHEMA_POS
+    return _DATA_POS
+
+
+def _item_pos(pos):
+    return _SCHEMA_POS if pos == _LIST_POS else _DATA_POS
+
+
+def _container_size(n):
+    # brackets and the commas between items
+    return 2 + max(n - 1, 0)
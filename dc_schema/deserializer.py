@@ -0,0 +1,477 @@
+"""Compile dataclasses into fast constructors from decoded JSON data.
+
+The inverse of `dc_schema.serializer`: ISO 8601 strings become dates and
+datetimes, enum values their members, and arrays become tuples and sets where
+the field types say so. With `validate=True` the data is also checked against
+the schema of the dataclass while the instance is built, so it is only
+traversed once.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import datetime
+import enum
+import json
+import numbers
+import re
+import types
+import typing as t
+import weakref
+
+from dc_schema import _MISSING, SchemaAnnotation, TypeRegistry, _GetSchema, validator
+from dc_schema.hints import type_hints
+from dc_schema.validator import ValidationError, _error
+
+_KINDS = {
+    "null": "{v} is None",
+    "boolean": "({v} is True or {v} is False)",
+    "integer": "isinstance({v}, int) and {v}.__class__ is not bool",
+    "number": "isinstance({v}, float)",
+    "string": "isinstance({v}, str)",
+    "object": "isinstance({v}, dict)",
+    "array": "isinstance({v}, list)",
+}
+# the shapes of ISO 8601 strings, to tell dates from datetimes (which would
+# parse both) and from other strings in unions
+_ISO_SHAPES = {
+    datetime.datetime: re.compile(r"\d{4}-\d\d-\d\d[Tt ]").match,
+    datetime.date: re.compile(r"\d{4}-\d\d-\d\d$").match,
+}
+# raised by constructors given data of another branch of a union
+_CONVERSION_ERRORS = (ValueError, TypeError, KeyError, AttributeError)
+
+
+class Deserializer:
+    """Builds instances of a dataclass from decoded JSON data (or bytes)."""
+
+    def __init__(
+        self, dc: type, source: str, function: t.Callable, validate: bool
+    ) -> None:
+        self.dc = dc
+        self.source = source
+        self.validate = validate
+        self._function = function
+
+    def __call__(self, data: t.Any) -> t.Any:
+        if self.validate:
+            return self._function(data, None)
+        return self._function(data)
+
+    def loads(self, s):
+        return self(json.loads(s))
+
+
+_deserializers: weakref.WeakKeyDictionary[type, dict[bool, Deserializer]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def compile_deserializer(dc, *, validate=False, registry=None):
+    """Compile a deserializer for the dataclass `dc`.
+
+    Every field is built by code specialized for its declared type. Unions
+    pick their branch by the JSON type of the value, then by the required
+    keys of dataclasses, the values of enums and literals or the shape of
+    dates and datetimes; a branch failing to convert the value falls through
+    to the next one.
+
+    Without `validate` the data is trusted to match the schema of `dc`; with
+    it, a `dc_schema.validator.ValidationError` is raised for the first
+    error. Deserializers for the default registry are cached per dataclass.
+    """
+    if registry is not None:
+        return _Compiler(registry, validate).compile(dc)
+    compiled = _deserializers.setdefault(dc, {})
+    if validate not in compiled:
+        compiled[validate] = _Compiler(deserializer_handlers, validate).compile(dc)
+    return compiled[validate]
+
+
+class _Compiler:
+    def __init__(self, registry: TypeRegistry, validate: bool) -> None:
+        self.registry = registry
+        self.validate = validate
+        # validation keywords are compiled by the validator, sharing names
+        self.checks = validator._Compiler({})
+        self.namespace = self.checks.namespace
+        self.namespace.update(
+            ValidationError=ValidationError, _to_enum=_to_enum, _parse=_parse
+        )
+        self.ids = self.checks.ids
+        self.functions: dict[type, str] = {}
+        self.checked: dict[tuple, str] = {}
+        self.lines: list[str] = []
+
+    def compile(self, dc):  # noqa: A003
+        name = self.dataclass_function(dc)
+        source = "\n\n".join([*self.lines, self.checks.drain()]).rstrip() + "\n"
+        exec(compile(source, "<dc_schema deserializer>", "exec"), self.namespace)
+        return Deserializer(dc, source, self.namespace[name], self.validate)
+
+    def const(self, value):
+        name = f"_k{next(self.ids)}"
+        self.namespace[name] = value
+        return name
+
+    def var(self):
+        return f"x{next(self.ids)}"
+
+    def call(self, function, x, path):
+        return f"{function}({x}, {path})" if self.validate else f"{function}({x})"
+
+    def expr(self, type_, x, path=None, annotation=None):
+        """An expression building the value for the decoded JSON expression `x`.
+
+        When validating, `path` is an expression for the location of `x`.
+        """
+        while t.get_origin(type_) is t.Annotated:
+            type_, annotation = t.get_args(type_)
+        try:
+            handler = self.registry.resolve(type_)
+        except NotImplementedError:
+            handler = _identity
+        if not self.validate:
+            return handler(self, type_, x, None)
+
+        try:
+            name = self.checked.get((type_, annotation))
+        except TypeError:
+            name = None
+        if name is None:
+            checks = self.checks.node(_shallow_schema(type_, annotation), "f", 0, "p0")
+            if not checks:
+                return handler(self, type_, x, path)
+            name = f"_v{next(self.ids)}"
+            with contextlib.suppress(TypeError):
+                self.checked[type_, annotation] = name
+            self.lines.append(
+                "\n".join(
+                    [f"def {name}(v0, p0):"]
+                    + [f"    {line}" for line in checks]
+                    + [f"    return {handler(self, type_, 'v0', 'p0')}"]
+                )
+            )
+        return f"{name}({x}, {path})"
+
+    def dataclass_function(self, dc):
+        if dc in self.functions:
+            return self.functions[dc]
+        name = self.functions[dc] = f"_d{next(self.ids)}"
+        hints = type_hints.get(dc)
+        v, p = ("v0", "p0") if self.validate else ("d", None)
+        args = []
+        for field in dataclasses.fields(dc):
+            if not field.init:
+                continue
+            path = f"({p}, {field.name!r})" if self.validate else None
+            value = self.expr(hints[field.name], f"{v}[{field.name!r}]", path)
+            if field.default is not _MISSING:
+                value = (
+                    f"{value} if {field.name!r} in {v} else {self.const(field.default)}"
+                )
+            elif field.default_factory is not _MISSING:
+                factory = self.const(field.default_factory)
+                value = f"{value} if {field.name!r} in {v} else {factory}()"
+            args.append(f"{field.name}={value}")
+
+        lines = [f"def {name}({v}, {p}):" if self.validate else f"def {name}({v}):"]
+        if self.validate:
+            schema = {
+                "type": "object",
+                **_dataclass_annotation(dc).schema(),
+                "properties": {field.name: True for field in dataclasses.fields(dc)},
+                "required": _required(dc),
+            }
+            lines += [f"    {line}" for line in self.checks.node(schema, "f", 0, p)]
+        lines.append(f"    return {self.const(dc)}(")
+        lines += [f"        {arg}," for arg in args]
+        lines.append("    )")
+        self.lines.append("\n".join(lines))
+        return name
+
+
+def _dataclass_annotation(dc):
+    config = getattr(dc, "SchemaConfig", None)
+    return getattr(config, "annotation", SchemaAnnotation())
+
+
+def _required(dc):
+    return [
+        field.name
+        for field in dataclasses.fields(dc)
+        if field.init
+        and field.default is _MISSING
+        and field.default_factory is _MISSING
+    ]
+
+
+def _shallow_schema(type_, annotation):
+    """The schema of `type_` without its items or fields.
+
+    These are checked as they are built.
+    """
+    annotation = SchemaAnnotation() if annotation is None else annotation
+    schema = annotation.schema()
+    origin = t.get_origin(type_) or type_
+    args = t.get_args(type_)
+    if origin is list:
+        return {"type": "array", **schema}
+    if origin is set:
+        return {"type": "array", "uniqueItems": True, **schema}
+    if origin is tuple:
+        if args and (len(args) != 2 or args[1] is not ...):
+            return {
+                "type": "array",
+                "minItems": len(args),
+                "maxItems": len(args),
+                **schema,
+            }
+        return {"type": "array", **schema}
+    if origin is dict:
+        return {"type": "object", **schema}
+    if (
+        origin is t.Union
+        or origin is t.Any
+        or origin is getattr(types, "UnionType", None)
+        or dataclasses.is_dataclass(origin)
+        or (isinstance(origin, type) and issubclass(origin, enum.Enum))
+    ):
+        return schema
+    try:
+        return _GetSchema().get_field_schema(type_, _MISSING, annotation)
+    except NotImplementedError:
+        return schema
+
+
+def _to_enum(cls, value, path):
+    try:
+        return cls(value)
+    except ValueError:
+        message = f"{value!r} is not one of {[m.value for m in cls]!r}"
+        raise _error(message, path) from None
+
+
+def _parse(parse, value, path):
+    try:
+        return parse(value)
+    except ValueError as e:
+        raise _error(str(e), path) from None
+
+
+def _identity(compiler, type_, x, path):
+    return x
+
+
+def _dataclass(compiler, type_, x, path):
+    return compiler.call(compiler.dataclass_function(type_), x, path)
+
+
+def _enum(compiler, type_, x, path):
+    if compiler.validate:
+        return f"_to_enum({compiler.const(type_)}, {x}, {path})"
+    return f"{compiler.const(type_)}({x})"
+
+
+def _fromisoformat(compiler, type_, x, path):
+    parse = compiler.const(type_.fromisoformat)
+    if compiler.validate:
+        return f"_parse({parse}, {x}, {path})"
+    return f"{parse}({x})"
+
+
+def _number(compiler, type_, x, path):
+    return x if issubclass(type_, (int, float)) else f"{compiler.const(type_)}({x})"
+
+
+def _sequence(compiler, type_, x, path):
+    origin = t.get_origin(type_) or type_
+    args = t.get_args(type_)
+    if origin is tuple and args and (len(args) != 2 or args[1] is not ...):
+        # fixed length tuple: build each position
+        name = f"_t{next(compiler.ids)}"
+        v, p = ("v0", "p0") if compiler.validate else ("v0", None)
+        items = "".join(
+            compiler.expr(arg, f"{v}[{i}]", f"({p}, {i})" if p else None) + ", "
+            for i, arg in enumerate(args)
+        )
+        params = f"{v}, {p}" if p else v
+        compiler.lines.append(f"def {name}({params}):\n    return ({items})")
+        return compiler.call(name, x, path)
+
+    v = compiler.var()
+    if compiler.validate:
+        i = compiler.var()
+        item = compiler.expr(args[0] if args else t.Any, v, f"({path}, {i})")
+        loop = f"for {i}, {v} in enumerate({x})"
+    else:
+        item = compiler.expr(args[0] if args else t.Any, v)
+        loop = f"for {v} in {x}"
+    if item == v:
+        return f"{origin.__name__}({x})"
+    if origin is set:
+        return f"{{{item} {loop}}}"
+    if origin is tuple:
+        return f"tuple([{item} {loop}])"
+    return f"[{item} {loop}]"
+
+
+def _dict(compiler, type_, x, path):
+    args = t.get_args(type_)
+    v = compiler.var()
+    k = compiler.var()
+    item = compiler.expr(
+        args[1] if args else t.Any, v, f"({path}, {k})" if compiler.validate else None
+    )
+    if item == v:
+        return f"dict({x})"
+    return f"{{{k}: {item} for {k}, {v} in {x}.items()}}"
+
+
+def _union(compiler, type_, x, path):
+    args = t.get_args(type_)
+    if not compiler.validate:
+        items = [compiler.expr(arg, x) for arg in args]
+        if all(item == x for item in items):
+            return x
+        if len(args) == 2 and type(None) in args:
+            # `x` is always a cheap expression (variable or subscript)
+            item = items[1 - args.index(type(None))]
+            return f"(None if {x} is None else {item})"
+    return compiler.call(_union_function(compiler, args), x, path)
+
+
+def _union_function(compiler, args):
+    # dispatch on the JSON type of the value, then on cheap discriminators
+    v, p = "v0", "p0" if compiler.validate else None
+    candidates = {kind: [] for kind in _KINDS}
+    for arg in args:
+        discriminator, rank = _discriminator(compiler, arg, v)
+        for kind in _json_kinds(arg):
+            candidates[kind].append((discriminator is None, rank, arg, discriminator))
+
+    lines = []
+    for kind, branches in candidates.items():
+        if not branches:
+            continue
+        lines.append(f"    if {_KINDS[kind].format(v=v)}:")
+        branches.sort(key=lambda b: b[:2])
+        for i, (_, _, arg, discriminator) in enumerate(branches):
+            last = i == len(branches) - 1
+            item = "None" if arg is type(None) else compiler.expr(arg, v, p)
+            body = [f"return {item}"]
+            if compiler.validate and not last:
+                body = ["try:", f"    {body[0]}", "except ValidationError:", "    pass"]
+            elif item != v and not last:
+                # without validation, a failing conversion tries the next branch
+                errors = compiler.const(_CONVERSION_ERRORS)
+                body = ["try:", f"    {body[0]}", f"except {errors}:", "    pass"]
+            if discriminator is not None and not last:
+                body = [f"if {discriminator}:", *(f"    {line}" for line in body)]
+            lines += [f"        {line}" for line in body]
+            if discriminator is None and item == v and not compiler.validate:
+                break
+    if compiler.validate:
+        error = "%r is not valid under any of the given schemas"
+        lines.append(f"    raise _error({error!r} % ({v},), {p})")
+    else:
+        lines.append(f"    return {v}")
+
+    name = f"_u{next(compiler.ids)}"
+    params = f"{v}, {p}" if compiler.validate else v
+    compiler.lines.append("\n".join([f"def {name}({params}):", *lines]))
+    return name
+
+
+def _discriminator(compiler, type_, v):
+    """A cheap check that the value belongs to `type_` and a sort rank."""
+    while t.get_origin(type_) is t.Annotated:
+        type_ = t.get_args(type_)[0]
+    if t.get_origin(type_) is t.Literal:
+        return f"{v} in {compiler.const(t.get_args(type_))}", 0
+    if dataclasses.is_dataclass(type_):
+        # the dataclasses requiring the most keys are tried first
+        required = frozenset(_required(type_))
+        return f"{v}.keys() >= {compiler.const(required)}", -len(required)
+    if isinstance(type_, type) and type_ in _ISO_SHAPES:
+        return f"{compiler.const(_ISO_SHAPES[type_])}({v})", 0
+    if isinstance(type_, type) and issubclass(type_, enum.Enum):
+        try:
+            values = frozenset(member.value for member in type_)
+        except TypeError:
+            return None, 0
+        return f"{v} in {compiler.const(values)}", 0
+    return None, 0
+
+
+def _json_kinds(type_):
+    """The JSON types of the values of `type_`."""
+    return list(dict.fromkeys(_kinds(type_)))
+
+
+def _kinds(type_):
+    while t.get_origin(type_) is t.Annotated:
+        type_ = t.get_args(type_)[0]
+    origin = t.get_origin(type_) or type_
+    if type_ is None or type_ is type(None):
+        return ["null"]
+    if origin is t.Literal:
+        return [_value_kind(arg) for arg in t.get_args(type_)]
+    if origin is t.Union or origin is getattr(types, "UnionType", None):
+        return [kind for arg in t.get_args(type_) for kind in _kinds(arg)]
+    if not isinstance(origin, type) or origin is t.Any:
+        return list(_KINDS)
+    if dataclasses.is_dataclass(origin) or issubclass(origin, dict):
+        return ["object"]
+    if issubclass(origin, enum.Enum):
+        return [_value_kind(member.value) for member in origin]
+    if issubclass(origin, bool):
+        return ["boolean"]
+    if issubclass(origin, int):
+        return ["integer"]
+    if issubclass(origin, numbers.Number):
+        return ["integer", "number"]
+    if issubclass(origin, (str, datetime.date)):
+        return ["string"]
+    if issubclass(origin, (list, tuple, set, frozenset)):
+        return ["array"]
+    return list(_KINDS)
+
+
+def _value_kind(value):
+    if isinstance(value, enum.Enum):
+        value = value.value
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, dict):
+        return "object"
+    return "array"
+
+
+deserializer_handlers = TypeRegistry(dataclass_handler=_dataclass)
+deserializer_handlers.register(t.Union, _union)
+deserializer_handlers.register(t.Literal, _identity)
+deserializer_handlers.register(t.Any, _identity, subclasses=False)
+deserializer_handlers.register(None, _identity)
+deserializer_handlers.register(type(None), _identity, subclasses=False)
+deserializer_handlers.register(dict, _dict, subclasses=False)
+deserializer_handlers.register(list, _sequence, subclasses=False)
+deserializer_handlers.register(tuple, _sequence, subclasses=False)
+deserializer_handlers.register(set, _sequence, subclasses=False)
+deserializer_handlers.register(str, _identity, subclasses=False)
+deserializer_handlers.register(bool, _identity, subclasses=False)
+deserializer_handlers.register(int, _identity, subclasses=False)
+deserializer_handlers.register(enum.Enum, _enum)
+deserializer_handlers.register(numbers.Number, _number)
+deserializer_handlers.register(datetime.date, _fromisoformat)
+if hasattr(types, "UnionType"):
+    deserializer_handlers.register(types.UnionType, _union)
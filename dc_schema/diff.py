@@ -0,0 +1,694 @@
+"""Compare schemas definition by definition and classify the changes."""
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+from dc_schema import get_schemas
+
+MODES = ("backward", "forward", "full")
+
+# keywords that do not change which instances are valid
+_ANNOTATIONS = frozenset(
+    {
+        "$schema",
+        "$id",
+        "$comment",
+        "title",
+        "description",
+        "default",
+        "examples",
+        "deprecated",
+        "readOnly",
+        "writeOnly",
+    }
+)
+_LOWER_BOUNDS = frozenset(
+    {
+        "minimum",
+        "exclusiveMinimum",
+        "minLength",
+        "minItems",
+        "minProperties",
+        "minContains",
+    }
+)
+_UPPER_BOUNDS = frozenset(
+    {
+        "maximum",
+        "exclusiveMaximum",
+        "maxLength",
+        "maxItems",
+        "maxProperties",
+        "maxContains",
+    }
+)
+# compared together with another keyword
+_COMBINED = frozenset({"required", "additionalProperties", "const", "$defs"})
+
+_PACKAGE = """
+import json, sys
+sys.path.insert(0, sys.argv[1])
+from dc_schema.diff import package_schema
+json.dump(package_schema(sys.argv[2]), sys.stdout)
+"""
+
+
+@dataclasses.dataclass(frozen=True)
+class Change:
+    """A change at `pointer`, a JSON pointer into `document`.
+
+    A change is breaking if an instance valid against one of the schemas may
+    be invalid against the other, depending on the mode of the comparison (see
+    `diff_schemas`).
+    """
+
+    document: str
+    pointer: str
+    message: str
+    breaking: bool
+
+    def __str__(self) -> str:
+        kind = "breaking" if self.breaking else "compatible"
+        return f"{kind}: {self.document}{self.pointer}: {self.message}"
+
+
+@dataclasses.dataclass
+class SchemaDiff:
+    """The changes between two sets of schemas.
+
+    `compared` counts the distinct definitions found in both, of which
+    `unchanged` were identical.
+    """
+
+    changes: list[Change]
+    compared: int
+    unchanged: int
+    elapsed: float
+
+    @property
+    def breaking(self):
+        return [change for change in self.changes if change.breaking]
+
+
+def diff_schemas(old, new, *, mode="backward"):
+    """Compare two schemas (e.g. of `get_schema`, or bundles of `get_schemas`).
+
+    Definitions are compared by name: the root schema and every `$defs` entry.
+    Definitions with the same content hash are skipped. For the others, every
+    keyword is compared by its meaning: e.g. a property becoming required, an
+    `anyOf` losing a branch or an enum losing a value narrows the schema (some
+    instances that were valid are not anymore), while an optional property or
+    an enum value being added widens it. Annotations such as `description` or
+    `default` neither narrow nor widen it. Instances are assumed to contain
+    only declared properties, so that adding an optional property widens a
+    schema even if it allows additional properties.
+
+    With `mode="backward"` (the default) a change is breaking if it narrows
+    the schema: data valid against `old` may be rejected by `new`. With
+    `"forward"` a change is breaking if it widens the schema, and with
+    `"full"` if it does either.
+    """
+    return diff_documents({"": old}, {"": new}, mode=mode)
+
+
+def diff_documents(old, new, *, mode="backward"):
+    """Compare two sets of schemas, dicts of document names to schemas (e.g.
+    the files written by `scan`).
+
+    Documents are matched by name, and compared like with `diff_schemas`.
+    Definitions repeated in several documents are compared once: a change is
+    reported in the first document (by name) it occurs in.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {', '.join(MODES)}, not {mode!r}")
+    start = time.perf_counter()
+    result = SchemaDiff([], 0, 0, 0.0)
+    compared = {}
+    for name in sorted(old.keys() | new.keys()):
+        if name not in new:
+            result.changes.append(
+                Change(name, "", "document removed", mode != "forward")
+            )
+            continue
+        if name not in old:
+            result.changes.append(
+                Change(name, "", "document added", mode != "backward")
+            )
+            continue
+        differ = _Differ(old[name], new[name])
+        for pointer, (old_def, new_def) in differ.definitions().items():
+            if old_def is None or new_def is None:
+                narrows = old_def is not None
+                differ.emit(
+                    pointer,
+                    f"definition {'removed' if narrows else 'added'}",
+                    narrows=narrows,
+                    widens=not narrows,
+                )
+                continue
+            hashes = (_hash(old_def), _hash(new_def))
+            if hashes in compared:
+                continue
+            compared[hashes] = True
+            result.compared += 1
+            if hashes[0] == hashes[1]:
+                result.unchanged += 1
+                continue
+            differ.compare(old_def, new_def, pointer)
+        result.changes.extend(
+            Change(name, pointer, message, _breaking(mode, narrows, widens))
+            for pointer, message, narrows, widens in differ.changes
+        )
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def load_schemas(source):
+    """Documents to compare with `diff_documents`, from `source`.
+
+    `source` is a JSON schema file, a directory of them (e.g. written by
+    `scan`), or the importable name of a package, optionally followed by
+    `@<path>` to import it from another source tree (see `package_schema`).
+    """
+    if os.path.isfile(source):
+        with open(source, "rb") as f:
+            return {"": json.load(f)}
+    if os.path.isdir(source):
+        documents = {}
+        for root, dirs, names in os.walk(source):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            for name in sorted(names):
+                if name.endswith(".json") and not name.startswith("."):
+                    path = os.path.join(root, name)
+                    with open(path, "rb") as f:
+                        documents[os.path.relpath(path, source)] = json.load(f)
+        return documents
+    package, _, path = source.partition("@")
+    return {"": package_schema(package, path or None)}
+
+
+def package_schema(package, path=None):
+    """The bundle of every dataclass in `package` (see `get_schemas`), named by
+    their module and qualified name.
+
+    With a `path` the package is imported from the source tree at `path`, in
+    a subprocess, so that two versions of a package can be compared.
+    """
+    if path is not None:
+        # the dc_schema of this process, even if it is not installed
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env_path = os.environ.get("PYTHONPATH")
+        env = {
+            **os.environ,
+            "PYTHONPATH": f"{root}{os.pathsep}{env_path}" if env_path else root,
+        }
+        process = subprocess.run(
+            [sys.executable, "-c", _PACKAGE, os.path.abspath(path), package],
+            env=env,
+            capture_output=True,
+            check=False,
+        )
+        if process.returncode:
+            raise RuntimeError(
+                f"cannot import {package} from {path}:\n"
+                f"{process.stderr.decode(errors='replace')}"
+            )
+        return json.loads(process.stdout)
+    from dc_schema.scan import find_dataclasses, import_package
+
+    return get_schemas(find_dataclasses(import_package(package))).schema
+
+
+def _breaking(mode, narrows, widens):
+    if mode == "backward":
+        return narrows
+    if mode == "forward":
+        return widens
+    return narrows or widens
+
+
+def _hash(schema):
+    text = json.dumps(schema, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+class _Differ:
+    """Compares the definitions of two schema documents."""
+
+    def __init__(self, old: dict, new: dict) -> None:
+        self.old = old
+        self.new = new
+        self.changes: list[tuple[str, str, bool, bool]] = []
+
+    def definitions(self):
+        # `{pointer: (old, new)}` of the root schema and every `$defs` entry
+        definitions = {"#": (_root(self.old), _root(self.new))}
+        old_defs = _defs(self.old)
+        new_defs = _defs(self.new)
+        for name in sorted(old_defs.keys() | new_defs.keys()):
+            definitions[f"#/$defs/{_escape(name)}"] = (
+                old_defs.get(name),
+                new_defs.get(name),
+            )
+        return definitions
+
+    def emit(self, pointer, message, *, narrows, widens):
+        self.changes.append((pointer, message, narrows, widens))
+
+    def compare(self, old, new, pointer):
+        if old == new:
+            return
+        if isinstance(old, bool) or isinstance(new, bool):
+            self.compare_bool(old, new, pointer)
+            return
+        if not isinstance(old, dict) or not isinstance(new, dict):
+            self.emit(pointer, "schema changed", narrows=True, widens=True)
+            return
+        if ("anyOf" in old) != ("anyOf" in new):
+            # e.g. `int` becoming `Optional[int]`
+            old, new = _lift_any_of(old), _lift_any_of(new)
+        for keyword in sorted(old.keys() | new.keys()):
+            if keyword in _COMBINED:
+                continue
+            path = f"{pointer}/{_escape(keyword)}"
+            old_value = old.get(keyword, _ABSENT)
+            new_value = new.get(keyword, _ABSENT)
+            if keyword == "properties":
+                self.compare_object(old, new, pointer)
+            elif keyword == "enum":
+                self.compare_values(old, new, pointer)
+            elif old_value == new_value:
+                continue
+            elif keyword in _ANNOTATIONS:
+                self.emit(
+                    path,
+                    _changed(keyword, old_value, new_value),
+                    narrows=False,
+                    widens=False,
+                )
+            elif keyword == "type":
+                self.compare_type(old_value, new_value, path, old, new)
+            elif keyword in ("anyOf", "oneOf"):
+                self.compare_branches(old_value, new_value, path, union=True)
+            elif keyword == "allOf":
+                self.compare_branches(old_value, new_value, path, union=False)
+            elif keyword == "$ref":
+                self.compare_ref(old_value, new_value, path)
+            elif keyword in _LOWER_BOUNDS or keyword in _UPPER_BOUNDS:
+                self.compare_bound(keyword, old_value, new_value, path)
+            elif keyword == "patternProperties" and _ABSENT not in (
+                old_value,
+                new_value,
+            ):
+                for pattern in sorted(old_value.keys() | new_value.keys()):
+                    self.compare_optional(
+                        old_value.get(pattern, _ABSENT),
+                        new_value.get(pattern, _ABSENT),
+                        f"{path}/{_escape(pattern)}",
+                    )
+            elif keyword == "prefixItems" and _ABSENT not in (old_value, new_value):
+                if len(old_value) != len(new_value):
+                    self.emit(
+                        path,
+                        f"{len(old_value)} items became {len(new_value)}",
+                        narrows=True,
+                        widens=True,
+                    )
+                for i, (old_item, new_item) in enumerate(zip(old_value, new_value)):
+                    self.compare(old_item, new_item, f"{path}/{i}")
+            elif keyword in ("items", "contains", "not", "propertyNames"):
+                self.compare_optional(
+                    old_value, new_value, path, negated=keyword == "not"
+                )
+            else:
+                self.compare_optional(old_value, new_value, path, constraint=True)
+        if "properties" not in old and "properties" not in new:
+            self.compare_object(old, new, pointer)
+        if "enum" not in old and "enum" not in new:
+            self.compare_values(old, new, pointer)
+
+    def compare_bool(self, old, new, pointer):
+        # `true` and `{}` allow anything, `false` nothing
+        if old is True or old == {}:
+            self.emit(pointer, "schema constrained", narrows=True, widens=False)
+        elif new is True or new == {}:
+            self.emit(pointer, "schema unconstrained", narrows=False, widens=True)
+        elif old is False:
+            self.emit(pointer, "schema allowed", narrows=False, widens=True)
+        else:
+            self.emit(pointer, "schema disallowed", narrows=True, widens=False)
+
+    def compare_optional(self, old, new, path, *, negated=False, constraint=False):
+        # A subschema, or for `constraint` any value, that may be absent. Adding
+        # one narrows the schema, removing one widens it.
+        if old is _ABSENT or new is _ABSENT or constraint:
+            added = old is _ABSENT
+            removed = new is _ABSENT
+            message = _changed(path.rsplit("/", 1)[-1], old, new)
+            self.emit(path, message, narrows=not removed, widens=not added)
+        elif negated:
+            # comparing the negated schemas swaps narrowing and widening
+            inner = _Differ(self.old, self.new)
+            inner.compare(old, new, path)
+            for pointer, message, narrows, widens in inner.changes:
+                self.emit(pointer, message, narrows=widens, widens=narrows)
+        else:
+            self.compare(old, new, path)
+
+    def compare_type(self, old, new, path, old_schema, new_schema):
+        # With an `enum` or `const`, the values allowed are known: a type
+        # narrows (or widens) only if some of them do not have it, e.g. not
+        # when `Literal["a", "b"]` becomes `str`.
+        old_values = _values(old_schema)
+        new_values = _values(new_schema)
+        if old_values is not None or new_values is not None:
+            narrows = old_values is not None and not all(
+                _has_type(value, new) for value in old_values.values()
+            )
+            widens = new_values is not None and not all(
+                _has_type(value, old) for value in new_values.values()
+            )
+            self.emit(path, _changed("type", old, new), narrows=narrows, widens=widens)
+            return
+        if old is _ABSENT or new is _ABSENT:
+            self.compare_optional(old, new, path, constraint=True)
+            return
+        old_types = _types(old)
+        new_types = _types(new)
+        removed = sorted(
+            type_
+            for type_ in old_types - new_types
+            if not (type_ == "integer" and "number" in new_types)
+        )
+        added = sorted(
+            type_
+            for type_ in new_types - old_types
+            if not (type_ == "integer" and "number" in old_types)
+        )
+        if removed:
+            self.emit(
+                path, f"type {', '.join(removed)} removed", narrows=True, widens=False
+            )
+        if added:
+            self.emit(
+                path, f"type {', '.join(added)} added", narrows=False, widens=True
+            )
+
+    def compare_object(self, old, new, pointer):
+        old_properties = old.get("properties", {})
+        new_properties = new.get("properties", {})
+        old_required = set(old.get("required", ()))
+        new_required = set(new.get("required", ()))
+        new_closed = new.get("additionalProperties", True) is False
+        for name in sorted(old_properties.keys() | new_properties.keys()):
+            path = f"{pointer}/properties/{_escape(name)}"
+            if name not in new_properties:
+                # data with the property is rejected by a closed schema
+                self.emit(
+                    path,
+                    f"property {name!r} removed",
+                    narrows=new_closed,
+                    widens=not new_closed,
+                )
+            elif name not in old_properties:
+                required = name in new_required
+                self.emit(
+                    path,
+                    f"{'required' if required else 'optional'} property {name!r} added",
+                    narrows=required,
+                    widens=True,
+                )
+            else:
+                self.compare(old_properties[name], new_properties[name], path)
+        for name in sorted(old_required ^ new_required):
+            if name in old_properties and name not in new_properties:
+                continue
+            if name in new_properties and name not in old_properties:
+                continue
+            path = f"{pointer}/required"
+            if name in new_required:
+                self.emit(
+                    path,
+                    f"property {name!r} became required",
+                    narrows=True,
+                    widens=False,
+                )
+            else:
+                self.emit(
+                    path,
+                    f"property {name!r} became optional",
+                    narrows=False,
+                    widens=True,
+                )
+        old_additional = old.get("additionalProperties", True)
+        new_additional = new.get("additionalProperties", True)
+        if old_additional != new_additional:
+            self.compare(
+                old_additional, new_additional, f"{pointer}/additionalProperties"
+            )
+
+    def compare_values(self, old, new, pointer):
+        old_values = _values(old)
+        new_values = _values(new)
+        if old_values == new_values:
+            return
+        keyword = "enum" if "enum" in old or "enum" in new else "const"
+        path = f"{pointer}/{keyword}"
+        if old_values is None or new_values is None:
+            added = old_values is None
+            self.emit(
+                path,
+                f"{keyword} {'added' if added else 'removed'}",
+                narrows=added,
+                widens=not added,
+            )
+            return
+        removed = [
+            value for text, value in old_values.items() if text not in new_values
+        ]
+        added = [value for text, value in new_values.items() if text not in old_values]
+        if removed:
+            self.emit(
+                path, f"values removed: {_list(removed)}", narrows=True, widens=False
+            )
+        if added:
+            self.emit(path, f"values added: {_list(added)}", narrows=False, widens=True)
+
+    def compare_branches(self, old, new, path, *, union):
+        old = list(old)
+        new = list(new)
+        # identical branches, in any order
+        hashes = {}
+        for branch in new:
+            hashes.setdefault(_hash(branch), []).append(branch)
+        unmatched = []
+        for i, branch in enumerate(old):
+            same = hashes.get(_hash(branch))
+            if same:
+                new.remove(same.pop())
+            else:
+                unmatched.append((i, branch))
+        # changed branches, matched by what they are (a reference, a type...)
+        removed = []
+        for i, branch in unmatched:
+            key = _branch_key(branch)
+            match = next(
+                (
+                    other
+                    for other in new
+                    if key is not None and _branch_key(other) == key
+                ),
+                None,
+            )
+            if match is None:
+                removed.append((i, branch))
+                continue
+            new.remove(match)
+            self.compare(branch, match, f"{path}/{i}")
+        if len(removed) == 1 and len(new) == 1:
+            # a single branch that changed what it is
+            (i, branch), match = removed.pop(), new.pop()
+            self.compare(branch, match, f"{path}/{i}")
+        for i, branch in removed:
+            # a union that lost a branch is narrower, an intersection wider
+            self.emit(
+                f"{path}/{i}",
+                f"{_describe(branch)} removed",
+                narrows=union,
+                widens=not union,
+            )
+        for branch in new:
+            self.emit(
+                path,
+                f"{_describe(branch)} added",
+                narrows=not union,
+                widens=union,
+            )
+
+    def compare_ref(self, old, new, path):
+        if old is _ABSENT or new is _ABSENT:
+            self.compare_optional(old, new, path, constraint=True)
+            return
+        old_target = _target(self.old, old)
+        new_target = _target(self.new, new)
+        if (
+            old_target is not None
+            and new_target is not None
+            and _hash(old_target) == _hash(new_target)
+        ):
+            self.emit(
+                path, f"reference {old} renamed to {new}", narrows=False, widens=False
+            )
+            return
+        self.emit(path, f"reference {old} changed to {new}", narrows=True, widens=True)
+
+    def compare_bound(self, keyword, old, new, path):
+        if old is _ABSENT or new is _ABSENT:
+            self.compare_optional(old, new, path, constraint=True)
+            return
+        raised = new > old
+        lower = keyword in _LOWER_BOUNDS
+        self.emit(
+            path,
+            _changed(keyword, old, new),
+            narrows=raised == lower,
+            widens=raised != lower,
+        )
+
+
+class _Absent:
+    def __repr__(self) -> str:
+        return "<absent>"
+
+
+_ABSENT = _Absent()
+
+
+def _root(schema):
+    if not isinstance(schema, dict):
+        return schema
+    return {k: v for k, v in schema.items() if k not in ("$defs", "$schema", "$id")}
+
+
+def _defs(schema):
+    defs = schema.get("$defs") if isinstance(schema, dict) else None
+    return defs if isinstance(defs, dict) else {}
+
+
+def _target(document, ref):
+    if ref == "#":
+        return _root(document)
+    if ref.startswith("#/$defs/"):
+        return _defs(document).get(_unescape(ref[len("#/$defs/") :]))
+    return None
+
+
+def _lift_any_of(schema):
+    # a schema without `anyOf` as an `anyOf` of a single branch
+    if "anyOf" in schema:
+        return schema
+    branch = {k: v for k, v in schema.items() if k not in _ANNOTATIONS}
+    if not branch:
+        return schema
+    lifted = {k: v for k, v in schema.items() if k in _ANNOTATIONS}
+    lifted["anyOf"] = [branch]
+    return lifted
+
+
+def _branch_key(schema):
+    # what a branch is, to match it with its changed version
+    if not isinstance(schema, dict):
+        return None
+    if "$ref" in schema:
+        return ("$ref", schema["$ref"])
+    all_of = schema.get("allOf")
+    if isinstance(all_of, list) and len(all_of) == 1:
+        return _branch_key(all_of[0])
+    if "type" in schema:
+        return ("type", json.dumps(schema["type"], sort_keys=True))
+    if "enum" in schema or "const" in schema:
+        return ("enum",)
+    return None
+
+
+def _describe(schema):
+    key = _branch_key(schema)
+    if key is None:
+        return "branch"
+    if key[0] == "$ref":
+        return f"branch {key[1]}"
+    if key[0] == "type":
+        return f"branch of type {', '.join(sorted(_types(json.loads(key[1]))))}"
+    return "enum branch"
+
+
+def _types(type_):
+    return {type_} if isinstance(type_, str) else set(type_)
+
+
+_TYPE_CHECKS = {
+    "null": lambda v: v is None,
+    "boolean": lambda v: isinstance(v, bool),
+    "integer": lambda v: (
+        (isinstance(v, int) and not isinstance(v, bool))
+        or (isinstance(v, float) and v.is_integer())
+    ),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "string": lambda v: isinstance(v, str),
+    "array": lambda v: isinstance(v, list),
+    "object": lambda v: isinstance(v, dict),
+}
+
+
+def _has_type(value, type_):
+    # whether the JSON `value` has the `type` (a name or list), if any
+    if type_ is _ABSENT:
+        return True
+    return any(_TYPE_CHECKS.get(name, _any)(value) for name in _types(type_))
+
+
+def _any(value):
+    return True
+
+
+def _values(schema):
+    # the allowed values by their JSON, or None for any value
+    if "enum" in schema:
+        values = schema["enum"]
+    elif "const" in schema:
+        values = [schema["const"]]
+    else:
+        return None
+    return {json.dumps(value, sort_keys=True): value for value in values}
+
+
+def _changed(keyword, old, new):
+    if old is _ABSENT:
+        return f"{keyword} added: {_json(new)}"
+    if new is _ABSENT:
+        return f"{keyword} removed (was {_json(old)})"
+    return f"{keyword} changed from {_json(old)} to {_json(new)}"
+
+
+def _list(values):
+    return ", ".join(_json(value) for value in values)
+
+
+def _json(value, limit=60):
+    text = json.dumps(value, sort_keys=True)
+    return text if len(text) <= limit else f"{text[: limit - 3]}..."
+
+
+def _escape(name):
+    return name.replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(name):
+    return name.replace("~1", "/").replace("~0", "~")
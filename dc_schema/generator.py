@@ -0,0 +1,844 @@
+"""Generate random data matching the schemas of dataclasses, e.g. for load tests.
+
+The generators follow the same type walk as `get_schema`, so the output has the
+shape described by the published schema and respects the `SchemaAnnotation`s of
+its fields: bounds, lengths, `multiple_of`, `pattern`, `format`, item counts
+and unique items.
+"""
+
+from __future__ import annotations
+
+import collections
+import concurrent.futures
+import dataclasses
+import datetime
+import enum
+import fractions
+import itertools
+import json
+import math
+import numbers
+import random
+import re
+import string
+import types
+import typing as t
+import uuid
+import weakref
+
+from dc_schema import SchemaAnnotation, TypeRegistry
+from dc_schema.hints import type_hints
+from dc_schema.validator import _not_multiple
+
+try:
+    import re._parser as _sre
+except ImportError:  # python < 3.11
+    import sre_parse as _sre
+
+_ENCODER = json.JSONEncoder(
+    ensure_ascii=False, check_circular=False, separators=(",", ":")
+)
+_LETTERS = string.ascii_letters
+_WORD = string.ascii_letters + string.digits + "_"
+_PRINTABLE = string.ascii_letters + string.digits + string.punctuation + " "
+# the spread of unbounded values
+_SPAN = 1000
+_MAX_ITEMS = 5
+_MAX_REPEAT = 8
+_ATTEMPTS = 100
+_EPOCH = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+_SECONDS = 30 * 365 * 24 * 3600
+
+
+class Generator:
+    """Generates random JSON-compatible data (or instances) of a dataclass,
+    valid against its schema.
+    """
+
+    def __init__(self, dc: type, root: _Node, max_depth: int) -> None:
+        self.dc = dc
+        self.max_depth = max_depth
+        self._root = root
+        self._random = random.Random()
+        self._deserializer = None
+
+    def __call__(self, rng=None):  # noqa: ANN204
+        return self._root(rng or self._random, self.max_depth)
+
+    def dumps(self, rng=None):
+        return _ENCODER.encode(self(rng)).encode()
+
+    def instance(self, rng=None):
+        if self._deserializer is None:
+            from dc_schema.deserializer import compile_deserializer
+
+            self._deserializer = compile_deserializer(self.dc)
+        return self._deserializer(self(rng))
+
+
+_generators: weakref.WeakKeyDictionary[type, dict[int, Generator]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def compile_generator(dc, *, max_depth=3, registry=None):
+    """Compile a generator for the dataclass `dc`.
+
+    `max_depth` limits the nesting of dataclasses, for recursive models:
+    deeper than that, optional fields are left out or `None`, lists and
+    dicts are empty and unions pick a branch that ends. A `ValueError` is
+    raised if a model cannot be generated within it, or if its annotations
+    cannot be satisfied (e.g. `minimum` above `maximum`). Generators for the
+    default registry are cached per dataclass and depth.
+    """
+    if registry is not None:
+        return _Compiler(registry).compile(dc, max_depth)
+    generators = _generators.setdefault(dc, {})
+    generator = generators.get(max_depth)
+    if generator is None:
+        generator = _Compiler(generator_handlers).compile(dc, max_depth)
+        generators[max_depth] = generator
+    return generator
+
+
+def generate_stream(
+    dc, count=None, *, seed=None, max_depth=3, workers=1, chunk_size=1000
+):
+    """Yield `count` (default: endless) random NDJSON lines of `dc`, as bytes.
+
+    The stream is lazy: lines are generated in chunks of `chunk_size` as they
+    are consumed, on a pool of `workers` processes if more than one, at most
+    two chunks per worker ahead. Every chunk has its own random generator
+    seeded from `seed` and its position, so a seed always produces the same
+    lines, whatever the number of workers.
+    """
+    for chunk in _generate_chunks(
+        dc,
+        count,
+        seed=seed,
+        max_depth=max_depth,
+        workers=workers,
+        chunk_size=chunk_size,
+    ):
+        yield from chunk.splitlines(keepends=True)
+
+
+def _generate_chunks(dc, count, *, seed, max_depth, workers, chunk_size):
+    # one bytes object per chunk is much cheaper to receive from a worker
+    if seed is None:
+        seed = random.randrange(2**64)
+    tasks = (
+        (
+            f"{seed}:{index}",
+            chunk_size if count is None else min(chunk_size, count - start),
+        )
+        for index, start in enumerate(
+            itertools.count(0, chunk_size)
+            if count is None
+            else range(0, count, chunk_size)
+        )
+    )
+    if workers <= 1:
+        # not through the worker global, so several streams can be interleaved
+        generator = compile_generator(dc, max_depth=max_depth)
+        for task in tasks:
+            yield _generate_chunk(task, generator)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(dc, max_depth)
+    ) as pool:
+        pending = collections.deque()
+        for task in tasks:
+            pending.append(pool.submit(_generate_chunk, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# the generator of a pool worker
+_generator = None
+
+
+def _init_worker(dc, max_depth):
+    global _generator
+    _generator = compile_generator(dc, max_depth=max_depth)
+
+
+def _generate_chunk(task, generator=None):
+    if generator is None:
+        generator = _generator
+    seed, lines = task
+    rng = random.Random(seed)
+    generate = generator._root
+    depth = generator.max_depth
+    encode = _ENCODER.encode
+    return "".join([encode(generate(rng, depth)) + "\n" for _ in range(lines)]).encode()
+
+
+class _Compiler:
+    def __init__(self, registry: TypeRegistry) -> None:
+        self.registry = registry
+        self.dataclasses: dict[type, _Dataclass] = {}
+        self.nodes: dict[int, _Node] = {}
+
+    def compile(self, dc, max_depth):  # noqa: A003
+        root = self.node(dc, SchemaAnnotation())
+        self.resolve_depths()
+        if root.min_depth == math.inf:
+            raise ValueError(
+                f"{dc.__qualname__} cannot be generated: its required fields "
+                "recurse without end"
+            )
+        if root.min_depth > max_depth:
+            raise ValueError(
+                f"{dc.__qualname__} cannot be generated within max_depth="
+                f"{max_depth} (it needs {root.min_depth})"
+            )
+        return Generator(dc, root, max_depth)
+
+    def node(self, type_, annotation):
+        """The generator of values of `type_`."""
+        handler = self.registry.resolve(type_)
+        node = handler(self, type_, annotation)
+        self.nodes[id(node)] = node
+        return node
+
+    def resolve_depths(self):
+        # the least dataclass nesting each node needs: decreases from infinity
+        # to a fixed point, through recursive dataclasses
+        nodes = list(self.nodes.values())
+        for node in nodes:
+            node.min_depth = math.inf
+        changed = True
+        while changed:
+            changed = False
+            for node in nodes:
+                depth = node.depth()
+                if depth < node.min_depth:
+                    node.min_depth = depth
+                    changed = True
+
+
+class _Node:
+    """Generates a value with `node(rng, depth)`, where `depth` is the
+    dataclass nesting left; `min_depth` is the least it needs.
+    """
+
+    min_depth: float = 0
+
+    def depth(self):
+        return 0
+
+
+class _Choice(_Node):
+    def __init__(self, values: list) -> None:
+        if not values:
+            raise ValueError("cannot generate a value of an empty enum")
+        self.values = values
+
+    def __call__(self, rng, depth):  # noqa: ANN204
+        values = self.values
+        return values[int(rng.random() * len(values))]
+
+
+class _Integer(_Node):
+    def __init__(self, annotation: SchemaAnnotation) -> None:
+        lo = _bound(annotation.minimum, annotation.exclusive_minimum, math.ceil, 1)
+        hi = _bound(annotation.maximum, annotation.exclusive_maximum, math.floor, -1)
+        multiple_of = annotation.multiple_of
+        if multiple_of is not None:
+            # integers that are multiples of p/q are the multiples of p
+            step = fractions.Fraction(str(multiple_of)).numerator
+        else:
+            step = 1
+        lo, hi = _span(lo, hi)
+        self.lo = -(-lo // step)
+        self.count = hi // step - self.lo + 1
+        self.step = step
+        if self.count <= 0:
+            raise ValueError(f"no integer satisfies {_describe(annotation)}")
+
+    def __call__(self, rng, depth):  # noqa: ANN204
+        return (self.lo + int(rng.random() * self.count)) * self.step
+
+
+class _Number(_Node):
+    def __init__(self, annotation: SchemaAnnotation) -> None:
+        # `numbers.Number` does not declare comparisons
+        lo: t.Any = annotation.exclusive_minimum
+        if lo is None or (annotation.minimum is not None and lo < annotation.minimum):
+            lo = annotation.minimum
+        hi: t.Any = annotation.exclusive_maximum
+        if hi is None or (annotation.maximum is not None and hi > annotation.maximum):
+            hi = annotation.maximum
+        lo, hi = _span(lo, hi)
+        self.lo = float(lo)
+        self.hi = float(hi)
+        self.exclusive = {
+            b
+            for b in (annotation.exclusive_minimum, annotation.exclusive_maximum)
+            if b is not None
+        }
+        self.multiple_of = annotation.multiple_of
+        self.annotation = annotation
+        if self.lo > self.hi:
+            raise ValueError(f"no number satisfies {_describe(annotation)}")
+        _check(self, f"no number satisfies {_describe(annotation)}")
+
+    def __call__(self, rng, depth):  # noqa: ANN204
+        lo, hi = self.lo, self.hi
+        if self.multiple_of is None:
+            for _ in range(_ATTEMPTS):
+                value = lo + rng.random() * (hi - lo)
+                if value not in self.exclusive:
+                    return value
+        else:
+            m = self.multiple_of
+            first = math.ceil(lo / m)
+            count = math.floor(hi / m) - first + 1
+            for _ in range(_ATTEMPTS):
+                value = float((first + int(rng.random() * count)) * m)
+                if (
+                    lo <= value <= hi
+                    and value not in self.exclusive
+                    and not _not_multiple(value, m)
+                ):
+                    return value
+        raise ValueError(f"no number satisfies {_describe(self.annotation)}")
+
+
+class _String(_Node):
+    def __init__(self, annotation: SchemaAnnotation) -> None:
+        self.min_length = annotation.min_length or 0
+        self.max_length = annotation.max_length
+        # of strings that are not patterns or formats
+        self.length = self.max_length
+        if self.length is None:
+            self.length = max(self.min_length, 1) + 15
+        self.regex: t.Optional[re.Pattern] = None
+        self.generate: t.Optional[t.Callable[[random.Random], str]] = None
+        if annotation.pattern is not None:
+            self.regex = re.compile(annotation.pattern)
+            self.generate = _Pattern(annotation.pattern)
+        elif annotation.format in _FORMATS:
+            self.generate = _FORMATS[annotation.format]
+        self.annotation = annotation
+        _check(self, f"no string satisfies {_describe(annotation)}")
+
+    def __call__(self, rng, depth):  # noqa: ANN204
+        if self.generate is None:
+            lo, hi = self.min_length, self.length
+            k = lo + int(rng.random() * (hi - lo + 1))
+            return _letters(rng, k)
+        for _ in range(_ATTEMPTS):
+            value = self.generate(rng)
+            if (
+                len(value) >= self.min_length
+                and (self.max_length is None or len(value) <= self.max_length)
+                and (self.regex is None or self.regex.search(value))
+            ):
+                return value
+        raise ValueError(f"no string satisfies {_describe(self.annotation)}")
+
+
+class _Constant(_Node):
+    def __init__(self, value: t.Any) -> None:
+        self.value = value
+
+    def __call__(self, rng, depth):  # noqa: ANN204
+        return self.value
+
+
+class _Boolean(_Node):
+    def __call__(self, rng, depth):  # noqa: ANN204
+        return rng.random() < 0.5
+
+
+class _Date(_Node):
+    def __call__(self, rng, depth):  # noqa: ANN204
+        return _date(rng)
+
+
+class _DateTime(_Node):
+    def __call__(self, rng, depth):  # noqa: ANN204
+        return _date_time(rng)
+
+
+class _Any(_Node):
+    def __call__(self, rng, depth):  # noqa: ANN204
+        kind = int(rng.random() * 4)
+        if kind == 0:
+            return None
+        if kind == 1:
+            return rng.random() < 0.5
+        if kind == 2:
+            return int(rng.random() * _SPAN)
+        return _letters(rng, 8)
+
+
+class _Union(_Node):
+    def __init__(self, branches: list[_Node]) -> None:
+        self.branches = branches
+        self.choices: dict[int, list[_Node]] = {}
+
+    def depth(self):
+        return min(branch.min_depth for branch in self.branches)
+
+    def __call__(self, rng, depth):  # noqa: ANN204
+        choices = self.choices.get(depth)
+        if choices is None:
+            choices = self.choices[depth] = [
+                b for b in self.branches if b.min_depth <= depth
+            ]
+        return choices[int(rng.random() * len(choices))](rng, depth)
+
+
+class _List(_Node):
+    def __init__(
+        self, item: _Node, annotation: SchemaAnnotation, unique: bool = False
+    ) -> None:
+        self.item = item
+        self.min_items = annotation.min_items or 0
+        self.max_items = annotation.max_items
+        if self.max_items is None:
+            self.max_items = self.min_items + _MAX_ITEMS
+        self.unique = unique or bool(annotation.unique_items)
+        if self.min_items > self.max_items:
+            raise ValueError(f"no array satisfies {_describe(annotation)}")
+
+    def depth(self):
+        return self.item.min_depth if self.min_items else 0
+
+    def __call__(self, rng, depth):  # noqa: ANN204
+        item = self.item
+        if item.min_depth > depth:
+            return []
+        lo, hi = self.min_items, self.max_items
+        n = lo + int(rng.random() * (hi - lo + 1))
+        if not self.unique:
+            return [item(rng, depth) for _ in range(n)]
+        items = {}
+        for _ in range(n * _ATTEMPTS):
+            if len(items) == n:
+                break
+            value = item(rng, depth)
+            items.setdefault(_unique_key(value), value)
+        if len(items) < lo:
+            raise ValueError(f"cannot generate {lo} unique items")
+        return list(items.values())
+
+
+class _Tuple(_Node):
+    def __init__(self, items: list[_Node]) -> None:
+        self.items = items
+
+    def depth(self):
+        return max((item.min_depth for item in self.items), default=0)
+
+    def __call__(self, rng, depth):  # noqa: ANN204
+        return [item(rng, depth) for item in self.items]
+
+
+class _Dict(_Node):
+    def __init__(self, value: _Node, annotation: SchemaAnnotation) -> None:
+        self.value = value
+        # keys must not match a pattern of `pattern_properties`
+        self.empty = annotation.additional_properties is False or bool(
+            annotation.pattern_properties
+        )
+
+    def __call__(self, rng, depth):  # noqa: ANN204
+        value = self.value
+        if self.empty or value.min_depth > depth:
+            return {}
+        return {
+            _letters(rng, 6): value(rng, depth) for _ in range(int(rng.random() * 4))
+        }
+
+
+class _Dataclass(_Node):
+    def __init__(self, dc: type) -> None:
+        self.dc = dc
+        self.fields: list[tuple[str, _Node, bool]] = []
+        self.min_depth = math.inf
+
+    def depth(self):
+        return 1 + max(
+            (node.min_depth for _, node, required in self.fields if required),
+            default=0,
+        )
+
+    def __call__(self, rng, depth):  # noqa: ANN204
+        depth -= 1
+        return {
+            name: node(rng, depth)
+            for name, node, _ in self.fields
+            if node.min_depth <= depth
+        }
+
+
+def _dataclass(compiler, type_, annotation):
+    node = compiler.dataclasses.get(type_)
+    if node is not None:
+        return node
+    node = compiler.dataclasses[type_] = _Dataclass(type_)
+    hints = type_hints.get(type_)
+    for field in dataclasses.fields(type_):
+        required = (
+            field.default is dataclasses.MISSING
+            and field.default_factory is dataclasses.MISSING
+        )
+        node.fields.append(
+            (field.name, compiler.node(hints[field.name], SchemaAnnotation()), required)
+        )
+    return node
+
+
+def _annotated(compiler, type_, annotation):
+    inner, metadata = t.get_args(type_)[:2]
+    return compiler.node(inner, _merge(annotation, metadata))
+
+
+def _union(compiler, type_, annotation):
+    # the annotation of a union applies to its branches
+    return _Union([compiler.node(arg, annotation) for arg in t.get_args(type_)])
+
+
+def _literal(compiler, type_, annotation):
+    return _Choice(list(t.get_args(type_)))
+
+
+def _enum(compiler, type_, annotation):
+    return _Choice([member.value for member in type_])
+
+
+def _none(compiler, type_, annotation):
+    return _Constant(None)
+
+
+def _any(compiler, type_, annotation):
+    return _Any()
+
+
+def _bool(compiler, type_, annotation):
+    return _Boolean()
+
+
+def _int(compiler, type_, annotation):
+    return _Integer(annotation)
+
+
+def _number(compiler, type_, annotation):
+    return _Number(annotation)
+
+
+def _str(compiler, type_, annotation):
+    return _String(annotation)
+
+
+def _date_node(compiler, type_, annotation):
+    return _Date()
+
+
+def _date_time_node(compiler, type_, annotation):
+    return _DateTime()
+
+
+def _list(compiler, type_, annotation):
+    args = t.get_args(type_)
+    item = compiler.node(args[0], SchemaAnnotation()) if args else _Any()
+    return _List(item, annotation)
+
+
+def _set(compiler, type_, annotation):
+    args = t.get_args(type_)
+    item = compiler.node(args[0], SchemaAnnotation()) if args else _Any()
+    return _List(item, annotation, unique=True)
+
+
+def _tuple(compiler, type_, annotation):
+    args = t.get_args(type_)
+    if len(args) == 2 and args[1] is ...:
+        return _List(compiler.node(args[0], SchemaAnnotation()), annotation)
+    if not args:
+        return _List(_Any(), annotation)
+    return _Tuple([compiler.node(arg, SchemaAnnotation()) for arg in args])
+
+
+def _dict(compiler, type_, annotation):
+    args = t.get_args(type_)
+    value = compiler.node(args[1], SchemaAnnotation()) if args else _Any()
+    return _Dict(value, annotation)
+
+
+def _merge(outer, inner):
+    # the annotations of `inner`, and those of `outer` it does not set
+    if not isinstance(inner, SchemaAnnotation):
+        return outer
+    return dataclasses.replace(
+        outer,
+        **{
+            field.name: value
+            for field in dataclasses.fields(inner)
+            if (value := getattr(inner, field.name)) is not None
+        },
+    )
+
+
+def _bound(inclusive, exclusive, round_, step):
+    # the tightest integer bound, e.g. the least integer above both minimums
+    bounds = []
+    if inclusive is not None:
+        bounds.append(round_(inclusive))
+    if exclusive is not None:
+        bounds.append(
+            math.floor(exclusive) + 1 if step > 0 else math.ceil(exclusive) - 1
+        )
+    if not bounds:
+        return None
+    return max(bounds) if step > 0 else min(bounds)
+
+
+def _span(lo, hi):
+    if lo is None and hi is None:
+        return 0, _SPAN
+    if lo is None:
+        return hi - _SPAN, hi
+    if hi is None:
+        return lo, lo + _SPAN
+    return lo, hi
+
+
+def _check(node, message):
+    # fail when compiled rather than when generating
+    try:
+        node(random.Random(0), 0)
+    except ValueError:
+        raise ValueError(message) from None
+
+
+def _describe(annotation):
+    return ", ".join(f"{k}={v!r}" for k, v in annotation.schema().items())
+
+
+def _unique_key(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True)
+    # JSON distinguishes booleans from numbers, python does not (True == 1)
+    return (value.__class__ is bool, value)
+
+
+def _date(rng):
+    return (
+        (_EPOCH + datetime.timedelta(days=int(rng.random() * _SECONDS / 86400)))
+        .date()
+        .isoformat()
+    )
+
+
+def _date_time(rng):
+    return (
+        _EPOCH + datetime.timedelta(seconds=int(rng.random() * _SECONDS))
+    ).isoformat()
+
+
+def _text(chars):
+    """A function of `(rng, k)` returning `k` random characters of `chars`."""
+    if not chars.isascii():
+        return lambda rng, k: "".join(rng.choices(chars, k=k))
+    # one random byte per character, mapped to `chars`
+    table = bytes(ord(chars[i % len(chars)]) for i in range(256))
+
+    def text(rng, k):
+        return rng.getrandbits(8 * k).to_bytes(k, "little").translate(table).decode()
+
+    return text
+
+
+_letters = _text(_LETTERS)
+_lowercase = _text(string.ascii_lowercase)
+
+
+def _word(rng):
+    return _lowercase(rng, 3 + int(rng.random() * 6))
+
+
+_FORMATS = {
+    "date-time": _date_time,
+    "date": _date,
+    "time": lambda rng: _date_time(rng)[11:],
+    "duration": lambda rng: f"P{int(rng.random() * 30)}DT{int(rng.random() * 24)}H",
+    "email": lambda rng: f"{_word(rng)}@example.com",
+    "idn-email": lambda rng: f"{_word(rng)}@example.com",
+    "hostname": lambda rng: f"{_word(rng)}.example.com",
+    "idn-hostname": lambda rng: f"{_word(rng)}.example.com",
+    "ipv4": lambda rng: ".".join(str(int(rng.random() * 256)) for _ in range(4)),
+    "ipv6": lambda rng: ":".join(f"{int(rng.random() * 65536):x}" for _ in range(8)),
+    "uuid": lambda rng: str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+    "uri": lambda rng: f"https://example.com/{_word(rng)}",
+    "uri-reference": lambda rng: f"/{_word(rng)}",
+    "iri": lambda rng: f"https://example.com/{_word(rng)}",
+    "iri-reference": lambda rng: f"/{_word(rng)}",
+}
+
+
+class _Pattern:
+    """Generates strings matching a regular expression.
+
+    The parsed pattern is compiled once into steps, each appending to the
+    output, and character classes into the strings of their characters (large
+    ranges are cut to their first 256). Lookarounds and backreferences to
+    groups that were not generated are not supported: such strings are
+    rejected by the caller and generated again.
+    """
+
+    def __init__(self, pattern: str) -> None:
+        self.steps = _pattern_steps(_sre.parse(pattern))
+
+    def __call__(self, rng):  # noqa: ANN204
+        out = []
+        groups = {}
+        for step in self.steps:
+            step(rng, out, groups)
+        return "".join(out)
+
+
+def _pattern_steps(items):
+    steps = []
+    for op, arg in items:
+        if op is _sre.LITERAL:
+            steps.append(_text_step(chr(arg)))
+        elif op in (_sre.NOT_LITERAL, _sre.ANY, _sre.IN, _sre.CATEGORY):
+            steps.append(_chars_step(_chars(op, arg)))
+        elif op is _sre.BRANCH:
+            steps.append(_branch_step([_pattern_steps(b) for b in arg[1]]))
+        elif op is _sre.SUBPATTERN:
+            steps.append(_group_step(arg[0], _pattern_steps(arg[-1])))
+        elif op in (_sre.MAX_REPEAT, _sre.MIN_REPEAT):
+            lo, hi, sub = arg
+            if hi is _sre.MAXREPEAT:
+                hi = lo + _MAX_REPEAT
+            steps.append(_repeat_step(lo, hi, sub))
+        elif op is _sre.GROUPREF:
+            steps.append(_group_ref_step(arg))
+        # anchors and lookarounds generate nothing
+    return steps
+
+
+def _text_step(text):
+    def step(rng, out, groups):
+        out.append(text)
+
+    return step
+
+
+def _chars_step(chars):
+    n = len(chars)
+
+    def step(rng, out, groups):
+        out.append(chars[int(rng.random() * n)])
+
+    return step
+
+
+def _branch_step(branches):
+    def step(rng, out, groups):
+        for sub_step in branches[int(rng.random() * len(branches))]:
+            sub_step(rng, out, groups)
+
+    return step
+
+
+def _group_step(group, steps):
+    def step(rng, out, groups):
+        start = len(out)
+        for sub_step in steps:
+            sub_step(rng, out, groups)
+        if group is not None:
+            groups[group] = "".join(out[start:])
+
+    return step
+
+
+def _repeat_step(lo, hi, sub):
+    span = hi - lo + 1
+    if len(sub) == 1 and sub[0][0] in (_sre.NOT_LITERAL, _sre.ANY, _sre.IN):
+        # e.g. `[a-z]{3}`: one call for all characters
+        text = _text(_chars(*sub[0]))
+
+        def step(rng, out, groups):
+            out.append(text(rng, lo + int(rng.random() * span)))
+
+        return step
+    steps = _pattern_steps(sub)
+
+    def step(rng, out, groups):
+        for _ in range(lo + int(rng.random() * span)):
+            for sub_step in steps:
+                sub_step(rng, out, groups)
+
+    return step
+
+
+def _group_ref_step(group):
+    def step(rng, out, groups):
+        out.append(groups.get(group, ""))
+
+    return step
+
+
+_CATEGORIES = {
+    "CATEGORY_DIGIT": string.digits,
+    "CATEGORY_NOT_DIGIT": _LETTERS,
+    "CATEGORY_WORD": _WORD,
+    "CATEGORY_NOT_WORD": " -.",
+    "CATEGORY_SPACE": " ",
+    "CATEGORY_NOT_SPACE": _WORD,
+}
+
+
+def _chars(op, arg):
+    # the characters a single character item of a pattern may generate
+    if op is _sre.ANY:
+        return _PRINTABLE
+    if op is _sre.NOT_LITERAL:
+        return _PRINTABLE.replace(chr(arg), "")
+    if op is _sre.CATEGORY:
+        return _CATEGORIES.get(str(arg), _LETTERS)
+    if arg and arg[0][0] is _sre.NEGATE:
+        members = _chars(op, arg[1:])
+        return "".join(c for c in _PRINTABLE if c not in members) or "\x00"
+    chars = set()
+    for item_op, item_arg in arg:
+        if item_op is _sre.LITERAL:
+            chars.add(chr(item_arg))
+        elif item_op is _sre.RANGE:
+            lo, hi = item_arg
+            chars.update(map(chr, range(lo, min(hi, lo + 255) + 1)))
+        elif item_op is _sre.CATEGORY:
+            chars.update(_CATEGORIES.get(str(item_arg), ""))
+    return "".join(sorted(chars)) or _LETTERS
+
+
+generator_handlers = TypeRegistry(dataclass_handler=_dataclass)
+generator_handlers.register(t.Union, _union)
+generator_handlers.register(t.Literal, _literal)
+generator_handlers.register(t.Annotated, _annotated)
+generator_handlers.register(t.Any, _any, subclasses=False)
+generator_handlers.register(None, _none)
+generator_handlers.register(type(None), _none, subclasses=False)
+generator_handlers.register(dict, _dict, subclasses=False)
+generator_handlers.register(list, _list, subclasses=False)
+generator_handlers.register(tuple, _tuple, subclasses=False)
+generator_handlers.register(set, _set, subclasses=False)
+generator_handlers.register(str, _str, subclasses=False)
+generator_handlers.register(bool, _bool, subclasses=False)
+generator_handlers.register(int, _int, subclasses=False)
+generator_handlers.register(enum.Enum, _enum)
+generator_handlers.register(numbers.Number, _number)
+generator_handlers.register(datetime.date, _date_node)
+generator_handlers.register(datetime.datetime, _date_time_node)
+if hasattr(types, "UnionType"):
+    generator_handlers.register(types.UnionType, _union)
@@ -0,0 +1,175 @@
+"""Resolve the type hints of classes once, and cache them."""
+
+from __future__ import annotations
+
+import collections
+import contextlib
+import dataclasses
+import re
+import sys
+import threading
+import typing as t
+import weakref
+
+# names, not attributes (`Optional` in `t.Optional`)
+_NAME = re.compile(r"(?<![\w.])[A-Za-z_]\w*")
+_UNBOUND = object()
+
+
+class TypeHints:
+    """Resolved type hints (`include_extras=True`) of classes, cached per class.
+
+    Resolving string annotations (e.g. with `from __future__ import
+    annotations`) evaluates them, which is the largest cost of a walk, so every
+    class is resolved once. A cached entry is resolved again when a name its
+    annotations refer to is bound to another object, e.g. a class that was
+    redefined. The returned dicts are shared: do not modify them.
+
+    `resolve_modules(modules)` makes the classes defined in a set of modules
+    (e.g. the modules of a package) visible to each other's annotations, so that
+    forward references to classes that a module does not import at runtime
+    (e.g. only under `if TYPE_CHECKING:`) resolve, and resolves the hints of
+    all of their dataclasses at once.
+    """
+
+    def __init__(self) -> None:
+        self.namespace: dict[str, type] = {}
+        self._ambiguous: set[str] = set()
+        self._entries: weakref.WeakKeyDictionary[type, _Entry] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._fallbacks: dict[str, dict[str, type]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, cls: type) -> dict[str, t.Any]:
+        entry = self._entries.get(cls)
+        if entry is not None and all(
+            namespace.get(name, _UNBOUND) is value
+            for namespace, name, value in entry.checks
+        ):
+            return entry.hints
+        hints, checks = self._resolve(cls)
+        with self._lock:
+            self._entries[cls] = _Entry(hints, checks)
+        return hints
+
+    def resolve_modules(self, modules):
+        classes = []
+        with self._lock:
+            for module in modules:
+                for name, obj in vars(module).items():
+                    if (
+                        isinstance(obj, type)
+                        and obj.__module__ == module.__name__
+                        and obj.__qualname__ == name
+                    ):
+                        classes.append(obj)
+                        self._add_name(name, obj)
+            self._fallbacks.clear()
+        for cls in classes:
+            if dataclasses.is_dataclass(cls):
+                # unresolvable hints raise when the class is used
+                with contextlib.suppress(NameError, TypeError):
+                    self.get(cls)
+
+    def invalidate(self, cls):
+        with self._lock:
+            self._entries.pop(cls, None)
+
+    def clear(self):
+        with self._lock:
+            self.namespace.clear()
+            self._ambiguous.clear()
+            self._entries.clear()
+            self._fallbacks.clear()
+
+    def _add_name(self, name, obj):
+        # called with the lock held
+        current = self.namespace.get(name)
+        if name in self._ambiguous:
+            return
+        if current is None or (
+            current.__module__ == obj.__module__
+            and current.__qualname__ == obj.__qualname__
+        ):
+            # new, or the same class imported again
+            self.namespace[name] = obj
+        elif current is not obj:
+            # defined in several modules: annotations must import it
+            del self.namespace[name]
+            self._ambiguous.add(name)
+
+    def _resolve(self, cls: type) -> tuple[dict[str, t.Any], tuple]:
+        localns: t.Optional[collections.ChainMap] = None
+        try:
+            hints = t.get_type_hints(cls, include_extras=True)
+        except NameError:
+            if not self.namespace:
+                raise
+            localns = collections.ChainMap(
+                dict(vars(cls)), self._fallback(cls.__module__)
+            )
+            hints = t.get_type_hints(cls, localns=localns, include_extras=True)
+        return hints, self._checks(cls, localns)
+
+    def _fallback(self, module_name):
+        # the shared namespace, without the names the module binds itself
+        fallback = self._fallbacks.get(module_name)
+        if fallback is None:
+            module_globals = vars(sys.modules[module_name])
+            fallback = self._fallbacks[module_name] = {
+                name: obj
+                for name, obj in self.namespace.items()
+                if name not in module_globals
+            }
+        return fallback
+
+    def _checks(self, cls, localns):
+        # the bindings of the names that string annotations were resolved with
+        checks = {}
+        for base in cls.__mro__:
+            annotations = base.__dict__.get("__annotations__", {})
+            module = sys.modules.get(base.__module__)
+            if module is None:
+                continue
+            namespaces = [vars(module)]
+            if localns is not None:
+                namespaces.append(self.namespace)
+            for annotation in annotations.values():
+                for name in _names(annotation):
+                    if name in vars(base):
+                        continue
+                    for namespace in namespaces:
+                        checks[id(namespace), name] = (
+                            namespace,
+                            name,
+                            namespace.get(name, _UNBOUND),
+                        )
+        return tuple(checks.values())
+
+
+class _Entry:
+    __slots__ = ("checks", "hints")
+
+    def __init__(self, hints: dict[str, t.Any], checks: tuple) -> None:
+        self.hints = hints
+        self.checks = checks
+
+
+def _names(annotation):
+    # the names in a string annotation or forward reference
+    strings = []
+    stack = [annotation]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, str):
+            strings.append(value)
+        elif isinstance(value, t.ForwardRef):
+            strings.append(value.__forward_arg__)
+        else:
+            stack.extend(t.get_args(value))
+    for string in strings:
+        yield from _NAME.findall(string)
+
+
+type_hints = TypeHints()
@@ -0,0 +1,320 @@
+"""Persist generated schemas across processes, in a single memory-mapped file."""
+
+from __future__ import annotations
+
+import atexit
+import builtins
+import contextlib
+import dataclasses
+import enum
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+import types
+import typing as t
+import weakref
+
+from dc_schema.hints import type_hints
+from dc_schema.scan import _version, key
+
+PACK = "schemas.pack"
+
+_MAGIC = b"dc_schema pack 1\n"
+_HEADER = struct.Struct("<Q")
+_NAME = re.compile(r"[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*")
+# the stores to flush at exit, without keeping them alive
+_autoflush: weakref.WeakSet[PersistentStore] = weakref.WeakSet()
+
+
+class PersistentStore:
+    """Generated schemas stored in `directory`, keyed by a fingerprint of their
+    dataclass.
+
+    The fingerprint covers the qualified name, fields, field types (including
+    `Annotated` metadata), defaults, `SchemaConfig` and module source of the
+    dataclass and of every dataclass and enum it depends on, as well as the
+    version of dc_schema, so a stored schema is only used while all of these
+    are unchanged. Type handlers are not covered: `clear()` the store after
+    changing them.
+
+    All schemas are kept in one file, which is memory-mapped on first use, so
+    only the schemas that are read are loaded. New schemas are added to the
+    file on `flush()` (by default also at exit, for the stores still alive then),
+    which replaces it atomically.
+    Use it through `SchemaCache(persist=PersistentStore(directory))`; it can
+    be shared between threads. Schemas that cannot be encoded as JSON (e.g.
+    with a `Decimal` default) are not stored, and counted in `skipped`.
+    """
+
+    def __init__(
+        self,
+        directory: t.Union[str, os.PathLike],
+        *,
+        max_entries: int = 4096,
+        autoflush: bool = True,
+    ) -> None:
+        self.directory = directory
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        # fingerprint -> (offset, length) of the schemas in the mapped file
+        self._index: t.Optional[dict[str, tuple[int, int]]] = None
+        self._map: t.Optional[mmap.mmap] = None
+        self._pending: dict[str, bytes] = {}
+        self._types: weakref.WeakKeyDictionary[type, tuple[bytes, list[type]]] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._sources: dict[tuple[str, int, int], bytes] = {}
+        self._version = _version()
+        self._lock = threading.Lock()
+        if autoflush:
+            _autoflush.add(self)
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, PACK)
+
+    def fingerprint(self, dc, *, dedupe=False):
+        h = hashlib.sha256(f"{self._version}\0{dedupe}".encode())
+        seen = {dc}
+        stack = [dc]
+        while stack:
+            type_ = stack.pop()
+            own, deps = self._type(type_)
+            h.update(own)
+            for dep in deps:
+                if dep not in seen:
+                    seen.add(dep)
+                    stack.append(dep)
+        return h.hexdigest()
+
+    def load(self, dc, *, dedupe=False):
+        """The stored schema of `dc`, or None."""
+        fingerprint = self.fingerprint(dc, dedupe=dedupe)
+        with self._lock:
+            data = self._pending.get(fingerprint)
+            if data is None:
+                self._open()
+                span = self._index.get(fingerprint)
+                if span is not None:
+                    data = self._map[span[0] : span[0] + span[1]]
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(data)
+
+    def save(self, dc, schema, *, dedupe=False):
+        fingerprint = self.fingerprint(dc, dedupe=dedupe)
+        try:
+            data = json.dumps(schema, separators=(",", ":")).encode()
+        except (TypeError, ValueError):
+            self.skipped += 1
+            return
+        with self._lock:
+            self._pending[fingerprint] = data
+
+    def flush(self):
+        """Write the schemas saved since the last flush to the file."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        self._close()
+        self._open()
+        entries = {
+            fingerprint: self._map[offset : offset + length]
+            for fingerprint, (offset, length) in self._index.items()
+            if fingerprint not in self._pending
+        }
+        entries.update(self._pending)
+        if len(entries) > self.max_entries:
+            # the oldest entries come first
+            entries = dict(list(entries.items())[-self.max_entries :])
+        _write_pack(self.directory, self.path, entries)
+        self._pending.clear()
+        self._close()
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self._close()
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.path)
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    def _open(self):
+        if self._index is not None:
+            return
+        self._index = {}
+        try:
+            f = open(self.path, "rb")  # noqa: SIM115
+        except FileNotFoundError:
+            return
+        with f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty file
+                return
+        try:
+            self._index = _read_index(self._map)
+        except ValueError:
+            # not a pack (or one written by another format), replaced on flush
+            self._index = {}
+
+    def _close(self):
+        if self._map is not None:
+            self._map.close()
+        self._map = None
+        self._index = None
+
+    def _type(self, type_):
+        # the own hash of a type and the types it references, cached per class
+        # object, so a redefined class is hashed again
+        try:
+            return self._types[type_]
+        except KeyError:
+            pass
+        h = hashlib.sha256(key(type_).encode())
+        h.update(self._source(type_.__module__))
+        deps = []
+        if dataclasses.is_dataclass(type_):
+            config = getattr(type_, "SchemaConfig", None)
+            h.update(repr(getattr(config, "annotation", None)).encode())
+            owners = {}
+            for base in reversed(type_.__mro__):
+                for name in base.__dict__.get("__annotations__", {}):
+                    owners[name] = base
+            for field in dataclasses.fields(type_):
+                h.update(repr((field.name, field.type, _default(field))).encode())
+                for value in _names(field.type, owners.get(field.name, type_)):
+                    h.update(repr(value).encode())
+                    deps.extend(_referenced(value))
+        elif issubclass(type_, enum.Enum):
+            h.update(repr([(m.name, m.value) for m in type_]).encode())
+        result = self._types[type_] = (h.digest(), deps)
+        return result
+
+    def _source(self, module_name):
+        path = getattr(sys.modules.get(module_name), "__file__", None)
+        try:
+            st = os.stat(path)
+        except (OSError, TypeError):
+            return b""
+        cache_key = (path, st.st_mtime_ns, st.st_size)
+        source_hash = self._sources.get(cache_key)
+        if source_hash is None:
+            try:
+                with open(path, "rb") as f:
+                    source_hash = hashlib.sha256(f.read()).digest()
+            except OSError:
+                return b""
+            self._sources[cache_key] = source_hash
+        return source_hash
+
+
+@atexit.register
+def _flush_all():
+    for store in list(_autoflush):
+        store.flush()
+
+
+def _default(field):
+    # the repr of `MISSING` includes its address, which changes between runs
+    if field.default is not dataclasses.MISSING:
+        return ("default", field.default)
+    if field.default_factory is not dataclasses.MISSING:
+        return ("default_factory",)
+    return ()
+
+
+def _names(annotation, owner):
+    # The values of the names in a string annotation (as with `from __future__
+    # import annotations`), looked up like `get_type_hints` would but without
+    # evaluating it, which is much faster.
+    if not isinstance(annotation, str):
+        yield annotation
+        return
+    namespaces = (
+        vars(owner),
+        vars(sys.modules[owner.__module__]),
+        vars(builtins),
+        type_hints.namespace,
+    )
+    for name in sorted(set(_NAME.findall(annotation))):
+        first, *rest = name.split(".")
+        for namespace in namespaces:
+            if first in namespace:
+                value = namespace[first]
+                break
+        else:
+            continue
+        for attr in rest:
+            value = getattr(value, attr, None)
+        if not isinstance(value, types.ModuleType):
+            yield value
+
+
+def _referenced(type_):
+    types = [type_]
+    while types:
+        type_ = types.pop()
+        types.extend(arg for arg in t.get_args(type_) if arg is not ...)
+        if isinstance(type_, type) and (
+            dataclasses.is_dataclass(type_) or issubclass(type_, enum.Enum)
+        ):
+            yield type_
+
+
+def _read_index(data):
+    if data[: len(_MAGIC)] != _MAGIC:
+        raise ValueError("not a schema pack")
+    start = len(_MAGIC) + _HEADER.size
+    (index_size,) = _HEADER.unpack_from(data, len(_MAGIC))
+    index = json.loads(data[start : start + index_size])
+    base = start + index_size
+    return {
+        fingerprint: (base + offset, length)
+        for fingerprint, (offset, length) in index.items()
+    }
+
+
+def _write_pack(directory, path, entries):
+    index = {}
+    offset = 0
+    for fingerprint, data in entries.items():
+        index[fingerprint] = (offset, len(data))
+        offset += len(data)
+    index_data = json.dumps(index, separators=(",", ":")).encode()
+
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f".{PACK}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_MAGIC)
+            f.write(_HEADER.pack(len(index_data)))
+            f.write(index_data)
+            for data in entries.values():
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file readable by its owner only
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp, 0o666 & ~umask)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
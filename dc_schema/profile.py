@@ -0,0 +1,147 @@
+"""Profile schema generation with a `WalkObserver`."""
+
+from __future__ import annotations
+
+import collections
+import json
+import os
+import time
+import typing as t
+
+from dc_schema import SchemaAnnotation, WalkObserver
+
+
+class Profiler(WalkObserver):
+    """Collects timings and counts of schema walks.
+
+    Pass it to `get_schema(dc, observer=profiler)` (or `get_schemas`), then
+    use `report()` for a ranked summary or `write_chrome_trace()` for a trace
+    viewable in `chrome://tracing` or https://ui.perfetto.dev (this needs
+    `trace=True`, which records every event).
+    """
+
+    def __init__(self, *, trace: bool = False) -> None:
+        self.stats: dict[tuple[str, t.Any], _Stat] = {}
+        self.lookups: collections.Counter[str] = collections.Counter()
+        self.events: t.Optional[list[dict]] = [] if trace else None
+        self.total = 0.0
+        # [start, time in children, kind, key] of the open calls
+        self._stack: list[list] = []
+        self._active: collections.Counter[tuple[str, t.Any]] = collections.Counter()
+
+    def enter(self, kind: str, key: t.Any) -> None:
+        try:
+            hash(key)
+        except TypeError:
+            key = _label(kind, key)
+        self._active[kind, key] += 1
+        self._stack.append([time.perf_counter(), 0.0, kind, key])
+
+    def exit(self, kind: str, key: t.Any) -> None:  # noqa: A003
+        end = time.perf_counter()
+        start, children, kind, key = self._stack.pop()
+        elapsed = end - start
+        if self._stack:
+            self._stack[-1][1] += elapsed
+        else:
+            self.total += elapsed
+        stat = self.stats.get((kind, key))
+        if stat is None:
+            stat = self.stats[kind, key] = _Stat()
+        stat.count += 1
+        stat.self_time += elapsed - children
+        self._active[kind, key] -= 1
+        if not self._active[kind, key]:
+            # only the outermost of recursive calls counts towards the total
+            stat.total_time += elapsed
+        if self.events is not None:
+            self.events.append(
+                {
+                    "name": _label(kind, key),
+                    "cat": kind,
+                    "ph": "X",
+                    "ts": start * 1e6,
+                    "dur": elapsed * 1e6,
+                    "pid": os.getpid(),
+                    "tid": 0,
+                }
+            )
+
+    def lookup(self, type_: type, hit: t.Optional[str]) -> None:
+        self.lookups[hit or "miss"] += 1
+
+    def report(self, limit=20):
+        """The `limit` most expensive classes, fields and types by self time."""
+        lookups = ", ".join(
+            f"{self.lookups[k]} {k}"
+            for k in ("defs", "store", "miss")
+            if self.lookups[k]
+        )
+        lines = [
+            f"schema generation: {self.total * 1e3:.2f}ms"
+            + (f", $defs lookups: {lookups}" if lookups else ""),
+            f"{'self ms':>10} {'total ms':>10} {'count':>7}  {'kind':<10} name",
+        ]
+        ranked = sorted(self.stats.items(), key=lambda i: -i[1].self_time)
+        for (kind, key), stat in ranked[:limit]:
+            lines.append(
+                f"{stat.self_time * 1e3:10.2f} {stat.total_time * 1e3:10.2f} "
+                f"{stat.count:7}  {kind:<10} {_label(kind, key)}"
+            )
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        if self.events is None:
+            raise ValueError("Profiler(trace=True) is needed to record a trace")
+        return {"traceEvents": self.events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+
+class _Stat:
+    __slots__ = ("count", "self_time", "total_time")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.self_time = 0.0
+        self.total_time = 0.0
+
+
+def _label(kind, key):
+    if isinstance(key, str):
+        return key
+    if kind == "field":
+        dc, name = key
+        return f"{dc.__qualname__}.{name}"
+    if kind == "handler":
+        handler, type_ = key
+        return f"{_type_name(type_)} ({getattr(handler, '__name__', handler)})"
+    return _type_name(key)
+
+
+def _type_name(type_, limit=80):
+    name = _format_type(type_)
+    return name if len(name) <= limit else f"{name[: limit - 3]}..."
+
+
+def _format_type(type_):
+    origin = t.get_origin(type_)
+    args = t.get_args(type_)
+    if origin is t.Annotated:
+        metadata = [
+            (
+                ", ".join(f"{k}={v!r}" for k, v in m.schema().items())
+                if isinstance(m, SchemaAnnotation)
+                else repr(m)
+            )
+            for m in type_.__metadata__
+        ]
+        return f"Annotated[{', '.join([_format_type(args[0]), *metadata])}]"
+    if origin is not None and args:
+        name = getattr(origin, "__name__", None) or getattr(origin, "_name", None)
+        return f"{name or origin!r}[{', '.join(map(_format_type, args))}]"
+    if isinstance(type_, type):
+        return type_.__qualname__
+    return repr(type_).replace("typing.", "")
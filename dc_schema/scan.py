@@ -0,0 +1,316 @@
+"""Generate schemas for every dataclass in a package."""
+
+from __future__ import annotations
+
+import ast
+import concurrent.futures
+import dataclasses
+import enum
+import functools
+import hashlib
+import importlib
+import importlib.metadata
+import json
+import os
+import pkgutil
+import sys
+import time
+import typing as t
+
+from dc_schema import dumps_schema, get_schema, get_schemas
+from dc_schema.hints import type_hints
+
+MANIFEST = ".dc_schema_manifest.json"
+BUNDLE = "bundle.json"
+
+_DEFAULT_OPTIONS = {"dedupe": False, "compact": False, "canonical": False}
+
+
+@dataclasses.dataclass
+class ScanResult:
+    generated: list[str]
+    skipped: list[str]
+    modules: int
+    elapsed: float
+
+
+def scan(
+    package,
+    out_dir,
+    *,
+    workers=None,
+    bundle=False,
+    force=False,
+    observer=None,
+    dedupe=False,
+    compact=False,
+    canonical=False,
+):
+    """Write the schema of every dataclass in `package` to `out_dir`.
+
+    Writes one `<module>.<qualname>.json` file per dataclass, or a single
+    `bundle.json` (see `get_schemas`) with `bundle=True`. With `dedupe=True`
+    repeated subschemas are moved into `$defs` (see `dedupe_schema`). `compact`
+    and `canonical` control the JSON formatting (see `dumps_schema`).
+    Dataclasses whose source, and the source of the types they depend on, is
+    unchanged since the last scan into `out_dir` with the same options are
+    skipped unless `force=True`.
+
+    With an `observer` (see `WalkObserver`) schemas are generated in this
+    process.
+    """
+    start = time.perf_counter()
+    modules = import_package(package)
+    dcs = find_dataclasses(modules)
+    sources = _SourceIndex()
+    fingerprints = {key(dc): source_fingerprint(dc, sources) for dc in dcs}
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    manifest = _read_json(manifest_path, default={})
+    mode = "bundle" if bundle else "files"
+    options = {"dedupe": dedupe, "compact": compact, "canonical": canonical}
+    previous = manifest.get(mode, {})
+    if {**_DEFAULT_OPTIONS, **manifest.get(f"{mode}.options", {})} != options:
+        previous = {}
+
+    if bundle:
+        path = os.path.join(out_dir, BUNDLE)
+        if force or previous != fingerprints or not os.path.exists(path):
+            schema = get_schemas(dcs, observer=observer, dedupe=dedupe).schema
+            _write(path, dumps_schema(schema, compact=compact, canonical=canonical))
+            generated, skipped = list(fingerprints), []
+        else:
+            generated, skipped = [], list(fingerprints)
+    else:
+        stale = {
+            k
+            for k, fingerprint in fingerprints.items()
+            if force
+            or previous.get(k) != fingerprint
+            or not os.path.exists(os.path.join(out_dir, file_name(k)))
+        }
+        generated = [k for k in fingerprints if k in stale]
+        skipped = [k for k in fingerprints if k not in stale]
+        for k, text in generate_all(
+            generated, workers, observer, options, packages=[package]
+        ):
+            _write(os.path.join(out_dir, file_name(k)), text)
+
+    manifest[mode] = fingerprints
+    manifest[f"{mode}.options"] = options
+    _write(manifest_path, json.dumps(manifest, indent=2, sort_keys=True))
+    return ScanResult(generated, skipped, len(modules), time.perf_counter() - start)
+
+
+def import_package(package):
+    """Import `package` and all of its submodules.
+
+    Their classes are made visible to each other's annotations (see
+    `TypeHints.resolve_modules`).
+    """
+    root = importlib.import_module(package)
+    modules = [root]
+    if hasattr(root, "__path__"):
+        for info in pkgutil.walk_packages(root.__path__, prefix=f"{package}."):
+            modules.append(importlib.import_module(info.name))
+    type_hints.resolve_modules(modules)
+    return modules
+
+
+def find_dataclasses(modules):
+    """Dataclasses defined (not just imported) at the top level of `modules`.
+
+    Classes created in functions are skipped, as they cannot be imported by
+    their qualified name.
+    """
+    found = {}
+    for module in modules:
+        for obj in vars(module).values():
+            if (
+                isinstance(obj, type)
+                and dataclasses.is_dataclass(obj)
+                and obj.__module__ == module.__name__
+                and "<locals>" not in obj.__qualname__
+            ):
+                found[key(obj)] = obj
+    return [found[k] for k in sorted(found)]
+
+
+def key(type_):
+    return f"{type_.__module__}:{type_.__qualname__}"
+
+
+def file_name(key):
+    return f"{key.replace(':', '.')}.json"
+
+
+def load(key):
+    module_name, qualname = key.split(":")
+    obj = importlib.import_module(module_name)
+    for part in qualname.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+def generate_all(keys, workers=None, observer=None, options=None, packages=None):
+    """Yield `(key, schema json)` pairs, generated on a process pool.
+
+    `options` are the `dedupe`, `compact` and `canonical` options of `scan`.
+    Every worker imports `packages` (see `import_package`), by default the
+    top-level packages of the keys, so that forward references across their
+    modules resolve in the workers as well.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if observer is not None or workers <= 1 or len(keys) <= 1:
+        for k in keys:
+            yield _generate(k, observer, options)
+        return
+    chunksize = max(1, len(keys) // (workers * 4))
+    if packages is None:
+        packages = sorted({k.split(":")[0].split(".")[0] for k in keys})
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(sys.path, packages)
+    ) as pool:
+        yield from pool.map(
+            functools.partial(_generate, options=options), keys, chunksize=chunksize
+        )
+
+
+def _init_worker(path, packages):
+    # workers started with "spawn" (the default on macOS and Windows) import
+    # everything again, without the resolved modules of the parent
+    sys.path[:] = path
+    for package in packages:
+        import_package(package)
+
+
+def _generate(key, observer=None, options=None):
+    options = {**_DEFAULT_OPTIONS, **(options or {})}
+    schema = get_schema(load(key), observer=observer, dedupe=options["dedupe"])
+    text = dumps_schema(
+        schema, compact=options["compact"], canonical=options["canonical"]
+    )
+    return key, text
+
+
+def source_fingerprint(dc, sources=None):
+    """Hash of the source of `dc` and every dataclass or enum it depends on."""
+    sources = _SourceIndex() if sources is None else sources
+    h = hashlib.sha256(_version().encode())
+    for dep in sorted(dependencies(dc), key=key):
+        h.update(key(dep).encode())
+        h.update(type_hash(dep, sources))
+    return h.hexdigest()
+
+
+def type_hash(type_, sources):
+    """Hash of the definition of a dataclass or enum.
+
+    Covers its source and the schema annotations it uses, which may be defined
+    elsewhere (e.g. `Annotated[int, POSITIVE]` with `POSITIVE` imported from
+    another module).
+    """
+    h = hashlib.sha256(sources.hash(type_))
+    if dataclasses.is_dataclass(type_):
+        config = getattr(type_, "SchemaConfig", None)
+        h.update(repr(getattr(config, "annotation", None)).encode())
+        types = list(type_hints.get(type_).values())
+        while types:
+            type_ = types.pop()
+            types.extend(t.get_args(type_))
+            if t.get_origin(type_) is t.Annotated:
+                h.update(repr(type_.__metadata__).encode())
+    return h.digest()
+
+
+def dependencies(dc):
+    """`dc` and the dataclasses and enums reachable from its fields, and its
+    dataclass bases, which define some of its fields.
+    """
+    seen = {dc}
+    stack = [dc]
+    while stack:
+        current = stack.pop()
+        types = [b for b in current.__mro__[1:] if dataclasses.is_dataclass(b)]
+        types.extend(type_hints.get(current).values())
+        while types:
+            type_ = types.pop()
+            types.extend(arg for arg in t.get_args(type_) if arg is not ...)
+            if not isinstance(type_, type) or type_ in seen:
+                continue
+            if dataclasses.is_dataclass(type_):
+                seen.add(type_)
+                stack.append(type_)
+            elif issubclass(type_, enum.Enum):
+                seen.add(type_)
+    return seen
+
+
+class _SourceIndex:
+    """Hashes of class definitions, parsing each module file once."""
+
+    def __init__(self) -> None:
+        self._modules: dict[str, dict[str, bytes]] = {}
+
+    def forget(self, module_name: str) -> None:
+        self._modules.pop(module_name, None)
+
+    def hash(self, type_: type) -> bytes:  # noqa: A003
+        hashes = self._modules.get(type_.__module__)
+        if hashes is None:
+            hashes = self._modules[type_.__module__] = self._parse(type_.__module__)
+        source_hash = hashes.get(type_.__qualname__)
+        if source_hash is None:
+            # No source available (e.g. a class created at runtime).
+            if issubclass(type_, enum.Enum):
+                source = repr([(m.name, m.value) for m in type_])
+            else:
+                fields = dataclasses.fields(t.cast(t.Any, type_))
+                source = repr([(f.name, f.type) for f in fields])
+            source_hash = hashlib.sha256(source.encode()).digest()
+        return source_hash
+
+    @staticmethod
+    def _parse(module_name: str) -> dict[str, bytes]:
+        path = getattr(sys.modules.get(module_name), "__file__", None)
+        if not path or not path.endswith(".py"):
+            return {}
+        with open(path, "rb") as f:
+            source = f.read()
+        lines = source.splitlines(keepends=True)
+        hashes = {}
+        stack: list[tuple[str, ast.AST]] = [("", ast.parse(source))]
+        while stack:
+            prefix, node = stack.pop()
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, ast.ClassDef):
+                    qualname = f"{prefix}{child.name}"
+                    first = min(
+                        [child.lineno] + [d.lineno for d in child.decorator_list]
+                    )
+                    text = b"".join(lines[first - 1 : child.end_lineno])
+                    hashes[qualname] = hashlib.sha256(text).digest()
+                    stack.append((f"{qualname}.", child))
+        return hashes
+
+
+def _version():
+    try:
+        return importlib.metadata.version("warchant_dc_schema")
+    except importlib.metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _read_json(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
@@ -0,0 +1,259 @@
+"""Compile dataclasses into fast serializers producing JSON-compatible data.
+
+The generated code follows the same type walk as `get_schema`, so the output
+has the shape described by the published schema: dates and datetimes become
+ISO 8601 strings, enums their `.value`, and tuples and sets become lists.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import enum
+import itertools
+import json
+import numbers
+import types
+import typing as t
+import weakref
+
+from dc_schema import TypeRegistry
+from dc_schema.hints import type_hints
+
+_ENCODER = json.JSONEncoder(
+    ensure_ascii=False, check_circular=False, separators=(",", ":")
+)
+
+
+class Serializer:
+    """Converts instances of a dataclass to JSON-compatible dicts (or bytes)."""
+
+    def __init__(self, dc: type, source: str, function: t.Callable) -> None:
+        self.dc = dc
+        self.source = source
+        self._function = function
+
+    def __call__(self, obj: t.Any) -> t.Any:
+        return self._function(obj)
+
+    def dumps(self, obj):
+        return _ENCODER.encode(self._function(obj)).encode()
+
+
+_serializers: weakref.WeakKeyDictionary[type, Serializer] = weakref.WeakKeyDictionary()
+
+
+def compile_serializer(dc, *, registry=None):
+    """Compile a serializer for the dataclass `dc`.
+
+    Every field is converted by code specialized for its declared type; only
+    unions and `typing.Any` inspect values at runtime. Serializers for the
+    default registry are cached per dataclass.
+    """
+    if registry is not None:
+        return _Compiler(registry).compile(dc)
+    serializer = _serializers.get(dc)
+    if serializer is None:
+        serializer = _serializers[dc] = _Compiler(serializer_handlers).compile(dc)
+    return serializer
+
+
+class _Compiler:
+    def __init__(self, registry: TypeRegistry) -> None:
+        self.registry = registry
+        self.namespace: dict[str, t.Any] = {"_any": _any}
+        self.functions: dict[type, str] = {}
+        self.lines: list[str] = []
+        self.ids = itertools.count()
+
+    def compile(self, dc):  # noqa: A003
+        name = self.dataclass_function(dc)
+        source = "\n\n".join(self.lines) + "\n"
+        exec(compile(source, "<dc_schema serializer>", "exec"), self.namespace)
+        return Serializer(dc, source, self.namespace[name])
+
+    def const(self, value):
+        name = f"_k{next(self.ids)}"
+        self.namespace[name] = value
+        return name
+
+    def var(self):
+        return f"x{next(self.ids)}"
+
+    def expr(self, type_, x):
+        """An expression converting the value of the expression `x`."""
+        try:
+            handler = self.registry.resolve(type_)
+        except NotImplementedError:
+            return f"_any({x})"
+        return handler(self, type_, x)
+
+    def dataclass_function(self, dc):
+        if dc in self.functions:
+            return self.functions[dc]
+        name = self.functions[dc] = f"_s{next(self.ids)}"
+        hints = type_hints.get(dc)
+        items = [
+            f"{field.name!r}: {self.expr(hints[field.name], f'obj.{field.name}')}"
+            for field in dataclasses.fields(dc)
+        ]
+        self.lines.append(
+            f"def {name}(obj):\n    return {{\n"
+            + "".join(f"        {item},\n" for item in items)
+            + "    }"
+        )
+        return name
+
+
+def _any(value):
+    """Runtime conversion, for `typing.Any` and types without a handler."""
+    if isinstance(value, enum.Enum):
+        return _any(value.value)
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return compile_serializer(type(value))(value)
+    if isinstance(value, dict):
+        return {k: _any(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [_any(v) for v in value]
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, numbers.Number):
+        return float(value)
+    return str(value)
+
+
+def _identity(compiler, type_, x):
+    return x
+
+
+def _dataclass(compiler, type_, x):
+    return f"{compiler.dataclass_function(type_)}({x})"
+
+
+def _enum(compiler, type_, x):
+    return f"{x}.value"
+
+
+def _isoformat(compiler, type_, x):
+    return f"{x}.isoformat()"
+
+
+def _number(compiler, type_, x):
+    return x if issubclass(type_, (int, float)) else f"_any({x})"
+
+
+def _any_value(compiler, type_, x):
+    return f"_any({x})"
+
+
+def _annotated(compiler, type_, x):
+    return compiler.expr(t.get_args(type_)[0], x)
+
+
+def _sequence(compiler, type_, x):
+    args = t.get_args(type_)
+    if t.get_origin(type_) is tuple and args and (len(args) != 2 or args[1] is not ...):
+        # fixed length tuple: convert each position
+        v = compiler.var()
+        items = ", ".join(compiler.expr(arg, f"{v}[{i}]") for i, arg in enumerate(args))
+        name = f"_t{next(compiler.ids)}"
+        compiler.lines.append(f"def {name}({v}):\n    return [{items}]")
+        return f"{name}({x})"
+    if not args:
+        return f"_any({x})"
+    v = compiler.var()
+    item = compiler.expr(args[0], v)
+    if item == v:
+        return f"list({x})"
+    return f"[{item} for {v} in {x}]"
+
+
+def _dict(compiler, type_, x):
+    args = t.get_args(type_)
+    if not args:
+        return f"_any({x})"
+    v = compiler.var()
+    item = compiler.expr(args[1], v)
+    if item == v:
+        return f"dict({x})"
+    k = compiler.var()
+    return f"{{{k}: {item} for {k}, {v} in {x}.items()}}"
+
+
+def _union(compiler, type_, x):
+    args = t.get_args(type_)
+    v = compiler.var()
+    items = [(arg, compiler.expr(arg, v)) for arg in args]
+    if all(item == v for _, item in items):
+        return x
+    if len(args) == 2 and type(None) in args:
+        # `x` is always a cheap expression (attribute, variable or subscript)
+        (arg,) = (arg for arg in args if arg is not type(None))
+        return f"(None if {x} is None else {compiler.expr(arg, x)})"
+    return _union_function(compiler, items, v, x)
+
+
+def _union_function(compiler, items, v, x):
+    # dispatch on the runtime class of the value, most specific classes first
+    branches = []
+    for arg, item in sorted(items, key=lambda i: _specificity(i[0])):
+        check = _runtime_check(compiler, arg, v)
+        if check is not None:
+            branches.append(f"    if {check}:\n        return {item}")
+    name = f"_u{next(compiler.ids)}"
+    compiler.lines.append(
+        f"def {name}({v}):\n" + "\n".join(branches) + f"\n    return _any({v})"
+    )
+    return f"{name}({x})"
+
+
+def _runtime_check(compiler, type_, v):
+    while t.get_origin(type_) is t.Annotated:
+        type_ = t.get_args(type_)[0]
+    if type_ is None or type_ is type(None):
+        return f"{v} is None"
+    if t.get_origin(type_) is t.Literal:
+        return f"{v} in {compiler.const(t.get_args(type_))}"
+    cls = t.get_origin(type_) or type_
+    if not isinstance(cls, type) or cls is t.Any:
+        return None
+    if cls is bool:
+        return f"{v}.__class__ is bool"
+    if cls is float:
+        # JSON numbers: an int is a valid float
+        return f"isinstance({v}, (int, float)) and {v}.__class__ is not bool"
+    return f"isinstance({v}, {compiler.const(cls)})"
+
+
+def _specificity(type_):
+    cls = t.get_origin(type_) or type_
+    if cls is bool or cls is None or cls is type(None):
+        return 0
+    if isinstance(cls, type) and issubclass(cls, enum.Enum):
+        return 1
+    if cls is float:
+        return 3
+    return 2
+
+
+serializer_handlers = TypeRegistry(dataclass_handler=_dataclass)
+serializer_handlers.register(t.Union, _union)
+serializer_handlers.register(t.Literal, _identity)
+serializer_handlers.register(t.Annotated, _annotated)
+serializer_handlers.register(t.Any, _any_value, subclasses=False)
+serializer_handlers.register(None, _identity)
+serializer_handlers.register(type(None), _identity, subclasses=False)
+serializer_handlers.register(dict, _dict, subclasses=False)
+serializer_handlers.register(list, _sequence, subclasses=False)
+serializer_handlers.register(tuple, _sequence, subclasses=False)
+serializer_handlers.register(set, _sequence, subclasses=False)
+serializer_handlers.register(str, _identity, subclasses=False)
+serializer_handlers.register(bool, _identity, subclasses=False)
+serializer_handlers.register(int, _identity, subclasses=False)
+serializer_handlers.register(enum.Enum, _enum)
+serializer_handlers.register(numbers.Number, _number)
+serializer_handlers.register(datetime.date, _isoformat)
+if hasattr(types, "UnionType"):
+    serializer_handlers.register(types.UnionType, _union)
@@ -0,0 +1,205 @@
+"""Serve the schemas of a package over HTTP, from memory."""
+
+from __future__ import annotations
+
+import dataclasses
+import gzip
+import http.server
+import json
+import sys
+import time
+import typing as t
+import urllib.parse
+
+from dc_schema import (
+    FragmentStore,
+    SchemaJSON,
+    TypeRegistry,
+    _GetSchema,
+    type_handlers,
+)
+from dc_schema.dedupe import dedupe_schema
+from dc_schema.scan import file_name, find_dataclasses, import_package, key
+
+INDEX = "index.json"
+
+
+@dataclasses.dataclass(frozen=True)
+class Document:
+    """A served JSON document, encoded and compressed once."""
+
+    encoded: SchemaJSON
+    gzipped: bytes
+
+    @classmethod
+    def from_json(cls, value: t.Any) -> Document:
+        encoded = SchemaJSON.from_schema(value)
+        return cls(encoded, gzip.compress(encoded.compact, mtime=0))
+
+    @property
+    def etags(self):
+        # the gzipped bytes are a different representation of the same content
+        return (self.encoded.etag, f'"{self.encoded.digest}-gzip"')
+
+
+class SchemaRegistry:
+    """The schemas of a set of dataclasses, one document per dataclass.
+
+    A dataclass referencing another one of the set gets a relative `$ref` to
+    its document (e.g. `{"$ref": "pkg.module.Other.json"}`) instead of a copy
+    in its `$defs`. Enums and other dataclasses are still inlined in `$defs`.
+    `documents` maps file names (see `scan.file_name`) to `Document`s, and
+    includes an `index.json` listing them.
+    """
+
+    def __init__(
+        self,
+        dcs: t.Iterable[type],
+        *,
+        dedupe: bool = False,
+        registry: t.Optional[TypeRegistry] = None,
+    ) -> None:
+        names = {dc: file_name(key(dc)) for dc in dcs}
+        registry = (type_handlers if registry is None else registry).copy()
+        default = registry.dataclass_handler
+
+        def dataclass_handler(walker, type_, default_, annotation):
+            if type_ is walker.root or type_ not in names:
+                return default(walker, type_, default_, annotation)
+            return {
+                "allOf": [{"$ref": urllib.parse.quote(names[type_])}],
+                **annotation.schema(),
+            }
+
+        registry.dataclass_handler = dataclass_handler
+        store = FragmentStore()
+        self.schemas: dict[str, dict] = {}
+        for dc, name in names.items():
+            schema = _GetSchema(store, registry)(dc)
+            self.schemas[name] = dedupe_schema(schema).schema if dedupe else schema
+        self.documents = {
+            name: Document.from_json(schema) for name, schema in self.schemas.items()
+        }
+        self.documents[INDEX] = Document.from_json(
+            {key(dc): name for dc, name in names.items()}
+        )
+
+    @classmethod
+    def from_package(cls, package: str, **kwargs: t.Any) -> SchemaRegistry:
+        return cls(find_dataclasses(import_package(package)), **kwargs)
+
+
+def make_server(registry, host="127.0.0.1", port=8000, *, quiet=False):
+    """A threading HTTP server for `registry`; run it with `serve_forever()`.
+
+    `GET /<name>.json` returns a document (`GET /` the index). Responses carry
+    an `ETag` and are sent gzipped if the client accepts it; a request with a
+    matching `If-None-Match` gets a `304 Not Modified`.
+    """
+    server = _Server((host, port), _Handler)
+    server.registry = registry
+    server.quiet = quiet
+    return server
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    registry: SchemaRegistry
+    quiet: bool
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    server: _Server
+    protocol_version = "HTTP/1.1"
+    server_version = "dc_schema"
+    # headers and body are written separately, don't delay the body
+    disable_nagle_algorithm = True
+
+    def do_GET(self) -> None:
+        self.respond(send_body=True)
+
+    def do_HEAD(self) -> None:
+        self.respond(send_body=False)
+
+    def respond(self, *, send_body):
+        path = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+        name = path.lstrip("/") or INDEX
+        document = self.server.registry.documents.get(name)
+        if document is None:
+            body = json.dumps({"error": f"no schema at {path}"}).encode()
+            self.send_response(404)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+            return
+
+        gzipped = _accepts_gzip(self.headers.get("Accept-Encoding", ""))
+        etag = document.etags[1] if gzipped else document.etags[0]
+        if _matches(self.headers.get("If-None-Match"), document.etags):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return
+        body = document.gzipped if gzipped else document.encoded.compact
+        self.send_response(200)
+        self.send_header("Content-Type", "application/schema+json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format: str, *args: t.Any) -> None:  # noqa: A002
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def _accepts_gzip(accept_encoding):
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            q = params.strip()
+            if not q.startswith("q="):
+                return True
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return True
+    return False
+
+
+def _matches(if_none_match, etags):
+    if if_none_match is None:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.removeprefix("W/") in etags:
+            return True
+    return False
+
+
+def serve(package, host="127.0.0.1", port=8000, *, dedupe=False, quiet=False):
+    """Generate the schemas of `package` and serve them until interrupted."""
+    start = time.perf_counter()
+    registry = SchemaRegistry.from_package(package, dedupe=dedupe)
+    server = make_server(registry, host, port, quiet=quiet)
+    host, port = server.server_address[:2]
+    print(
+        f"Serving {len(registry.schemas)} schemas on http://{host}:{port}/ "
+        f"(generated in {time.perf_counter() - start:.2f}s)",
+        flush=True,
+    )
+    with server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("Stopped", file=sys.stderr)
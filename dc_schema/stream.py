@@ -0,0 +1,107 @@
+"""Validate newline-delimited JSON (NDJSON) streams against a schema."""
+
+from __future__ import annotations
+
+import collections
+import concurrent.futures
+import dataclasses
+import itertools
+import json
+import os
+
+from dc_schema import get_schema
+from dc_schema.validator import compile_validator
+
+
+@dataclasses.dataclass(frozen=True)
+class LineError:
+    line: int
+    message: str
+    path: tuple = ()
+
+    def __str__(self) -> str:
+        location = "/".join(map(str, self.path))
+        return f"line {self.line}: {location + ': ' if location else ''}{self.message}"
+
+
+def validate_stream(lines, schema, *, workers=None, chunk_size=1000):
+    """Yield a `LineError` for every error in the NDJSON `lines`, in order.
+
+    `lines` is any iterable of `bytes` or `str` lines (e.g. a file object) and
+    is consumed lazily; `schema` is a dataclass or a JSON schema. Lines are
+    validated in chunks of `chunk_size` on a pool of `workers` processes
+    (default: number of CPUs). At most two chunks per worker are in flight,
+    so memory use does not depend on the size of the input. Blank lines are
+    skipped but counted.
+    """
+    if not isinstance(schema, dict):
+        schema = get_schema(schema)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunks = _chunks(lines, chunk_size)
+    if workers <= 1:
+        # not through the worker global, so several streams can be interleaved
+        validator = compile_validator(schema)
+        for chunk in chunks:
+            yield from _validate_chunk(chunk, validator)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(schema,)
+    ) as pool:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_validate_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def _chunks(lines, chunk_size):
+    # one bytes object per chunk is much cheaper to send to a worker than a list
+    lines = iter(lines)
+    start = 1
+    while True:
+        chunk = list(itertools.islice(lines, chunk_size))
+        if not chunk:
+            return
+        if isinstance(chunk[0], str):
+            chunk = [line.encode() for line in chunk]
+        yield start, b"\n".join(line.rstrip(b"\r\n") for line in chunk)
+        start += len(chunk)
+
+
+# the validator of a pool worker
+_validator = None
+
+
+def _init_worker(schema):
+    global _validator
+    _validator = compile_validator(schema)
+
+
+def _validate_chunk(chunk, validator=None):
+    if validator is None:
+        validator = _validator
+    start, data = chunk
+    errors = []
+    for number, line in enumerate(data.split(b"\n"), start):
+        if not line.strip():
+            continue
+        try:
+            value = json.loads(line, parse_constant=_invalid_constant)
+        except ValueError as e:
+            errors.append(LineError(number, f"Invalid JSON: {e}"))
+            continue
+        if not validator.is_valid(value):
+            errors += [
+                LineError(number, error.message, error.path)
+                for error in validator.errors(value)
+            ]
+    return errors
+
+
+def _invalid_constant(name):
+    # `Infinity`, `-Infinity` and `NaN`, which are not JSON
+    raise ValueError(f"{name} is not valid JSON")
@@ -0,0 +1,540 @@
+"""Compile dataclass schemas into fast, specialized validation functions."""
+
+from __future__ import annotations
+
+import contextlib
+import fractions
+import itertools
+import json
+import re
+import typing as t
+import urllib.parse
+
+from dc_schema import get_schema
+
+_TYPE_CHECKS = {
+    "string": "isinstance({v}, str)",
+    "integer": (
+        "({v}.__class__ is int or isinstance({v}, int) and {v}.__class__ is not bool"
+        " or isinstance({v}, float) and {v}.is_integer())"
+    ),
+    "number": (
+        "({v}.__class__ is int or {v}.__class__ is float"
+        " or isinstance({v}, (int, float)) and {v}.__class__ is not bool)"
+    ),
+    "boolean": "({v} is True or {v} is False)",
+    "null": "{v} is None",
+    "object": "isinstance({v}, dict)",
+    "array": "isinstance({v}, list)",
+}
+
+_STRING_KEYWORDS = ("minLength", "maxLength", "pattern")
+_NUMBER_KEYWORDS = (
+    "minimum",
+    "maximum",
+    "exclusiveMinimum",
+    "exclusiveMaximum",
+    "multipleOf",
+)
+# the levels of items and properties validated inline by a function
+_INLINE_DEPTH = 3
+_ARRAY_KEYWORDS = ("items", "prefixItems", "minItems", "maxItems", "uniqueItems")
+_OBJECT_KEYWORDS = (
+    "properties",
+    "required",
+    "additionalProperties",
+    "patternProperties",
+)
+
+
+class ValidationError(ValueError):
+    def __init__(self, message: str, path: t.Iterable = ()) -> None:
+        path = tuple(path)
+        super().__init__(message, path)
+        self.message = message
+        self.path = path
+
+    def __str__(self) -> str:
+        location = "/".join(map(str, self.path))
+        return f"{location}: {self.message}" if location else self.message
+
+
+class Validator:
+    """Validates decoded JSON data against a compiled schema.
+
+    Calling the validator raises a `ValidationError` for the first error found
+    (fail-fast); `errors` collects every error instead.
+    """
+
+    def __init__(self, schema: dict, source: str, functions: dict) -> None:
+        self.schema = schema
+        self.source = source
+        self._fail_fast = functions["_f_root"]
+        self._collect = functions["_c_root"]
+
+    def __call__(self, data: t.Any) -> None:
+        self._fail_fast(data, None, None)
+
+    def errors(self, data):
+        errors = []
+        self._collect(data, None, errors)
+        return errors
+
+    def is_valid(self, data):
+        try:
+            self._fail_fast(data, None, None)
+        except ValidationError:
+            return False
+        return True
+
+
+def compile_validator(dc, *, registry=None):
+    """Compile a validator for a dataclass, or for an already generated schema.
+
+    The schema is translated into Python source with every keyword inlined:
+    enums become frozen set lookups, patterns are compiled once, and each
+    `$defs` entry becomes a function.
+    """
+    schema = dc if isinstance(dc, dict) else get_schema(dc, registry=registry)
+    return _Compiler(schema).compile()
+
+
+def _error(message, path):
+    parts = []
+    while path is not None:
+        path, part = path
+        parts.append(part)
+    return ValidationError(message, reversed(parts))
+
+
+def _enum_key(value):
+    # JSON distinguishes booleans from numbers, python does not (True == 1)
+    return (value.__class__ is bool, value)
+
+
+def _in_enum(value, keys, values):
+    try:
+        return (value.__class__ is bool, value) in keys
+    except TypeError:
+        return any(_json_equal(value, v) for v in values)
+
+
+def _json_equal(a, b):
+    return json.dumps(a, sort_keys=True) == json.dumps(b, sort_keys=True)
+
+
+def _is_unique(items):
+    try:
+        return len(set(map(_enum_key, items))) == len(items)
+    except TypeError:
+        seen = set()
+        for item in items:
+            dumped = json.dumps(item, sort_keys=True)
+            if dumped in seen:
+                return False
+            seen.add(dumped)
+        return True
+
+
+def _not_multiple(value, multiple_of):
+    if isinstance(multiple_of, float) or isinstance(value, float):
+        quotient = value / multiple_of
+        try:
+            return int(quotient) != quotient
+        except OverflowError:
+            # the quotient overflowed to infinity: exact, as jsonschema does
+            quotient = fractions.Fraction(value) / fractions.Fraction(multiple_of)
+            return quotient.denominator != 1
+    return bool(value % multiple_of)
+
+
+class _Compiler:
+    def __init__(self, schema: dict) -> None:
+        self.schema = schema
+        self.defs = schema.get("$defs", {})
+        # the globals of the generated code: helpers and constants
+        self.namespace: dict[str, t.Any] = {
+            "_error": _error,
+            "_in_enum": _in_enum,
+            "_is_unique": _is_unique,
+            "_not_multiple": _not_multiple,
+        }
+        self.functions: list[list[str]] = []
+        self.def_functions: dict[str, str] = {}
+        # subschemas (kept alive, as they are keyed by id) and their function
+        self.nested_functions: dict[int, tuple[t.Any, str]] = {}
+        self.pending: list[tuple[str, t.Any]] = []
+        self.ids = itertools.count()
+
+    def compile(self):  # noqa: A003
+        self.pending.append(("root", self.schema))
+        source = self.drain()
+        exec(compile(source, "<dc_schema validator>", "exec"), self.namespace)
+        return Validator(self.schema, source, self.namespace)
+
+    def drain(self):
+        """Source of the functions for every pending (sub)schema."""
+        while self.pending:
+            name, schema = self.pending.pop()
+            for mode in ("f", "c"):
+                self.functions.append(
+                    [
+                        f"def _{mode}_{name}(v0, p0, errors):",
+                        *_indent(self.node(schema, mode, 0, "p0") or ["pass"]),
+                    ]
+                )
+        source = "\n\n".join("\n".join(f) for f in self.functions) + "\n"
+        self.functions = []
+        return source
+
+    def const(self, value):
+        name = f"_k{next(self.ids)}"
+        self.namespace[name] = value
+        return name
+
+    def function(self, schema):
+        name = f"b{next(self.ids)}"
+        self.pending.append((name, schema))
+        return name
+
+    def ref_function(self, ref):
+        if ref == "#":
+            return "root"
+        prefix = "#/$defs/"
+        if not ref.startswith(prefix):
+            raise NotImplementedError(f"$ref '{ref}' not supported")
+        def_name = urllib.parse.unquote(ref[len(prefix) :])
+        def_name = def_name.replace("~1", "/").replace("~0", "~")
+        if def_name not in self.def_functions:
+            self.def_functions[def_name] = self.function(self.defs[def_name])
+        return self.def_functions[def_name]
+
+    def error(self, mode, path, message, *args):
+        error = f"_error({message!r} % ({', '.join(args)},), {path})"
+        if mode == "f":
+            return f"raise {error}"
+        return f"errors.append({error})"
+
+    def node(self, schema, mode, depth, path):
+        """Lines validating the variable `v<depth>` against `schema`."""
+        if schema is True or schema == {}:
+            return []
+        v = f"v{depth}"
+        if schema is False:
+            return [self.error(mode, path, "False schema does not allow %r", v)]
+        if depth >= _INLINE_DEPTH:
+            # Python limits the nesting of blocks (20), and every level of
+            # items or properties adds a few: deeper values are validated by
+            # a function of their own
+            _, name = self.nested_functions.get(id(schema), (None, None))
+            if name is None:
+                name = self.function(schema)
+                self.nested_functions[id(schema)] = (schema, name)
+            return [f"_{mode}_{name}({v}, {path}, errors)"]
+
+        type_ = schema.get("type")
+        known = type_ if isinstance(type_, str) else None
+        body = []
+        if "enum" in schema or "const" in schema:
+            values = schema["enum"] if "enum" in schema else [schema["const"]]
+            keys = self.const(_hashable_keys(values))
+            values = self.const(values)
+            body += [
+                f"if not _in_enum({v}, {keys}, {values}):",
+                "    " + self.error(mode, path, "%r is not one of %r", v, values),
+            ]
+        body += self.guarded(
+            schema, mode, depth, path, known, ("number", "integer"), _NUMBER_KEYWORDS
+        )
+        body += self.guarded(
+            schema, mode, depth, path, known, ("string",), _STRING_KEYWORDS
+        )
+        body += self.guarded(
+            schema, mode, depth, path, known, ("array",), _ARRAY_KEYWORDS
+        )
+        body += self.guarded(
+            schema, mode, depth, path, known, ("object",), _OBJECT_KEYWORDS
+        )
+        if "$ref" in schema:
+            body.append(
+                f"_{mode}_{self.ref_function(schema['$ref'])}({v}, {path}, errors)"
+            )
+        for sub_schema in schema.get("allOf", ()):
+            body += self.node(sub_schema, mode, depth, path)
+        if "anyOf" in schema:
+            body += self.any_of(schema["anyOf"], mode, depth, path)
+        if "oneOf" in schema:
+            body += self.one_of(schema["oneOf"], mode, depth, path)
+
+        check = _type_check(type_, v)
+        if check is None:
+            return body
+        error = self.error(mode, path, f"%r is not of type {type_!r}", v)
+        if not body:
+            return [f"if not {check}:", f"    {error}"]
+        return [f"if not {check}:", f"    {error}", "else:", *_indent(body)]
+
+    def guarded(self, schema, mode, depth, path, known, types, keywords):
+        if not any(k in schema for k in keywords):
+            return []
+        if types[0] == "number":
+            lines = self.number(schema, mode, depth, path)
+        elif types[0] == "string":
+            lines = self.string(schema, mode, depth, path)
+        elif types[0] == "array":
+            lines = self.array(schema, mode, depth, path)
+        else:
+            lines = self.object(schema, mode, depth, path)
+        if known in types or not lines:
+            return lines
+        # keywords for other types do not apply, e.g. "minimum" to a string
+        return [f"if {_type_check(types[0], f'v{depth}')}:", *_indent(lines)]
+
+    def number(self, schema, mode, depth, path):
+        v = f"v{depth}"
+        lines = []
+        for keyword, op, message in (
+            ("minimum", "<", "%r is less than the minimum of %r"),
+            ("maximum", ">", "%r is greater than the maximum of %r"),
+            (
+                "exclusiveMinimum",
+                "<=",
+                "%r is less than or equal to the minimum of %r",
+            ),
+            (
+                "exclusiveMaximum",
+                ">=",
+                "%r is greater than or equal to the maximum of %r",
+            ),
+        ):
+            if keyword in schema:
+                limit = self.const(schema[keyword])
+                lines += [
+                    f"if {v} {op} {limit}:",
+                    "    " + self.error(mode, path, message, v, limit),
+                ]
+        if "multipleOf" in schema:
+            multiple_of = self.const(schema["multipleOf"])
+            lines += [
+                f"if _not_multiple({v}, {multiple_of}):",
+                "    "
+                + self.error(mode, path, "%r is not a multiple of %r", v, multiple_of),
+            ]
+        return lines
+
+    def string(self, schema, mode, depth, path):
+        v = f"v{depth}"
+        lines = []
+        if "minLength" in schema:
+            lines += [
+                f"if len({v}) < {schema['minLength']!r}:",
+                "    " + self.error(mode, path, "%r is too short", v),
+            ]
+        if "maxLength" in schema:
+            lines += [
+                f"if len({v}) > {schema['maxLength']!r}:",
+                "    " + self.error(mode, path, "%r is too long", v),
+            ]
+        if "pattern" in schema:
+            regex = self.const(re.compile(schema["pattern"]))
+            pattern = self.const(schema["pattern"])
+            lines += [
+                f"if not {regex}.search({v}):",
+                "    " + self.error(mode, path, "%r does not match %r", v, pattern),
+            ]
+        return lines
+
+    def array(self, schema, mode, depth, path):
+        v = f"v{depth}"
+        lines = []
+        if "minItems" in schema:
+            lines += [
+                f"if len({v}) < {schema['minItems']!r}:",
+                "    " + self.error(mode, path, "%r is too short", v),
+            ]
+        if "maxItems" in schema:
+            lines += [
+                f"if len({v}) > {schema['maxItems']!r}:",
+                "    " + self.error(mode, path, "%r is too long", v),
+            ]
+        if schema.get("uniqueItems"):
+            lines += [
+                f"if not _is_unique({v}):",
+                "    " + self.error(mode, path, "%r has non-unique elements", v),
+            ]
+        prefix_items = schema.get("prefixItems", [])
+        item = f"v{depth + 1}"
+        for index, sub_schema in enumerate(prefix_items):
+            item_lines = self.node(sub_schema, mode, depth + 1, f"({path}, {index})")
+            if item_lines:
+                lines += [
+                    f"if len({v}) > {index}:",
+                    f"    {item} = {v}[{index}]",
+                    *_indent(item_lines),
+                ]
+        if "items" in schema:
+            i = f"i{depth + 1}"
+            item_lines = self.node(schema["items"], mode, depth + 1, f"({path}, {i})")
+            if item_lines:
+                n = len(prefix_items)
+                items = f"{v}[{n}:], {n}" if n else v
+                lines += [f"for {i}, {item} in enumerate({items}):"]
+                lines += _indent(item_lines)
+        return lines
+
+    def object(self, schema, mode, depth, path):  # noqa: A003
+        v = f"v{depth}"
+        item = f"v{depth + 1}"
+        lines = []
+        required = schema.get("required", [])
+        if required:
+            names = self.const(tuple(required))
+            key = f"k{depth + 1}"
+            lines += [
+                f"if not {v}.keys() >= {self.const(frozenset(required))}:",
+                f"    for {key} in {names}:",
+                f"        if {key} not in {v}:",
+                "            "
+                + self.error(mode, path, "%r is a required property", key),
+            ]
+        properties = schema.get("properties", {})
+        for name, sub_schema in properties.items():
+            item_lines = self.node(sub_schema, mode, depth + 1, f"({path}, {name!r})")
+            if item_lines:
+                lines += [
+                    f"if {name!r} in {v}:",
+                    f"    {item} = {v}[{name!r}]",
+                    *_indent(item_lines),
+                ]
+
+        additional = schema.get("additionalProperties", True)
+        patterns = schema.get("patternProperties", {})
+        if additional is True and not patterns:
+            return lines
+        key = f"k{depth + 1}"
+        loop = []
+        if patterns:
+            loop.append(f"m{depth + 1} = False")
+            for pattern, sub_schema in patterns.items():
+                regex = self.const(re.compile(pattern))
+                loop += [
+                    f"if {regex}.search({key}):",
+                    f"    m{depth + 1} = True",
+                    f"    {item} = {v}[{key}]",
+                    *_indent(
+                        self.node(sub_schema, mode, depth + 1, f"({path}, {key})")
+                    ),
+                ]
+        if additional is False:
+            additional_lines = [
+                self.error(
+                    mode,
+                    path,
+                    "Additional properties are not allowed (%r was unexpected)",
+                    key,
+                )
+            ]
+        elif additional is True:
+            additional_lines = []
+        else:
+            additional_lines = [
+                f"{item} = {v}[{key}]",
+                *self.node(additional, mode, depth + 1, f"({path}, {key})"),
+            ]
+        if additional_lines:
+            conditions = [f"not m{depth + 1}"] if patterns else []
+            if properties:
+                conditions.append(f"{key} not in {self.const(frozenset(properties))}")
+            if conditions:
+                loop += [f"if {' and '.join(conditions)}:", *_indent(additional_lines)]
+            else:
+                loop += additional_lines
+        return [*lines, f"for {key} in {v}:", *_indent(loop)]
+
+    def any_of(self, schemas, mode, depth, path):
+        v = f"v{depth}"
+        ok = f"ok{depth}"
+        tried = f"t{depth}"
+        lines = [f"{ok} = False", f"{tried} = []"]
+        for sub_schema in schemas:
+            guard = self.guard(sub_schema, v)
+            branch = self.function(sub_schema)
+            lines += [
+                f"if not {ok} and {guard}:",
+                "    e = []",
+                f"    _c_{branch}({v}, {path}, e)",
+                f"    {ok} = not e",
+                f"    {tried}.append(e)",
+            ]
+        # if the value could only match one branch, report that branch's errors
+        if mode == "f":
+            reraise = f"raise {tried}[0][0]"
+        else:
+            reraise = f"errors.extend({tried}[0])"
+        lines += [
+            f"if not {ok}:",
+            f"    if len({tried}) == 1:",
+            f"        {reraise}",
+            "    else:",
+            "        "
+            + self.error(
+                mode, path, "%r is not valid under any of the given schemas", v
+            ),
+        ]
+        return lines
+
+    def one_of(self, schemas, mode, depth, path):
+        v = f"v{depth}"
+        matches = f"n{depth}"
+        lines = [f"{matches} = 0"]
+        for sub_schema in schemas:
+            branch = self.function(sub_schema)
+            lines += [
+                "e = []",
+                f"_c_{branch}({v}, {path}, e)",
+                f"{matches} += not e",
+            ]
+        lines += [
+            f"if {matches} != 1:",
+            "    "
+            + self.error(
+                mode, path, "%r is not valid under exactly one of the given schemas", v
+            ),
+        ]
+        return lines
+
+    def guard(self, schema, v):
+        """A cheap check that `v` can possibly match `schema`."""
+        if isinstance(schema, dict):
+            if "$ref" not in schema and len(schema.get("allOf", ())) == 1:
+                schema = schema["allOf"][0]
+            ref = schema.get("$ref") if isinstance(schema, dict) else None
+            if ref is not None and ref.startswith("#/$defs/"):
+                def_name = urllib.parse.unquote(ref[len("#/$defs/") :])
+                schema = self.defs.get(def_name.replace("~1", "/").replace("~0", "~"))
+        if isinstance(schema, dict):
+            check = _type_check(schema.get("type"), v)
+            if check is not None:
+                return check
+        return "True"
+
+
+def _type_check(type_, v):
+    if type_ is None:
+        return None
+    types = [type_] if isinstance(type_, str) else list(type_)
+    if set(types) >= set(_TYPE_CHECKS):
+        return None
+    return "(" + " or ".join(_TYPE_CHECKS[t].format(v=v) for t in types) + ")"
+
+
+def _hashable_keys(values):
+    keys = set()
+    for value in values:
+        with contextlib.suppress(TypeError):
+            keys.add(_enum_key(value))
+    return frozenset(keys)
+
+
+def _indent(lines):
+    return ["    " + line for line in lines]
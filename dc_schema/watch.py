@@ -0,0 +1,225 @@
+"""Regenerate the schemas of a package when its source changes."""
+
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import importlib
+import importlib.util
+import os
+import sys
+import time
+import typing as t
+
+from dc_schema.scan import (
+    _generate,
+    _SourceIndex,
+    dependencies,
+    file_name,
+    find_dataclasses,
+    import_package,
+    key,
+    type_hash,
+)
+
+
+@dataclasses.dataclass
+class WatchResult:
+    changed: list[str]
+    regenerated: list[str]
+    written: list[str]
+    removed: list[str]
+    elapsed: float
+    error: t.Optional[str] = None
+
+
+class Watcher:
+    """Keeps the schema files of `package` in `out_dir` up to date.
+
+    Each `update()` polls the modification times of the package's files. When
+    one changed, the package is imported again and only the dataclasses that
+    depend on a changed definition are regenerated: their own class, their
+    dataclass bases, the dataclasses and enums reachable from their fields, or
+    the `Annotated` and `SchemaConfig` annotations of those. A schema file is
+    only written if its content changed. The options are those of `scan`.
+    """
+
+    def __init__(
+        self,
+        package: str,
+        out_dir: t.Union[str, os.PathLike],
+        *,
+        dedupe: bool = False,
+        compact: bool = False,
+        canonical: bool = False,
+    ) -> None:
+        self.package = package
+        self.out_dir = out_dir
+        self.options = {"dedupe": dedupe, "compact": compact, "canonical": canonical}
+        self.files: dict[str, tuple[int, int]] = {}
+        self.hashes: dict[str, bytes] = {}
+        self.depends: dict[str, frozenset[str]] = {}
+        self.texts: dict[str, t.Optional[str]] = {}
+        self._sources = _SourceIndex()
+        self._modules: dict[str, str] = {}
+
+    def update(self):
+        start = time.perf_counter()
+        files = self._stat()
+        changed = sorted(
+            path
+            for path in files.keys() | self.files.keys()
+            if files.get(path) != self.files.get(path)
+        )
+        self.files = files
+        if not changed:
+            return WatchResult([], [], [], [], time.perf_counter() - start)
+
+        try:
+            dcs = self._reload(changed)
+            hashes, depends = self._dependencies(dcs)
+        except Exception as e:
+            # e.g. a syntax error in a file being edited, retried on the next change
+            return WatchResult(
+                changed,
+                [],
+                [],
+                [],
+                time.perf_counter() - start,
+                f"{type(e).__name__}: {e}",
+            )
+
+        changed_types = {k for k, h in hashes.items() if self.hashes.get(k) != h}
+        regenerated = [
+            k
+            for k, deps in depends.items()
+            if self.depends.get(k) != deps or not deps.isdisjoint(changed_types)
+        ]
+        written = []
+        os.makedirs(self.out_dir, exist_ok=True)
+        for k in regenerated:
+            _, text = _generate(k, options=self.options)
+            path = os.path.join(self.out_dir, file_name(k))
+            if k not in self.texts:
+                self.texts[k] = _read_text(path)
+            if text != self.texts[k]:
+                with open(path, "w") as f:
+                    f.write(text)
+                self.texts[k] = text
+                written.append(k)
+        removed = sorted(self.depends.keys() - depends.keys())
+        for k in removed:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(self.out_dir, file_name(k)))
+            self.texts.pop(k, None)
+
+        self.hashes = hashes
+        self.depends = depends
+        return WatchResult(
+            changed, regenerated, written, removed, time.perf_counter() - start
+        )
+
+    def _stat(self):
+        files = {}
+        for path in self._paths():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files[path] = (st.st_mtime_ns, st.st_size)
+        return files
+
+    def _paths(self):
+        spec = importlib.util.find_spec(self.package)
+        if spec is None:
+            return []
+        if spec.submodule_search_locations is None:
+            return [spec.origin] if spec.origin else []
+        paths = []
+        for location in spec.submodule_search_locations:
+            for root, dirs, names in os.walk(location):
+                dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+                paths.extend(
+                    os.path.join(root, name)
+                    for name in sorted(names)
+                    if name.endswith(".py")
+                )
+        return paths
+
+    def _reload(self, changed):
+        for path in changed:
+            if path in self._modules:
+                self._sources.forget(self._modules[path])
+            # bytecode is only invalidated by mtime in seconds and size
+            with contextlib.suppress(OSError, ValueError, NotImplementedError):
+                os.remove(importlib.util.cache_from_source(path))
+        for name in list(sys.modules):
+            if name == self.package or name.startswith(f"{self.package}."):
+                del sys.modules[name]
+        importlib.invalidate_caches()
+        modules = import_package(self.package)
+        self._modules = {
+            os.path.abspath(t.cast(str, m.__file__)): m.__name__
+            for m in modules
+            if getattr(m, "__file__", None)
+        }
+        return find_dataclasses(modules)
+
+    def _dependencies(self, dcs):
+        hashes = {}
+        depends = {}
+        for dc in dcs:
+            deps = dependencies(dc)
+            for dep in deps:
+                if key(dep) not in hashes:
+                    hashes[key(dep)] = type_hash(dep, self._sources)
+            depends[key(dc)] = frozenset(key(dep) for dep in deps)
+        return hashes, depends
+
+
+def watch(
+    package,
+    out_dir,
+    *,
+    interval=1.0,
+    dedupe=False,
+    compact=False,
+    canonical=False,
+):
+    """Keep the schemas of `package` in `out_dir` up to date until interrupted.
+
+    See `Watcher`; files are polled every `interval` seconds.
+    """
+    watcher = Watcher(
+        package, out_dir, dedupe=dedupe, compact=compact, canonical=canonical
+    )
+    result = watcher.update()
+    _print(result, f"{len(watcher.depends)} dataclasses")
+    print(f"Watching {len(watcher.files)} files", flush=True)
+    try:
+        while True:
+            time.sleep(interval)
+            result = watcher.update()
+            if result.changed:
+                _print(result, ", ".join(os.path.relpath(p) for p in result.changed))
+    except KeyboardInterrupt:
+        print("Stopped", file=sys.stderr)
+
+
+def _print(result, what):
+    if result.error is not None:
+        print(f"{what}: {result.error}", file=sys.stderr, flush=True)
+        return
+    print(
+        f"{what}: {len(result.regenerated)} regenerated, {len(result.written)} "
+        f"written, {len(result.removed)} removed, {result.elapsed:.2f}s",
+        flush=True,
+    )
+
+
+def _read_text(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None
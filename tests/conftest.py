@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import sys
+import textwrap
+
+import pytest
+
+MODELS = """
+from __future__ import annotations
+
+import dataclasses
+
+from scanpkg.common import Money
+
+
+@dataclasses.dataclass
+class Order:
+    id: int
+    total: Money
+
+
+@dataclasses.dataclass
+class Customer:
+    name: str
+"""
+
+COMMON = """
+from __future__ import annotations
+
+import dataclasses
+import enum
+
+
+class Currency(enum.Enum):
+    EUR = "EUR"
+    USD = "USD"
+
+
+@dataclasses.dataclass
+class Money:
+    amount: float
+    currency: Currency
+"""
+
+
+@pytest.fixture()
+def package(tmp_path, monkeypatch):
+    root = tmp_path / "src" / "scanpkg"
+    root.mkdir(parents=True)
+    (root / "__init__.py").write_text("")
+    (root / "common.py").write_text(textwrap.dedent(COMMON))
+    (root / "models.py").write_text(textwrap.dedent(MODELS))
+    monkeypatch.syspath_prepend(str(tmp_path / "src"))
+    yield root
+    _reimport()
+
+
+@pytest.fixture()
+def reimport():
+    # forgets the modules of `package`, so that changes to them are imported
+    return _reimport
+
+
+def _reimport():
+    for name in list(sys.modules):
+        if name.startswith("scanpkg"):
+            del sys.modules[name]
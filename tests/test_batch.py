@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import copy
+import dataclasses
+import random
+import typing as t
+
+import pytest
+
+from dc_schema import SchemaAnnotation  # noqa: TCH001
+from dc_schema.batch import compile_batch_validator
+from dc_schema.validator import compile_validator
+from tests.test_validator import VALID, Item
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NUMPY = [
+    False,
+    pytest.param(True, marks=pytest.mark.skipif(np is None, reason="needs numpy")),
+]
+
+
+@dataclasses.dataclass
+class Reading:
+    sensor: t.Annotated[str, SchemaAnnotation(min_length=2, max_length=4)]
+    value: t.Annotated[float, SchemaAnnotation(minimum=-10, exclusive_maximum=10)]
+    count: t.Annotated[int, SchemaAnnotation(multiple_of=3, maximum=2**60)]
+    code: t.Optional[t.Annotated[str, SchemaAnnotation(pattern=r"^[A-Z]+$")]]
+    unit: t.Literal["c", "f"] = "c"
+
+
+_VALUES: list[t.Any] = [
+    None,
+    True,
+    0,
+    3,
+    -11,
+    10,
+    9.5,
+    7.5,
+    2**60,
+    2**63,
+    1e300,
+    "",
+    "ab",
+    "abcde",
+    "AB",
+    "c",
+    [],
+]
+
+
+@pytest.mark.parametrize("use_numpy", NUMPY)
+def test_batch_validator(use_numpy):
+    records = [copy.deepcopy(VALID) for _ in range(7)]
+    records[1]["id"] = 0
+    records[2]["price"] = 0.7
+    records[3]["color"] = "blue"
+    del records[4]["tags"]
+    records[5]["unknown"] = 1
+    records[6]["parent"] = {"id": 0}
+    records += [5, {**VALID, "id": True, "size": "x", "price": None}]
+
+    result = compile_batch_validator(Item, use_numpy=use_numpy)(records)
+    assert result.failures == {
+        ("", "type"): [7],
+        ("", "additionalProperties"): [5],
+        ("id", "type"): [8],
+        ("id", "minimum"): [1],
+        ("price", "type"): [8],
+        ("price", "multipleOf"): [2],
+        ("color", "enum"): [3],
+        ("tags", "required"): [4],
+        ("size", "enum"): [8],
+        ("parent", "schema"): [6],
+    }
+    assert (result.rows, result.valid) == (9, False)
+    assert result.invalid_rows() == [1, 2, 3, 4, 5, 6, 7, 8]
+    assert compile_batch_validator(Item)([VALID] * 3).valid
+
+
+@pytest.mark.parametrize("use_numpy", NUMPY)
+def test_batch_validator_matches_validator(use_numpy):
+    rng = random.Random(0)
+    valid = {"sensor": "ab", "value": 1.5, "count": 3, "code": None}
+    records = []
+    for _ in range(500):
+        record = dict(valid)
+        for name in rng.sample([*valid, "unit"], 2):
+            record[name] = rng.choice(_VALUES)
+        if rng.random() < 0.1:
+            del record[rng.choice(list(record))]
+        records.append(record)
+
+    validator = compile_validator(Reading)
+    result = compile_batch_validator(Reading, use_numpy=use_numpy)(records)
+    assert result.invalid_rows() == [
+        i for i, record in enumerate(records) if not validator.is_valid(record)
+    ]
+    assert {keyword for _, keyword in result.failures} == {
+        "enum",
+        "exclusiveMaximum",
+        "maxLength",
+        "maximum",
+        "minLength",
+        "minimum",
+        "multipleOf",
+        "pattern",
+        "required",
+        "type",
+    }
+
+
+@pytest.mark.parametrize("use_numpy", NUMPY)
+def test_batch_validator_multiple_of_overflow(use_numpy):
+    schema = {
+        "type": "object",
+        "properties": {"a": {"type": "number", "multipleOf": 0.5}},
+    }
+    records = [{"a": 1e308}, {"a": 1.25e308}, {"a": 3.5}, {"a": 3.25}]
+    result = compile_batch_validator(schema, use_numpy=use_numpy)(records)
+    validator = compile_validator(schema)
+    assert result.invalid_rows() == [
+        i for i, record in enumerate(records) if not validator.is_valid(record)
+    ]
+    assert result.invalid_rows() == [3]
+
+
+@pytest.mark.parametrize("use_numpy", NUMPY)
+def test_batch_validator_wrong_types(use_numpy):
+    validate = compile_batch_validator(Reading, use_numpy=use_numpy)
+    records = [
+        {"sensor": 1, "value": "x", "count": "y", "code": 2, "unit": "c"},
+        {"sensor": [], "value": None, "count": 1.5, "code": None},
+    ]
+    assert validate(records).failures == {
+        ("sensor", "type"): [0, 1],
+        ("value", "type"): [0, 1],
+        ("count", "type"): [0, 1],
+        ("code", "type"): [0],
+    }
+
+
+def test_batch_validator_schema():
+    with pytest.raises(ValueError, match="object schema"):
+        compile_batch_validator({"type": "array"})
+    if np is None:
+        with pytest.raises(ImportError):
+            compile_batch_validator(Reading, use_numpy=True)
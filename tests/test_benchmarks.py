@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from benchmarks.__main__ import main
+from benchmarks.run import compare, run
+
+
+def test_run():
+    results = run(scale=0.01, only=r"^generate\.")
+
+    assert results["scale"] == 0.01
+    assert set(results["benchmarks"]) == {
+        f"generate.{workload}"
+        for workload in ("wide", "deep", "recursive", "enums", "unions", "chain")
+    }
+    for result in results["benchmarks"].values():
+        assert result["time"] > 0
+        assert result["peak"] >= 0
+
+
+def test_run_memory():
+    results = run(scale=0.01, only=r"^memory\.")["benchmarks"]
+
+    assert set(results) == {"memory.cache", "memory.cache.lean"}
+    assert (
+        0
+        < results["memory.cache.lean"]["retained"]
+        < (results["memory.cache"]["retained"])
+    )
+
+
+def test_run_batch():
+    results = run(scale=0.01, only=r"^batch\.columns$")["benchmarks"]
+    assert set(results) == {"batch.columns"}
+
+
+def test_run_synthetic():
+    results = run(scale=0.01, only=r"^synthetic\.records$")["benchmarks"]
+    assert set(results) == {"synthetic.records"}
+    assert results["synthetic.records"]["records_per_s"] > 0
+
+
+def test_compare(tmp_path):
+    baseline = {
+        "scale": 1.0,
+        "benchmarks": {
+            "a": {"time": 1.0, "peak": 100},
+            "b": {"time": 1.0, "peak": 100},
+        },
+    }
+    current = {
+        "scale": 1.0,
+        "benchmarks": {
+            "a": {"time": 1.2, "peak": 200},
+            "b": {"time": 1.3, "peak": 100},
+            "c": {"time": 1.0, "peak": 100},
+        },
+    }
+
+    lines, regressions = compare(baseline, current)
+    assert regressions == ["b"]
+    assert len(lines) == 3
+    assert compare(baseline, current, memory_threshold=0.5)[1] == ["a", "b"]
+    with pytest.raises(ValueError, match="cannot compare runs at scale"):
+        compare(baseline, {**current, "scale": 0.5})
+
+    (tmp_path / "baseline.json").write_text(json.dumps(baseline))
+    (tmp_path / "current.json").write_text(json.dumps(current))
+    argv = ["compare", str(tmp_path / "baseline.json"), str(tmp_path / "current.json")]
+    assert main(argv) == 1
+    assert main([*argv, "--threshold", "0.5"]) == 0
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import dataclasses
+import json
+import typing as t
+
+import pytest
+
+from dc_schema import SchemaCache, get_schema, get_schemas
+from dc_schema.budget import Budget, BudgetExceeded, check_budget, schema_stats
+from dc_schema.cli import main
+
+if t.TYPE_CHECKING:
+    Big = str
+else:
+    # a literal of 500 values, which type checkers cannot follow
+    Big = t.Literal[tuple(f"v{i}" for i in range(500))]
+
+
+@dataclasses.dataclass
+class Inner:
+    a: t.Union[Big, int]
+
+
+@dataclasses.dataclass
+class Bloated:
+    small: int
+    big: t.Optional[tuple[Big, Big]]
+    inner: list[Inner]
+
+
+def test_budget():
+    schema = get_schema(Bloated, budget=Budget(1543, 8, 1, 10654))
+    assert schema == get_schema(Bloated)
+
+    with pytest.raises(BudgetExceeded) as e:
+        get_schema(Bloated, budget=Budget(max_nodes=1000))
+    # stopped after the field that exceeded the budget
+    assert (e.value.limit, e.value.maximum, e.value.at) == (
+        "max_nodes",
+        1000,
+        "Bloated.big",
+    )
+    assert [c.name for c in e.value.fields] == ["Bloated.big", "Bloated.small"]
+    assert str(e.value).splitlines() == [
+        "schema exceeds max_nodes=1000 (1015 at Bloated.big)",
+        "largest fields:",
+        "  Bloated.big: 1013 nodes, 6888 bytes, depth 8",
+        "  Bloated.small: 2 nodes, 18 bytes, depth 3",
+    ]
+
+    with pytest.raises(BudgetExceeded, match=r"max_depth=7 \(8 at Bloated.big\)"):
+        get_schema(Bloated, budget=Budget(max_depth=7))
+    with pytest.raises(BudgetExceeded, match=r"max_defs=0 \(1 at Inner.a\)"):
+        get_schema(Bloated, budget=Budget(max_defs=0))
+    with pytest.raises(BudgetExceeded, match="max_size=1000"):
+        get_schemas([Bloated], budget=Budget(max_size=1000))
+    # the final schema is checked too
+    with pytest.raises(BudgetExceeded, match=r"max_nodes=1540 \(1543\)\n"):
+        get_schema(Bloated, budget=Budget(max_nodes=1540))
+
+    # cached schemas are checked as they are read
+    cache = SchemaCache()
+    with pytest.raises(BudgetExceeded, match="max_nodes"):
+        get_schema(Bloated, cache=cache, budget=Budget(max_nodes=1000))
+    assert Bloated in cache
+
+
+def test_schema_stats():
+    schema = get_schema(Bloated)
+    stats = schema_stats(schema)
+    assert stats.size == len(json.dumps(schema, separators=(",", ":")))
+    assert [(c.name, c.depth) for c in stats.definitions] == [
+        ("Bloated", 8),
+        ("Inner", 6),
+    ]
+    assert [c.name for c in stats.fields] == [
+        "Bloated.big",
+        "Inner.a",
+        "Bloated.inner",
+        "Bloated.small",
+    ]
+    assert stats.nodes == sum(c.nodes for c in stats.definitions) + 1
+    check_budget(schema, Budget())
+
+
+def test_stats_command(tmp_path, capsys):
+    assert main(["stats", "tests.test_budget:Bloated", "-n", "1"]) == 0
+    out = capsys.readouterr()[0].splitlines()
+    assert out[0] == ("1543 nodes, 10654 bytes, depth 8, 1 $defs")
+    assert out[1:] == [
+        "   nodes      bytes  depth  definition",
+        "    1030       7134      8  Bloated",
+        "   nodes      bytes  depth  field",
+        "    1013       6888      8  Bloated.big",
+    ]
+
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps(get_schema(Inner)))
+    assert main(["stats", str(path), "--schema", "--max-size", "100"]) == 1
+    err = capsys.readouterr()[1]
+    assert err.startswith("schema exceeds max_size=100")
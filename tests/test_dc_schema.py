@@ -1,18 +1,42 @@
 from __future__ import annotations
 
+import concurrent.futures
+import copy
 import dataclasses
 import datetime  # noqa: TCH003
+import decimal  # noqa: TCH003
 import enum
+import gc
+import hashlib
+import json
+import pickle
+import runpy
+import sys
+import threading
+import time
 import typing as t
+import uuid
 
 import jsonschema
 import pytest
 from jsonschema.validators import Draft202012Validator
 
+import dc_schema
 from dc_schema import (
+    FragmentStore,
     SchemaAnnotation,
+    SchemaCache,
+    SchemaJSON,
+    TypeRegistry,
+    WalkObserver,
+    cli,
     get_schema,
+    get_schema_json,
+    get_schemas,
+    get_split_schema,
+    type_handlers,
 )
+from tests.test_dedupe import Shirts
 
 
 @dataclasses.dataclass
@@ -337,9 +361,9 @@ def test_get_schema_set():
 @dataclasses.dataclass
 class DcStrAnnotated:
     a: t.Annotated[str, SchemaAnnotation(min_length=3, max_length=5)]
-    b: t.Annotated[
-        str, SchemaAnnotation(format="date", pattern=r"^\d.*")
-    ] = "2000-01-01"
+    b: t.Annotated[str, SchemaAnnotation(format="date", pattern=r"^\d.*")] = (
+        "2000-01-01"
+    )
 
 
 def test_get_schema_str_annotation():
@@ -772,3 +796,669 @@ def test_object_pattern_properties():
     with pytest.raises(jsonschema.ValidationError):
         # raises because S_b expects a string
         jsonschema.validate({"a": {"S_b": 123}}, schema=schema)
+
+
+def test_schema_cache():
+    cache = SchemaCache()
+
+    schema = get_schema(DcRefs, cache=cache)
+    assert schema == get_schema(DcRefs)
+    assert cache.cache_info().misses == 1
+
+    schema["properties"].clear()
+    assert get_schema(DcRefs, cache=cache) == get_schema(DcRefs)
+    assert cache.cache_info().hits == 1
+
+    cache.invalidate(DcRefs)
+    assert DcRefs not in cache
+    get_schema(DcRefs, cache=cache)
+    assert cache.cache_info().misses == 2
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.cache_info().hits == cache.cache_info().misses == 0
+
+
+def test_schema_cache_options():
+    registry = type_handlers.copy()
+    registry.register(
+        uuid.UUID, lambda walker, type_, default, annotation: {"type": "string"}
+    )
+
+    @dataclasses.dataclass
+    class DC:
+        a: uuid.UUID
+
+    cache = SchemaCache(registry=registry)
+    assert get_schema(DC, cache=cache) == get_schema(DC, registry=registry)
+    # the options generating cached schemas are those of the cache
+    for options in [
+        {"registry": registry},
+        {"store": FragmentStore()},
+        {"observer": WalkObserver()},
+    ]:
+        with pytest.raises(TypeError, match="cannot be combined with cache"):
+            get_schema(DC, cache=cache, **options)
+    with pytest.raises(TypeError, match="registry cannot be combined with cache"):
+        get_schema_json(DC, cache=cache, registry=registry)
+
+
+def test_schema_cache_readonly():
+    cache = SchemaCache(readonly=True)
+
+    schema = cache.get(DcRefs)
+    assert schema == get_schema(DcRefs)
+    assert cache.get(DcRefs) is schema
+    with pytest.raises(TypeError):
+        schema["title"] = "changed"
+    with pytest.raises(TypeError):
+        schema["required"].append("c")
+
+
+def test_schema_cache_lean():
+    cache = SchemaCache(lean=True)
+
+    schema = cache.get(DcRefs)
+    assert schema == get_schema(DcRefs)
+    assert json.dumps(schema) == json.dumps(get_schema(DcRefs))
+    assert cache.get(DcRefs) is schema
+    with pytest.raises(TypeError):
+        schema["required"].append("c")
+
+    # equal subschemas are shared, within and across schemas
+    assert schema["properties"]["b"]["items"] is schema["properties"]["a"]
+    primitives = cache.get(DcPrimitives)
+    assert (
+        primitives["properties"]["s"]
+        is cache.get(DcRefs)["$defs"]["DcRefsChild"]["properties"]["c"]
+    )
+    assert cache.get(DcUnion)["properties"]["a"]["anyOf"][0] is (
+        primitives["properties"]["i"]
+    )
+    # `True == 1`, but they are different values
+    flags = cache.get(dataclasses.make_dataclass("Flags", [("a", bool, True)]))
+    counts = cache.get(dataclasses.make_dataclass("Counts", [("a", int, 1)]))
+    assert flags["properties"]["a"]["default"] is True
+    assert counts["properties"]["a"]["default"] == 1
+    assert counts["properties"]["a"]["default"] is not True
+
+    # shared values live as long as some schema uses them
+    size = len(cache.interner)
+    cache.clear()
+    gc.collect()
+    assert len(cache.interner) < size
+
+
+def test_schema_annotation_slots():
+    annotation = SchemaAnnotation(minimum=0, examples=[1, 2])
+    assert not hasattr(annotation, "__dict__")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        annotation.minimum = 1
+    assert pickle.loads(pickle.dumps(annotation)) == annotation
+    assert copy.deepcopy(annotation) == annotation
+    assert dataclasses.replace(annotation, maximum=1).schema() == {
+        "examples": [1, 2],
+        "minimum": 0,
+        "maximum": 1,
+    }
+    # the schema is a copy
+    annotation.schema()["examples"].append(3)
+    assert annotation.examples == [1, 2]
+
+
+def test_schema_cache_lru_eviction():
+    cache = SchemaCache(maxsize=2)
+
+    cache.get(DcPrimitives)
+    cache.get(DcUnion)
+    cache.get(DcPrimitives)
+    cache.get(DcList)
+
+    assert DcPrimitives in cache
+    assert DcUnion not in cache
+    assert DcList in cache
+
+
+def test_schema_cache_is_weakly_keyed():
+    cache = SchemaCache()
+
+    @dataclasses.dataclass
+    class DC:
+        a: int
+
+    cache.get(DC)
+    assert len(cache) == 1
+
+    del DC
+    gc.collect()
+    assert len(cache) == 0
+
+
+def test_schema_cache_concurrent_misses(monkeypatch):
+    generated = []
+    call = dc_schema._GetSchema.__call__
+
+    def slow(self, dc):
+        generated.append(dc)
+        time.sleep(0.05)
+        return call(self, dc)
+
+    monkeypatch.setattr(dc_schema._GetSchema, "__call__", slow)
+    cache = SchemaCache(readonly=True)
+    barrier = threading.Barrier(8)
+
+    def get(dc):
+        barrier.wait()
+        return cache.get(dc)
+
+    with concurrent.futures.ThreadPoolExecutor(8) as pool:
+        schemas = list(pool.map(get, [DcRefs, DcUnion] * 4))
+    # generated once per class, the other threads waited for it
+    assert sorted(dc.__name__ for dc in generated) == ["DcRefs", "DcUnion"]
+    assert all(schema is schemas[0] for schema in schemas[::2])
+    assert cache.cache_info().misses == 2
+
+    def fail(self, dc):
+        time.sleep(0.05)
+        raise ValueError("failed")
+
+    monkeypatch.setattr(dc_schema._GetSchema, "__call__", fail)
+    barrier = threading.Barrier(4)
+    with concurrent.futures.ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(get, DcList) for _ in range(4)]
+    for future in futures:
+        with pytest.raises(ValueError, match="failed"):
+            future.result()
+    assert DcList not in cache
+
+
+def test_schema_cache_threads():
+    # many threads, frequent thread switches, and a cache too small to hold
+    # every schema, so entries are evicted and generated again concurrently
+    dcs = [
+        DcRefs,
+        DcSharedParent,
+        DcAnnotatedAuthor,
+        DcRefsSelf,
+        DcMutualRoot,
+        DcUnion,
+        DcList,
+        DcEnum,
+        Shirts,
+    ]
+    expected = {dc: get_schema(dc) for dc in dcs}
+    cache = SchemaCache(maxsize=2, store=FragmentStore())
+    errors = []
+
+    def hammer(seed):
+        try:
+            for i in range(200):
+                dc = dcs[(seed * 7 + i) % len(dcs)]
+                assert cache.get(dc) == expected[dc]
+                assert json.loads(cache.get_json(dc).compact) == expected[dc]
+                if i % 5 == 0:
+                    cache.invalidate(dc)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=hammer, args=(seed,)) for seed in range(16)]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
+    assert len(cache) <= 2
+
+
+def test_schema_json():
+    schema = get_schema(DcRefs)
+    reordered = dict(reversed(list(schema.items())))
+    assert list(reordered) != list(schema)
+
+    encoded = SchemaJSON.from_schema(schema)
+    assert encoded == SchemaJSON.from_schema(reordered)
+    assert json.loads(encoded.compact) == json.loads(encoded.pretty) == schema
+    assert b" " not in encoded.compact
+    assert encoded.pretty.startswith(b'{\n  "$defs": {')
+    assert encoded.etag == f'"{hashlib.sha256(encoded.compact).hexdigest()}"'
+    assert get_schema_json(DcRefs) == encoded
+
+    schema["title"] = "Changed"
+    assert SchemaJSON.from_schema(schema).etag != encoded.etag
+
+
+def test_schema_cache_json():
+    cache = SchemaCache()
+
+    encoded = get_schema_json(DcRefs, cache=cache)
+    assert encoded == get_schema_json(DcRefs)
+    assert get_schema_json(DcRefs, cache=cache) is encoded
+    assert cache.cache_info().hits == 1
+    get_schema(DcRefs, cache=cache)["title"] = "Changed"
+    assert cache.get_json(DcRefs) is encoded
+
+    cache.invalidate(DcRefs)
+    assert get_schema_json(DcRefs, cache=cache) is not encoded
+
+    dedupe_cache = SchemaCache(dedupe=True)
+    assert dedupe_cache.get(Shirts) == get_schema(Shirts, dedupe=True)
+    assert get_schema_json(Shirts, cache=dedupe_cache) == get_schema_json(
+        Shirts, dedupe=True
+    )
+    assert get_schema_json(Shirts, cache=cache, dedupe=True) == get_schema_json(
+        Shirts, dedupe=True
+    )
+
+
+def test_cli_output_format(tmp_path, capsys):
+    path = tmp_path / "models.py"
+    path.write_text(
+        "import dataclasses\n\n@dataclasses.dataclass\nclass DC:\n    b: int\n"
+    )
+
+    cli.main([str(path), "DC", "--compact"])
+    assert capsys.readouterr().out.startswith('{"$schema":')
+    cli.main([str(path), "DC", "--compact", "--canonical"])
+    out = capsys.readouterr().out
+    assert out.startswith('{"$schema":"https://json-schema.org/draft/2020-12/schema",')
+    assert (
+        out.rstrip("\n").encode()
+        == get_schema_json(runpy.run_path(str(path))["DC"]).compact
+    )
+    cli.main([str(path), "DC", "--canonical"])
+    assert capsys.readouterr().out.startswith('{\n  "$schema": ')
+
+
+@dataclasses.dataclass
+class DcMutualA:
+    b: t.Optional[DcMutualB]
+
+
+@dataclasses.dataclass
+class DcMutualB:
+    a: t.Optional[DcMutualA]
+
+
+@dataclasses.dataclass
+class DcMutualRoot:
+    a: DcMutualA
+
+
+def test_get_schema_mutual_refs():
+    schema = get_schema(DcMutualRoot)
+    print(schema)
+    Draft202012Validator.check_schema(schema)
+    assert schema["$defs"] == {
+        "DcMutualB": {
+            "type": "object",
+            "title": "DcMutualB",
+            "properties": {
+                "a": {
+                    "anyOf": [
+                        {"allOf": [{"$ref": "#/$defs/DcMutualA"}]},
+                        {"type": "null"},
+                    ]
+                }
+            },
+            "required": ["a"],
+        },
+        "DcMutualA": {
+            "type": "object",
+            "title": "DcMutualA",
+            "properties": {
+                "b": {
+                    "anyOf": [
+                        {"allOf": [{"$ref": "#/$defs/DcMutualB"}]},
+                        {"type": "null"},
+                    ]
+                }
+            },
+            "required": ["b"],
+        },
+    }
+
+
+@dataclasses.dataclass
+class DcSharedParent:
+    child: DcRefs
+    enum: DcAnnotatedAuthorHobby
+    friends: list[DcSharedParent]
+
+
+def test_fragment_store(monkeypatch):
+    store = FragmentStore()
+    roots = [DcRefs, DcSharedParent, DcAnnotatedAuthor, DcRefsSelf, DcMutualRoot]
+    for dc in roots:
+        assert get_schema(dc, store=store) == get_schema(dc)
+
+    assert DcRefsChild in store
+    assert DcAnnotatedAuthorHobby in store
+    # references the root through "#", so it cannot be reused by other roots
+    assert DcSharedParent not in store
+
+    walked = []
+    create_dc_schema = dc_schema._GetSchema.create_dc_schema
+
+    def spy(self, dc):
+        walked.append(dc)
+        return create_dc_schema(self, dc)
+
+    monkeypatch.setattr(dc_schema._GetSchema, "create_dc_schema", spy)
+
+    for dc in roots:
+        assert get_schema(dc, store=store) == get_schema(dc)
+    walked.clear()
+    get_schema(DcSharedParent, store=store)
+    assert walked == [DcSharedParent]
+
+
+def test_fragment_store_does_not_share_mutations():
+    store = FragmentStore()
+    schema = get_schema(DcRefs, store=store)
+    schema["$defs"]["DcRefsChild"]["properties"].clear()
+
+    assert get_schema(DcRefs, store=store) == get_schema(DcRefs)
+
+
+def test_type_registry_custom_handler():
+    registry = type_handlers.copy()
+
+    @registry.register(uuid.UUID)
+    def uuid_schema(walker, type_, default, annotation):
+        return {"type": "string", "format": "uuid", **annotation.schema()}
+
+    @dataclasses.dataclass
+    class DC:
+        a: uuid.UUID
+        b: list[t.Annotated[uuid.UUID, SchemaAnnotation(title="B")]]
+        c: decimal.Decimal
+
+    schema = get_schema(DC, registry=registry)
+    print(schema)
+    Draft202012Validator.check_schema(schema)
+    assert schema["properties"] == {
+        "a": {"type": "string", "format": "uuid"},
+        "b": {
+            "type": "array",
+            "items": {"type": "string", "format": "uuid", "title": "B"},
+        },
+        "c": {"type": "number"},
+    }
+
+    with pytest.raises(NotImplementedError):
+        get_schema(DC)
+
+
+T = t.TypeVar("T")
+
+
+class Pair(t.Generic[T]):
+    pass
+
+
+def test_fragment_store_registry():
+    child = dataclasses.make_dataclass("Child", [("id", uuid.UUID)])
+    DC = dataclasses.make_dataclass("DC", [("child", child)])
+    strings = type_handlers.copy()
+    strings.register(uuid.UUID, lambda walker, type_, default, annotation: {})
+    integers = type_handlers.copy()
+    integers.register(
+        uuid.UUID, lambda walker, type_, default, annotation: {"type": "integer"}
+    )
+
+    store = FragmentStore()
+    assert get_schema(DC, store=store, registry=strings) == get_schema(
+        DC, registry=strings
+    )
+    with pytest.raises(ValueError, match="another TypeRegistry"):
+        get_schema(DC, store=store, registry=integers)
+    with pytest.raises(ValueError, match="another TypeRegistry"):
+        get_schema(DC, store=store)
+    store = FragmentStore(integers)
+    assert store.registry is integers
+    assert get_schema(DC, store=store, registry=integers) == get_schema(
+        DC, registry=integers
+    )
+
+
+def test_type_registry_generator_handler():
+    registry = type_handlers.copy()
+
+    @registry.register(Pair)
+    def pair_schema(walker, type_, default, annotation):
+        (arg,) = t.get_args(type_)
+        items = yield (arg, dataclasses.MISSING, SchemaAnnotation())
+        return {"type": "array", "prefixItems": [items, items], **annotation.schema()}
+
+    @dataclasses.dataclass
+    class DC:
+        a: Pair[int]
+        b: Pair[DcRefsSelf]
+
+    schema = get_schema(DC, registry=registry)
+    Draft202012Validator.check_schema(schema)
+    assert schema["properties"]["a"] == {
+        "type": "array",
+        "prefixItems": [{"type": "integer"}, {"type": "integer"}],
+    }
+    assert list(schema["$defs"]) == ["DcRefsSelf"]
+
+
+def test_get_schema_deep_graph():
+    depth = sys.getrecursionlimit()
+    dc = dataclasses.make_dataclass("Deep", [("value", int)])
+    for i in range(depth):
+        dc = dataclasses.make_dataclass(
+            f"Deep{i}",
+            [("value", int), ("child", t.Optional[list[dc]], None)],
+        )
+
+    schema = get_schema(dc)
+    assert len(schema["$defs"]) == depth
+    assert schema["properties"]["child"] == {
+        "anyOf": [
+            {
+                "type": "array",
+                "items": {"allOf": [{"$ref": f"#/$defs/Deep{depth - 2}"}]},
+            },
+            {"type": "null"},
+        ],
+        "default": None,
+    }
+    store = FragmentStore()
+    assert get_schema(dc, store=store) == get_schema(dc, store=store) == schema
+
+
+class Nested:
+    pass
+
+
+def test_get_schema_deep_containers():
+    # as deep as `list[dict[str, list[dict[str, ...]]]]` 300 levels down
+    # (`typing.get_type_hints` itself recurses on such annotations)
+    depth = 300
+    registry = type_handlers.copy()
+
+    @registry.register(Nested)
+    def nested_schema(walker, type_, default, annotation):
+        schema = {"type": "integer"}
+        for _ in range(depth):
+            schema = {
+                "type": "array",
+                "items": {"type": "object", "additionalProperties": schema},
+            }
+        return schema
+
+    @dataclasses.dataclass
+    class DC:
+        a: Nested
+        b: Nested
+
+    schema = get_schema(DC, registry=registry)
+    for cache in [
+        SchemaCache(registry=registry),
+        SchemaCache(registry=registry, readonly=True),
+        SchemaCache(registry=registry, lean=True),
+        SchemaCache(registry=registry, dedupe=True),
+    ]:
+        assert cache.get(DC) == cache.get(DC)
+    assert cache.get(DC) == get_schema(DC, registry=registry, dedupe=True)
+    assert SchemaCache(registry=registry).get(DC) == schema
+    assert copy.deepcopy(SchemaCache(registry=registry, readonly=True).get(DC)) == (
+        schema
+    )
+    deduped = get_schema(DC, registry=registry, dedupe=True)
+    assert deduped["properties"]["a"] == deduped["properties"]["b"]
+
+
+def test_type_registry_follows_mro():
+    class Base:
+        pass
+
+    class Child(Base):
+        pass
+
+    class StrEnum(str, enum.Enum):
+        A = "a"
+
+    registry = TypeRegistry()
+    registry.register(Base, lambda walker, type_, default, annotation: "base")
+    registry.register(
+        str, lambda walker, type_, default, annotation: "str", subclasses=False
+    )
+    registry.register(enum.Enum, lambda walker, type_, default, annotation: "enum")
+
+    assert registry.resolve(Child)(None, Child, None, None) == "base"
+    assert registry.resolve(StrEnum)(None, StrEnum, None, None) == "enum"
+    assert registry.resolve(str)(None, str, None, None) == "str"
+    with pytest.raises(NotImplementedError):
+        registry.resolve(bytes)
+
+
+class _NamespaceA:
+    @dataclasses.dataclass
+    class Event:
+        a: int
+
+
+class _NamespaceB:
+    @dataclasses.dataclass
+    class Event:
+        b: str
+
+
+EventA = _NamespaceA.Event
+EventB = _NamespaceB.Event
+
+
+@dataclasses.dataclass
+class DcEvents:
+    a: EventA
+    b: EventB
+
+
+def test_get_schema_def_name_collision():
+    schema = get_schema(DcEvents)
+    print(schema)
+    Draft202012Validator.check_schema(schema)
+    assert schema["properties"] == {
+        "a": {"allOf": [{"$ref": "#/$defs/Event"}]},
+        "b": {"allOf": [{"$ref": "#/$defs/tests.test_dc_schema._NamespaceB.Event"}]},
+    }
+    assert schema["$defs"]["Event"]["properties"] == {"a": {"type": "integer"}}
+    assert schema["$defs"]["tests.test_dc_schema._NamespaceB.Event"]["properties"] == {
+        "b": {"type": "string"}
+    }
+
+
+def test_get_schemas():
+    bundle = get_schemas([DcEvents, DcRefs, DcRefsSelf, EventA])
+    print(bundle.schema)
+    Draft202012Validator.check_schema(bundle.schema)
+    assert bundle.refs == {
+        DcEvents: {"$ref": "#/$defs/tests.test_dc_schema.DcEvents"},
+        DcRefs: {"$ref": "#/$defs/tests.test_dc_schema.DcRefs"},
+        DcRefsSelf: {"$ref": "#/$defs/tests.test_dc_schema.DcRefsSelf"},
+        EventA: {"$ref": "#/$defs/tests.test_dc_schema._NamespaceA.Event"},
+    }
+    assert list(bundle.schema["$defs"]) == [
+        "tests.test_dc_schema._NamespaceA.Event",
+        "tests.test_dc_schema._NamespaceB.Event",
+        "tests.test_dc_schema.DcEvents",
+        "tests.test_dc_schema.DcRefsChild",
+        "tests.test_dc_schema.DcRefs",
+        "tests.test_dc_schema.DcRefsSelf",
+    ]
+    assert bundle.schema["$defs"]["tests.test_dc_schema.DcRefsSelf"]["properties"][
+        "c"
+    ] == {
+        "type": "array",
+        "items": {"allOf": [{"$ref": "#/$defs/tests.test_dc_schema.DcRefsSelf"}]},
+    }
+
+    validator = Draft202012Validator({**bundle.schema, **bundle.refs[DcRefs]})
+    validator.validate({"a": {"c": "x"}, "b": [{"c": "y"}]})
+    with pytest.raises(jsonschema.ValidationError):
+        validator.validate({"a": {"c": 1}, "b": []})
+
+
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+def test_get_split_schema(tmp_path):
+    split = get_split_schema(DcMutualRoot, base_uri="https://example.com/schemas/")
+    print(split.documents)
+    assert split.root == "DcMutualRoot.json"
+    assert list(split.documents) == [
+        "DcMutualRoot.json",
+        "DcMutualB.json",
+        "DcMutualA.json",
+    ]
+    root = split.documents["DcMutualRoot.json"]
+    assert root["$id"] == "https://example.com/schemas/DcMutualRoot.json"
+    assert root["properties"]["a"] == {"allOf": [{"$ref": "DcMutualA.json"}]}
+    assert "$defs" not in root
+    assert split.documents["DcMutualB.json"]["properties"]["a"]["anyOf"][0] == {
+        "allOf": [{"$ref": "DcMutualA.json"}]
+    }
+
+    store = {document["$id"]: document for document in split.documents.values()}
+    resolver = jsonschema.RefResolver.from_schema(root, store=store)
+    validator = Draft202012Validator(root, resolver=resolver)
+    validator.validate({"a": {"b": {"a": None}}})
+    with pytest.raises(jsonschema.ValidationError):
+        validator.validate({"a": {"b": {"a": 1}}})
+
+    split = get_split_schema(DcAnnotatedAuthor, qualified=True)
+    assert split.root == "tests.test_dc_schema.DcAnnotatedAuthor.json"
+    author = split.documents[split.root]
+    assert author["$id"] == split.root
+    assert author["properties"]["hobby"] == {
+        "allOf": [{"$ref": "tests.test_dc_schema.DcAnnotatedAuthorHobby.json"}],
+        "deprecated": True,
+    }
+
+    split.write(tmp_path, canonical=True)
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(split.documents)
+    for name, document in split.documents.items():
+        assert json.loads((tmp_path / name).read_text()) == document
+
+
+def test_cli_split(tmp_path, capsys):
+    path = tmp_path / "models.py"
+    path.write_text(
+        "import dataclasses\nimport typing as t\n\n"
+        "@dataclasses.dataclass\nclass Child:\n    a: int\n\n"
+        "@dataclasses.dataclass\nclass Parent:\n    child: Child\n"
+    )
+
+    out = tmp_path / "out"
+    cli.main([str(path), "Parent", "--split", str(out), "--compact"])
+    assert capsys.readouterr().out == f"{out / 'Parent.json'}\n"
+    assert sorted(p.name for p in out.iterdir()) == ["Child.json", "Parent.json"]
+    parent = json.loads((out / "Parent.json").read_text())
+    assert parent["$id"] == "Parent.json"
+    assert parent["properties"]["child"] == {"allOf": [{"$ref": "Child.json"}]}
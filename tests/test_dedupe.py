@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import copy
+import dataclasses
+import json
+import typing as t
+
+from jsonschema.validators import Draft202012Validator
+
+from dc_schema import get_schema, get_schemas
+from dc_schema.cli import main
+from dc_schema.dedupe import dedupe_schema
+from tests.test_serializer import Color  # noqa: TCH001
+
+Size = t.Literal[
+    "xxs", "xs", "s", "m", "l", "xl", "xxl", "xxxl", "one size", "free size"
+]
+
+
+@dataclasses.dataclass
+class Shirt:
+    size: Size
+    sizes: dict[str, list[Size]]
+    other_sizes: dict[str, list[Size]]
+    a: t.Any
+    b: t.Any
+    color: Color
+    size_default: Size = "m"
+
+
+@dataclasses.dataclass
+class Shirts:
+    shirt: Shirt
+    shirts: list[Shirt]
+    meta: t.Any = None
+
+
+def test_dedupe_schema():
+    schema = get_schema(Shirts)
+    original = copy.deepcopy(schema)
+    result = dedupe_schema(schema)
+    deduped = result.schema
+    print(json.dumps(deduped, indent=2))
+
+    assert schema == original
+    Draft202012Validator.check_schema(deduped)
+    assert result.size == len(json.dumps(schema, separators=(",", ":")))
+    assert result.saved == result.size - len(json.dumps(deduped, separators=(",", ":")))
+    assert result.saved > 0
+    assert result.hoisted == 3
+    assert list(deduped["$defs"]) == ["Color", "Shirt", "Shared1", "Shared2", "Shared3"]
+
+    shirt = deduped["$defs"]["Shirt"]["properties"]
+    # dict[str, list[Size]] is shared as a whole, not per item
+    assert shirt["sizes"] == shirt["other_sizes"] == {"$ref": "#/$defs/Shared2"}
+    assert deduped["$defs"]["Shared2"]["additionalProperties"]["items"] == {
+        "$ref": "#/$defs/Shared3"
+    }
+    assert shirt["a"] == shirt["b"] == {"$ref": "#/$defs/Shared1"}
+    assert deduped["properties"]["meta"] == {
+        "type": deduped["$defs"]["Shared1"]["type"],
+        "default": None,
+    }
+    assert shirt["size"] == {"$ref": "#/$defs/Shared3"}
+    # the default makes it a different schema
+    assert shirt["size_default"]["default"] == "m"
+    # too small to be worth a reference
+    assert shirt["color"] == {"allOf": [{"$ref": "#/$defs/Color"}]}
+
+    instance = {
+        "shirt": {
+            "size": "m",
+            "sizes": {"a": ["s", "l"]},
+            "other_sizes": {},
+            "a": 1,
+            "b": None,
+            "color": "red",
+        },
+        "shirts": [],
+    }
+    for valid in (instance, {**instance, "shirts": [{**instance["shirt"]}]}):
+        assert Draft202012Validator(deduped).is_valid(valid)
+        assert Draft202012Validator(schema).is_valid(valid)
+    invalid = {
+        **instance,
+        "shirts": [{**instance["shirt"], "sizes": {"a": ["m", "q"]}}],
+    }
+    assert not Draft202012Validator(deduped).is_valid(invalid)
+    assert not Draft202012Validator(schema).is_valid(invalid)
+
+
+def test_dedupe_schema_existing_defs():
+    body = {"type": "object", "title": "Point", "properties": {"x": {"type": "number"}}}
+    schema = {
+        "type": "object",
+        "properties": {
+            "a": copy.deepcopy(body),
+            "b": {"allOf": [{"$ref": "#/$defs/Point"}]},
+            # data, not a schema
+            "c": {"type": "object", "default": copy.deepcopy(body)},
+        },
+        "$defs": {"Point": body},
+    }
+
+    result = dedupe_schema(schema, min_size=0)
+    assert result.hoisted == 0
+    assert result.schema == {
+        "type": "object",
+        "properties": {
+            "a": {"$ref": "#/$defs/Point"},
+            "b": {"allOf": [{"$ref": "#/$defs/Point"}]},
+            "c": {"type": "object", "default": body},
+        },
+        "$defs": {"Point": body},
+    }
+    assert dedupe_schema(schema, min_size=1000).schema == schema
+
+
+def test_get_schema_dedupe():
+    assert get_schema(Shirts, dedupe=True) == dedupe_schema(get_schema(Shirts)).schema
+
+    bundle = get_schemas([Shirt, Shirts], dedupe=True)
+    assert bundle.schema["$defs"]["tests.test_dedupe.Shirt"]["properties"]["a"] == {
+        "$ref": "#/$defs/Shared1"
+    }
+    Draft202012Validator.check_schema(bundle.schema)
+
+
+def test_cli_dedupe(tmp_path, capsys):
+    path = tmp_path / "models.py"
+    path.write_text(
+        "import dataclasses\nimport typing as t\n\n"
+        "@dataclasses.dataclass\nclass DC:\n    a: t.Any\n    b: t.Any\n    c: t.Any\n"
+    )
+
+    main([str(path), "DC", "--dedupe"])
+    out, err = capsys.readouterr()
+    schema = json.loads(out)
+    assert schema["properties"] == {
+        "a": {"$ref": "#/$defs/Shared1"},
+        "b": {"$ref": "#/$defs/Shared1"},
+        "c": {"$ref": "#/$defs/Shared1"},
+    }
+    assert err.startswith("dedupe: 1 shared definitions, saved ")
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import typing as t
+import uuid
+
+import pytest
+
+from dc_schema.deserializer import compile_deserializer, deserializer_handlers
+from dc_schema.serializer import compile_serializer
+from dc_schema.validator import ValidationError
+from tests.test_serializer import Color, Item, Tag, make_item
+
+
+@dataclasses.dataclass
+class Small:
+    a: int
+
+
+@dataclasses.dataclass
+class Large:
+    a: int
+    b: str
+
+
+@dataclasses.dataclass
+class Choice:
+    value: t.Union[
+        Small, Large, t.Literal["x", "y"], Color, datetime.date, str  # noqa: PYI051
+    ]
+
+
+@pytest.mark.parametrize("validate", [False, True])
+def test_compile_deserializer_round_trip(validate):
+    deserialize = compile_deserializer(Item, validate=validate)
+    serialize = compile_serializer(Item)
+    for item in [
+        make_item(),
+        make_item(value=None, anything=[1, "a"]),
+        make_item(value=3, parent=make_item(value=Tag("b", datetime.date(2021, 1, 1)))),
+    ]:
+        assert deserialize(serialize(item)) == item
+        assert deserialize.loads(serialize.dumps(item)) == item
+    assert compile_deserializer(Item, validate=validate) is deserialize
+
+
+@pytest.mark.parametrize("validate", [False, True])
+def test_compile_deserializer_union_dispatch(validate):
+    deserialize = compile_deserializer(Choice, validate=validate)
+
+    assert deserialize({"value": {"a": 1}}).value == Small(1)
+    assert deserialize({"value": {"a": 1, "b": "c"}}).value == Large(1, "c")
+    assert deserialize({"value": "x"}).value == "x"
+    assert deserialize({"value": "red"}).value is Color.RED
+    assert deserialize({"value": "2020-01-02"}).value == datetime.date(2020, 1, 2)
+    if validate:
+        # invalid dates fall through to the next branch
+        assert deserialize({"value": "2020-13-02"}).value == "2020-13-02"
+
+
+@dataclasses.dataclass
+class Moment:
+    when: t.Union[datetime.date, str]
+    at: t.Union[datetime.datetime, datetime.date] = datetime.date(2020, 1, 1)
+    since: t.Optional[t.Union[datetime.date, Small]] = None
+
+
+@pytest.mark.parametrize("validate", [False, True])
+def test_compile_deserializer_date_unions(validate):
+    deserialize = compile_deserializer(Moment, validate=validate)
+    serialize = compile_serializer(Moment)
+    for moment in [
+        Moment("hello"),
+        Moment("2020-13-02", datetime.datetime(2020, 1, 2, 3, 4)),
+        Moment(datetime.date(2020, 1, 2), datetime.date(2021, 1, 2)),
+        Moment("", datetime.datetime(2020, 1, 2), datetime.date(2020, 1, 2)),
+        Moment("x", since=Small(1)),
+    ]:
+        assert deserialize(serialize(moment)) == moment
+    assert type(deserialize({"when": "x", "at": "2020-01-02"}).at) is datetime.date
+
+
+def test_compile_deserializer_validate():
+    deserialize = compile_deserializer(Item, validate=True)
+    data = compile_serializer(Item)(make_item())
+
+    with pytest.raises(ValidationError) as e:
+        deserialize({**data, "price": -1})
+    assert str(e.value) == "price: -1 is less than the minimum of 0"
+
+    with pytest.raises(ValidationError) as e:
+        deserialize({**data, "tags": [{"name": "a"}]})
+    assert str(e.value) == "tags/0: 'created' is a required property"
+
+    with pytest.raises(ValidationError) as e:
+        deserialize({**data, "sizes": ["blue"]})
+    assert str(e.value) == "sizes/0: 'blue' is not one of ['red', 'green']"
+
+    with pytest.raises(ValidationError) as e:
+        deserialize({**data, "at": "yesterday"})
+    assert e.value.path == ("at",)
+
+    with pytest.raises(ValidationError) as e:
+        deserialize({**data, "value": 1.5})
+    assert str(e.value) == "value: 1.5 is not valid under any of the given schemas"
+
+    with pytest.raises(ValidationError) as e:
+        deserialize({**data, "parent": {**data, "dims": [1]}})
+    assert str(e.value) == "parent/dims: [1] is too short"
+
+
+def test_compile_deserializer_defaults():
+    @dataclasses.dataclass
+    class DC:
+        a: int = 1
+        b: list[int] = dataclasses.field(default_factory=list)
+        c: int = dataclasses.field(default=0, init=False)
+
+    for validate in (False, True):
+        deserialize = compile_deserializer(DC, validate=validate)
+        assert deserialize({}) == DC()
+        assert deserialize({"a": 2, "b": [3]}) == DC(2, [3])
+        assert deserialize({}).b is not deserialize({}).b
+
+
+def test_compile_deserializer_custom_handler():
+    @dataclasses.dataclass
+    class DC:
+        id: uuid.UUID  # noqa: A003
+
+    registry = deserializer_handlers.copy()
+    registry.register(
+        uuid.UUID, lambda compiler, type_, x, path: f"{compiler.const(type_)}({x})"
+    )
+
+    assert compile_deserializer(DC, registry=registry)(
+        {"id": "00000000-0000-0000-0000-000000000001"}
+    ) == DC(uuid.UUID(int=1))
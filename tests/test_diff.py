@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import shutil
+import sys
+import textwrap
+import types
+
+import pytest
+
+from dc_schema import get_schema, get_schemas
+from dc_schema.cli import main
+from dc_schema.diff import diff_documents, diff_schemas, load_schemas
+from dc_schema.scan import scan
+
+OLD = """
+from __future__ import annotations
+
+import dataclasses
+import enum
+import typing as t
+
+from dc_schema import SchemaAnnotation
+
+
+class Colour(enum.Enum):
+    RED = "red"
+    GREEN = "green"
+
+
+@dataclasses.dataclass
+class Address:
+    street: str
+    zip: t.Annotated[str, SchemaAnnotation(min_length=3)]
+
+
+@dataclasses.dataclass
+class Person:
+    name: str
+    address: Address
+    colour: Colour
+    age: int = 0
+"""
+
+NEW = """
+from __future__ import annotations
+
+import dataclasses
+import enum
+import typing as t
+
+from dc_schema import SchemaAnnotation
+
+
+class Colour(enum.Enum):
+    RED = "red"
+    BLUE = "blue"
+
+
+@dataclasses.dataclass
+class Address:
+    street: str
+    zip: t.Annotated[str, SchemaAnnotation(min_length=5, description="Postcode")]
+
+
+@dataclasses.dataclass
+class Person:
+    name: str
+    address: t.Optional[Address]
+    colour: Colour
+    age: int
+    nickname: str = ""
+"""
+
+
+@pytest.fixture()
+def versions(monkeypatch):
+    modules = []
+    for name, source in (("diffold", OLD), ("diffnew", NEW)):
+        module = types.ModuleType(name)
+        monkeypatch.setitem(sys.modules, name, module)
+        exec(textwrap.dedent(source), vars(module))
+        modules.append(module)
+    return modules
+
+
+def _changes(result):
+    return [(c.pointer, c.message, c.breaking) for c in result.changes]
+
+
+def test_diff_schemas(versions):
+    old = get_schema(versions[0].Person)
+    new = get_schema(versions[1].Person)
+
+    result = diff_schemas(old, new)
+    assert _changes(result) == [
+        ("#/properties/address/anyOf", "branch of type null added", False),
+        ("#/properties/age/default", "default removed (was 0)", False),
+        ("#/properties/nickname", "optional property 'nickname' added", False),
+        ("#/required", "property 'age' became required", True),
+        (
+            "#/$defs/Address/properties/zip/description",
+            'description added: "Postcode"',
+            False,
+        ),
+        (
+            "#/$defs/Address/properties/zip/minLength",
+            "minLength changed from 3 to 5",
+            True,
+        ),
+        ("#/$defs/Colour/enum", 'values removed: "green"', True),
+        ("#/$defs/Colour/enum", 'values added: "blue"', False),
+    ]
+    assert (result.compared, result.unchanged) == (3, 0)
+    assert len(result.breaking) == 3
+
+    forward = diff_schemas(old, new, mode="forward")
+    assert [c.message for c in forward.breaking] == [
+        "branch of type null added",
+        "optional property 'nickname' added",
+        'values added: "blue"',
+    ]
+    assert len(diff_schemas(old, new, mode="full").breaking) == 6
+
+    result = diff_schemas(old, old)
+    assert (result.changes, result.compared, result.unchanged) == ([], 3, 3)
+    with pytest.raises(ValueError, match="mode"):
+        diff_schemas(old, new, mode="sideways")
+
+
+@pytest.mark.parametrize(
+    ("old", "new", "changes"),
+    [
+        (
+            {"type": "integer"},
+            {"type": "number"},
+            [("#/type", "type number added", False)],
+        ),
+        (
+            {"type": ["string", "null"]},
+            {"type": "string"},
+            [("#/type", "type null removed", True)],
+        ),
+        (
+            {"type": "integer", "maximum": 10},
+            {"type": "integer"},
+            [("#/maximum", "maximum removed (was 10)", False)],
+        ),
+        (
+            {"type": "string"},
+            {"type": "string", "pattern": "^a"},
+            [("#/pattern", 'pattern added: "^a"', True)],
+        ),
+        (
+            {"const": "a"},
+            {"enum": ["a", "b"]},
+            [("#/enum", 'values added: "b"', False)],
+        ),
+        (
+            # `Literal["a", "b"]` becoming `str`
+            {"enum": ["a", "b"]},
+            {"type": "string"},
+            [
+                ("#/enum", "enum removed", False),
+                ("#/type", 'type added: "string"', False),
+            ],
+        ),
+        (
+            {"enum": ["a", 1]},
+            {"type": "string"},
+            [
+                ("#/enum", "enum removed", False),
+                ("#/type", 'type added: "string"', True),
+            ],
+        ),
+        (
+            {"properties": {"a": {}}, "additionalProperties": False},
+            {"properties": {}, "additionalProperties": False},
+            [("#/properties/a", "property 'a' removed", True)],
+        ),
+        (
+            {"type": "object", "additionalProperties": {"type": "string"}},
+            {"type": "object", "additionalProperties": {"type": "integer"}},
+            [
+                ("#/additionalProperties/type", "type string removed", True),
+                ("#/additionalProperties/type", "type integer added", False),
+            ],
+        ),
+        (
+            {"not": {"type": "string"}},
+            {"not": {"type": ["string", "null"]}},
+            [("#/not/type", "type null added", True)],
+        ),
+        (
+            {"anyOf": [{"$ref": "#/$defs/A"}, {"type": "null"}]},
+            {"anyOf": [{"type": "null"}]},
+            [("#/anyOf/0", "branch #/$defs/A removed", True)],
+        ),
+        (
+            {"allOf": [{"$ref": "#/$defs/A"}]},
+            {"allOf": [{"$ref": "#/$defs/B"}]},
+            [("#/allOf/0/$ref", "reference #/$defs/A changed to #/$defs/B", True)],
+        ),
+    ],
+)
+def test_diff_schemas_keywords(old, new, changes):
+    assert _changes(diff_schemas(old, new)) == changes
+
+
+def test_diff_schemas_renamed_reference():
+    old = {"$ref": "#/$defs/A", "$defs": {"A": {"type": "string"}}}
+    new = {"$ref": "#/$defs/B", "$defs": {"B": {"type": "string"}}}
+    assert _changes(diff_schemas(old, new)) == [
+        ("#/$ref", "reference #/$defs/A renamed to #/$defs/B", False),
+        ("#/$defs/A", "definition removed", True),
+        ("#/$defs/B", "definition added", False),
+    ]
+
+
+def test_diff_bundles(versions):
+    old, new = versions
+    result = diff_schemas(
+        get_schemas([old.Person]).schema,
+        get_schemas([old.Person, new.Address]).schema,
+    )
+    assert _changes(result) == [("#/$defs/diffnew.Address", "definition added", False)]
+    # the root, `Person`, `Address` and `Colour`
+    assert (result.compared, result.unchanged) == (4, 4)
+
+
+def test_diff_documents(versions):
+    person, address = versions[0].Person, versions[0].Address
+    old = {"a.json": get_schema(address), "b.json": get_schema(person)}
+    new = {"b.json": get_schema(person), "c.json": get_schema(address)}
+    result = diff_documents(old, new)
+    assert [(c.document, c.message, c.breaking) for c in result.changes] == [
+        ("a.json", "document removed", True),
+        ("c.json", "document added", False),
+    ]
+    # `Address` is compared once, though it is in both `a.json` and `b.json`
+    assert (result.compared, result.unchanged) == (3, 3)
+
+
+def test_diff_command(package, reimport, tmp_path, capsys):
+    old = tmp_path / "old"
+    scan("scanpkg", old, workers=1)
+    source = tmp_path / "old_src"
+    shutil.copytree(package.parent, source)
+
+    common = package / "common.py"
+    common.write_text(common.read_text().replace('USD = "USD"', 'GBP = "GBP"'))
+    reimport()
+    new = tmp_path / "new"
+    scan("scanpkg", new, workers=1)
+
+    assert main(["diff", str(old), str(new)]) == 1
+    out, err = capsys.readouterr()
+    lines = out.splitlines()
+    pointer = "scanpkg.common.Money.json#/$defs/Currency/enum"
+    assert lines == [
+        f'breaking: {pointer}: values removed: "USD"',
+        f'compatible: {pointer}: values added: "GBP"',
+    ]
+    # `Currency` is the same in `Money` and `Order`
+    assert err.startswith(
+        "4 definitions compared, 3 unchanged: 1 breaking and 1 compatible changes"
+    )
+    assert main(["diff", str(old), str(new), "--mode", "forward", "--breaking"]) == 1
+    assert capsys.readouterr()[0].splitlines() == [
+        lines[1].replace("compatible", "breaking")
+    ]
+    assert main(["diff", str(new), str(new)]) == 0
+
+    # two versions of a package
+    documents = load_schemas(f"scanpkg@{source}")
+    assert list(documents[""]["$defs"]["scanpkg.common.Currency"]["enum"]) == [
+        "EUR",
+        "USD",
+    ]
+    result = diff_documents(documents, load_schemas("scanpkg"))
+    assert [c.pointer for c in result.breaking] == [
+        "#/$defs/scanpkg.common.Currency/enum"
+    ]
+    with pytest.raises(RuntimeError, match="cannot import"):
+        load_schemas(f"notapackage@{source}")
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import dataclasses
+import datetime  # noqa: TCH003
+import itertools
+import json
+import random
+import typing as t
+
+import pytest
+from jsonschema import FormatChecker
+from jsonschema.validators import Draft202012Validator
+
+from dc_schema import SchemaAnnotation, get_schema
+from dc_schema.cli import main
+from dc_schema.generator import compile_generator, generate_stream
+from dc_schema.validator import compile_validator
+from tests.test_validator import Item
+
+
+@dataclasses.dataclass
+class Event:
+    id: t.Annotated[str, SchemaAnnotation(format="uuid")]  # noqa: A003
+    at: datetime.datetime
+    day: datetime.date
+    email: t.Annotated[str, SchemaAnnotation(format="email")]
+    host: t.Annotated[str, SchemaAnnotation(format="ipv4")]
+    code: t.Annotated[
+        str, SchemaAnnotation(pattern=r"^[A-Z]{2}-\d{3,5}(x|yz)?$", max_length=8)
+    ]
+    score: t.Annotated[
+        float, SchemaAnnotation(exclusive_minimum=0, maximum=1, multiple_of=0.01)
+    ]
+    level: t.Annotated[
+        int, SchemaAnnotation(minimum=-5, exclusive_maximum=5, multiple_of=2)
+    ]
+    tags: t.Annotated[
+        list[t.Literal["a", "b", "c"]],
+        SchemaAnnotation(min_items=1, max_items=3, unique_items=True),
+    ]
+    count: t.Annotated[t.Optional[int], SchemaAnnotation(maximum=-10)] = None
+    item: t.Optional[Item] = None
+
+
+@dataclasses.dataclass
+class Node:
+    children: list[Node]
+    parent: t.Optional[Node] = None
+
+
+@dataclasses.dataclass
+class Loop:
+    next: Loop  # noqa: A003
+
+
+@dataclasses.dataclass
+class Outer:
+    node: Node
+
+
+@pytest.mark.parametrize("dc", [Item, Event])
+def test_generator(dc):
+    generator = compile_generator(dc)
+    assert compile_generator(dc) is generator
+    validator = compile_validator(dc)
+    schema = Draft202012Validator(get_schema(dc), format_checker=FormatChecker())
+    rng = random.Random(0)
+    values = [generator(rng) for _ in range(500)]
+    for value in values:
+        validator(value)
+        schema.validate(value)
+    assert isinstance(generator.instance(rng), dc)
+    assert json.loads(generator.dumps(random.Random(0))) == values[0]
+
+
+def test_generator_annotations():
+    values = [compile_generator(Event)(random.Random(i)) for i in range(200)]
+    assert {v["level"] for v in values} == {-4, -2, 0, 2, 4}
+    assert all(0 < v["score"] <= 1 for v in values)
+    assert {len(v["tags"]) for v in values} == {1, 2, 3}
+    assert {v["count"] is None for v in values} == {True, False}
+
+    @dataclasses.dataclass
+    class Impossible:
+        a: t.Annotated[int, SchemaAnnotation(minimum=3, maximum=2)]
+
+    with pytest.raises(ValueError, match="no integer satisfies minimum=3, maximum=2"):
+        compile_generator(Impossible)
+
+
+def _depth(node):
+    children = [*node["children"], *filter(None, [node.get("parent")])]
+    return 1 + max(map(_depth, children), default=0)
+
+
+def test_generator_depth():
+    rng = random.Random(0)
+    for max_depth in (1, 3):
+        generator = compile_generator(Node, max_depth=max_depth)
+        depths = {_depth(generator(rng)) for _ in range(100)}
+        assert max(depths) == max_depth
+    assert compile_generator(Node, max_depth=1)(rng) == {"children": [], "parent": None}
+
+    with pytest.raises(ValueError, match="within max_depth=1 \\(it needs 2\\)"):
+        compile_generator(Outer, max_depth=1)
+    with pytest.raises(ValueError, match="recurse without end"):
+        compile_generator(Loop)
+
+
+def test_generate_stream():
+    lines = list(generate_stream(Event, 25, seed=1, chunk_size=10))
+    assert len(lines) == 25
+    assert all(line.endswith(b"\n") for line in lines)
+    validator = compile_validator(Event)
+    for line in lines:
+        validator(json.loads(line))
+    # the same lines, whatever the number of workers
+    assert list(generate_stream(Event, 25, seed=1, chunk_size=10, workers=2)) == lines
+    assert list(generate_stream(Event, 25, seed=2, chunk_size=10)) != lines
+    # endless
+    assert len(list(itertools.islice(generate_stream(Node, seed=1), 2500))) == 2500
+
+
+def test_generate_stream_interleaved():
+    events = generate_stream(Event, 2, seed=1, chunk_size=1)
+    items = generate_stream(Item, 2, seed=1, chunk_size=1)
+    lines = [next(events), next(items), next(events), next(items)]
+    assert lines[::2] == list(generate_stream(Event, 2, seed=1, chunk_size=1))
+    assert lines[1::2] == list(generate_stream(Item, 2, seed=1, chunk_size=1))
+
+
+def test_generate_command(capsys):
+    assert (
+        main(["generate", "tests.test_generator:Event", "-n", "5", "--seed", "1"]) == 0
+    )
+    out, err = capsys.readouterr()
+    assert out.encode().splitlines(keepends=True) == list(
+        generate_stream(Event, 5, seed=1)
+    )
+    assert err.startswith("5 records in ")
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import concurrent.futures
+import functools
+import json
+import multiprocessing
+import sys
+import textwrap
+import types
+import typing as t
+
+import pytest
+
+from dc_schema import get_schema
+from dc_schema.hints import TypeHints
+from dc_schema.scan import import_package, scan
+from tests.test_dedupe import Shirt, Shirts
+
+MODULE = """
+from __future__ import annotations
+
+import dataclasses
+import typing as t
+
+
+@dataclasses.dataclass
+class Child:
+    a: int
+
+
+@dataclasses.dataclass
+class Parent:
+    child: t.Optional[Child]
+"""
+
+
+@pytest.fixture()
+def module(monkeypatch):
+    module = types.ModuleType("hintsmod")
+    monkeypatch.setitem(sys.modules, "hintsmod", module)
+    exec(textwrap.dedent(MODULE), vars(module))
+    return module
+
+
+def test_type_hints_cached(monkeypatch):
+    hints = TypeHints()
+    calls = []
+    get_type_hints = t.get_type_hints
+
+    def spy(*args, **kwargs):
+        calls.append(args[0])
+        return get_type_hints(*args, **kwargs)
+
+    monkeypatch.setattr(t, "get_type_hints", spy)
+    assert hints.get(Shirts) == get_type_hints(Shirts, include_extras=True)
+    assert hints.get(Shirts) is hints.get(Shirts)
+    assert calls == [Shirts]
+
+    hints.invalidate(Shirts)
+    hints.get(Shirts)
+    assert calls == [Shirts, Shirts]
+
+
+def test_type_hints_redefined_class(module):
+    hints = TypeHints()
+    child = module.Child
+    assert hints.get(module.Parent)["child"] == t.Optional[child]
+
+    # redefine `Child` only: `Parent` refers to it by name
+    exec("@dataclasses.dataclass\nclass Child:\n    b: str\n", vars(module))
+    assert module.Child is not child
+    assert hints.get(module.Parent)["child"] == t.Optional[module.Child]
+    assert get_schema(module.Parent)["$defs"]["Child"]["properties"] == {
+        "b": {"type": "string"}
+    }
+
+    # unrelated rebinding does not matter
+    parent_hints = hints.get(module.Parent)
+    module.unrelated = 1
+    assert hints.get(module.Parent) is parent_hints
+    assert hints.get(Shirt) is hints.get(Shirt)
+
+
+A = """
+from __future__ import annotations
+
+import dataclasses
+import typing as t
+
+if t.TYPE_CHECKING:
+    from hintspkg.b import B
+
+
+@dataclasses.dataclass
+class A:
+    b: t.Optional[B]
+"""
+
+B = """
+from __future__ import annotations
+
+import dataclasses
+import typing as t
+
+if t.TYPE_CHECKING:
+    from hintspkg.a import A
+
+
+@dataclasses.dataclass
+class B:
+    a: list[A]
+"""
+
+
+@pytest.fixture()
+def package(tmp_path, monkeypatch):
+    root = tmp_path / "hintspkg"
+    root.mkdir()
+    (root / "__init__.py").write_text("")
+    (root / "a.py").write_text(textwrap.dedent(A))
+    (root / "b.py").write_text(textwrap.dedent(B))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield root
+    for name in list(sys.modules):
+        if name.startswith("hintspkg"):
+            del sys.modules[name]
+
+
+def test_type_hints_cross_module_references(package, monkeypatch):
+    _, a, b = import_package("hintspkg")
+    with pytest.raises(NameError):
+        t.get_type_hints(a.A)
+    schema = get_schema(a.A)
+    assert schema["properties"]["b"]["anyOf"][0] == {"allOf": [{"$ref": "#/$defs/B"}]}
+    assert schema["$defs"]["B"]["properties"]["a"]["items"] == {
+        "allOf": [{"$ref": "#"}]
+    }
+
+    # names defined in several modules are not guessed
+    hints = TypeHints()
+    other = types.ModuleType("hintsother")
+    monkeypatch.setitem(sys.modules, "hintsother", other)
+    exec("class B:\n    pass\n", vars(other))
+    hints.resolve_modules([a, b, other])
+    with pytest.raises(NameError):
+        hints.get(a.A)
+    assert hints.get(b.B)["a"] == list[a.A]
+
+
+def test_scan_cross_module_references_spawn(package, tmp_path, monkeypatch):
+    # workers started with "spawn" import the package again
+    monkeypatch.setattr(
+        concurrent.futures,
+        "ProcessPoolExecutor",
+        functools.partial(
+            concurrent.futures.ProcessPoolExecutor,
+            mp_context=multiprocessing.get_context("spawn"),
+        ),
+    )
+    result = scan("hintspkg", tmp_path / "out", workers=2)
+    assert result.generated == ["hintspkg.a:A", "hintspkg.b:B"]
+    schema = json.loads((tmp_path / "out" / "hintspkg.a.A.json").read_text())
+    assert schema == get_schema(import_package("hintspkg")[1].A)
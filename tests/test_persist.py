@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import dataclasses
+import decimal
+import gc
+import importlib
+import os
+import typing as t
+
+from dc_schema import SchemaAnnotation, SchemaCache, get_schema, persist
+from dc_schema.persist import PACK, PersistentStore
+from tests.test_dedupe import Shirts
+
+
+def test_persistent_store(tmp_path):
+    store = PersistentStore(tmp_path, autoflush=False)
+    cache = SchemaCache(persist=store)
+    assert get_schema(Shirts, cache=cache) == get_schema(Shirts)
+    assert (store.hits, store.misses) == (0, 1)
+    assert not (tmp_path / PACK).exists()
+    store.flush()
+    assert os.listdir(tmp_path) == [PACK]
+
+    # a new process
+    store = PersistentStore(tmp_path, autoflush=False)
+    cache = SchemaCache(persist=store)
+    schema = get_schema(Shirts, cache=cache)
+    assert schema == get_schema(Shirts)
+    assert list(schema) == list(get_schema(Shirts))
+    assert (store.hits, store.misses) == (1, 0)
+
+    # dedupe is part of the key
+    deduped = SchemaCache(persist=store, dedupe=True)
+    assert get_schema(Shirts, cache=deduped) == get_schema(Shirts, dedupe=True)
+    assert store.misses == 1
+    store.flush()
+    assert PersistentStore(tmp_path).load(Shirts) == get_schema(Shirts)
+
+    store.clear()
+    assert not (tmp_path / PACK).exists()
+    assert store.load(Shirts) is None
+
+
+def test_persistent_store_fingerprint():
+    store = PersistentStore("unused", autoflush=False)
+
+    def make(annotation, default=0):
+        return dataclasses.make_dataclass(
+            "DC",
+            [("a", t.Annotated[int, annotation], dataclasses.field(default=default))],
+        )
+
+    fingerprint = store.fingerprint(make(SchemaAnnotation(minimum=0)))
+    assert store.fingerprint(make(SchemaAnnotation(minimum=0))) == fingerprint
+    assert store.fingerprint(make(SchemaAnnotation(minimum=1))) != fingerprint
+    assert store.fingerprint(make(SchemaAnnotation(minimum=0), 1)) != fingerprint
+    assert store.fingerprint(Shirts, dedupe=True) != store.fingerprint(Shirts)
+
+
+def test_persistent_store_dependencies(package, reimport, tmp_path):
+    store = PersistentStore(tmp_path, autoflush=False)
+    models = importlib.import_module("scanpkg.models")
+    store.save(models.Order, get_schema(models.Order))
+    store.save(models.Customer, get_schema(models.Customer))
+    store.flush()
+
+    # a nested class changed
+    common = package / "common.py"
+    common.write_text(common.read_text().replace('"USD"', '"GBP"'))
+    reimport()
+    models = importlib.import_module("scanpkg.models")
+    store = PersistentStore(tmp_path, autoflush=False)
+    assert store.load(models.Order) is None
+    assert store.load(models.Customer) == get_schema(models.Customer)
+
+
+def test_persistent_store_file(tmp_path):
+    (tmp_path / PACK).write_bytes(b"garbage")
+    store = PersistentStore(tmp_path, max_entries=2, autoflush=False)
+    assert store.load(Shirts) is None
+
+    classes = [dataclasses.make_dataclass(f"DC{i}", [("a", int)]) for i in range(3)]
+    for dc in classes:
+        store.save(dc, get_schema(dc))
+        store.flush()
+    assert os.listdir(tmp_path) == [PACK]
+    # the oldest entry was dropped
+    assert store.load(classes[0]) is None
+    assert store.load(classes[2]) == get_schema(classes[2])
+
+
+def test_persistent_store_unencodable(tmp_path):
+    @dataclasses.dataclass
+    class DC:
+        a: decimal.Decimal = decimal.Decimal("1.5")
+
+    store = PersistentStore(tmp_path, autoflush=False)
+    assert get_schema(DC, cache=SchemaCache(persist=store)) == get_schema(DC)
+    assert store.skipped == 1
+    store.flush()
+    assert not (tmp_path / PACK).exists()
+
+
+def test_persistent_store_autoflush(tmp_path):
+    store = PersistentStore(tmp_path)
+    store.save(Shirts, get_schema(Shirts))
+    persist._flush_all()
+    assert PersistentStore(tmp_path, autoflush=False).load(Shirts) == get_schema(Shirts)
+
+    # stores are not kept alive for the exit flush
+    assert store in persist._autoflush
+    del store
+    gc.collect()
+    assert not any(store.directory == tmp_path for store in persist._autoflush)
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import dataclasses
+import json
+import typing as t
+
+from dc_schema import FragmentStore, SchemaAnnotation, WalkObserver, get_schema
+from dc_schema.cli import main
+from dc_schema.profile import Profiler
+from tests.test_serializer import Color, Item
+
+
+@dataclasses.dataclass
+class Node:
+    value: t.Annotated[int, SchemaAnnotation(minimum=0)]
+    children: list[Node]
+    color: t.Optional[Color] = None
+
+
+class Recorder(WalkObserver):
+    def __init__(self) -> None:
+        self.events: list[tuple] = []
+
+    def enter(self, kind: str, key: t.Any) -> None:
+        self.events.append(("enter", kind, key))
+
+    def exit(self, kind: str, key: t.Any) -> None:  # noqa: A003
+        self.events.append(("exit", kind, key))
+
+    def lookup(self, type_: type, hit: t.Optional[str]) -> None:
+        self.events.append(("lookup", type_, hit))
+
+
+def test_walk_observer():
+    recorder = Recorder()
+    assert get_schema(Node, observer=recorder) == get_schema(Node)
+
+    events = recorder.events
+    assert events[0] == ("enter", "class", Node)
+    assert events[1] == ("enter", "type_hints", Node)
+    assert events[-1] == ("exit", "class", Node)
+    assert [e[2] for e in events if e[:2] == ("enter", "field")] == [
+        (Node, "value"),
+        (Node, "children"),
+        (Node, "color"),
+    ]
+    assert ("enter", "enum", Color) in events
+    assert [e[1:] for e in events if e[0] == "lookup"] == [(Color, None)]
+    # events nest
+    stack = []
+    for event, kind, key in events:
+        if event == "enter":
+            stack.append((kind, key))
+        elif event == "exit":
+            assert stack.pop() == (kind, key)
+    assert not stack
+
+
+def test_profiler():
+    store = FragmentStore()
+    get_schema(Item, store=store)
+    profiler = Profiler(trace=True)
+    get_schema(Item, store=store, observer=profiler)
+    get_schema(Node, observer=profiler)
+
+    assert profiler.lookups == {"defs": 4, "store": 2, "miss": 1}
+    assert profiler.stats["class", Item].count == 1
+    assert profiler.stats["field", (Node, "value")].count == 1
+    report = profiler.report(limit=100)
+    assert report.startswith("schema generation: ")
+    assert "$defs lookups: 4 defs, 2 store, 1 miss" in report
+    assert "Annotated[int, minimum=0] (get_annotated_schema)" in report
+    assert "Node.children" in report
+
+    trace = profiler.chrome_trace()
+    assert len(trace["traceEvents"]) == sum(s.count for s in profiler.stats.values())
+    assert {e["cat"] for e in trace["traceEvents"]} == {
+        "class",
+        "enum",
+        "field",
+        "handler",
+        "type_hints",
+    }
+
+
+def test_cli_profile(tmp_path, capsys):
+    path = tmp_path / "models.py"
+    path.write_text(
+        "import dataclasses\n\n@dataclasses.dataclass\nclass DC:\n    a: int\n"
+    )
+    trace = tmp_path / "trace.json"
+
+    main([str(path), "DC", "--profile", "--trace", str(trace)])
+    out, err = capsys.readouterr()
+    assert json.loads(out)["title"] == "DC"
+    assert "int (get_int_schema)" in err
+    assert json.loads(trace.read_text())["traceEvents"]
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from dc_schema import cli
+from dc_schema.scan import scan
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_scan(package, reimport, tmp_path, workers):
+    out = tmp_path / "out"
+
+    result = scan("scanpkg", out, workers=workers)
+    assert result.generated == [
+        "scanpkg.common:Money",
+        "scanpkg.models:Customer",
+        "scanpkg.models:Order",
+    ]
+    assert result.skipped == []
+    order = json.loads((out / "scanpkg.models.Order.json").read_text())
+    assert order["title"] == "Order"
+    assert order["$defs"]["Money"]["properties"]["amount"] == {"type": "number"}
+
+    result = scan("scanpkg", out, workers=workers)
+    assert result.generated == []
+
+    # changing a nested dataclass regenerates everything that depends on it
+    common = package / "common.py"
+    common.write_text(common.read_text().replace("USD", "GBP"))
+    reimport()
+    result = scan("scanpkg", out, workers=workers)
+    assert result.generated == ["scanpkg.common:Money", "scanpkg.models:Order"]
+    assert result.skipped == ["scanpkg.models:Customer"]
+    order = json.loads((out / "scanpkg.models.Order.json").read_text())
+    assert order["$defs"]["Currency"]["enum"] == ["EUR", "GBP"]
+
+
+def test_scan_base_class(package, reimport, tmp_path):
+    (package / "base.py").write_text(
+        "import dataclasses\n\n\n@dataclasses.dataclass\nclass Base:\n    x: int\n"
+    )
+    (package / "child.py").write_text(
+        "import dataclasses\n\nfrom scanpkg.base import Base\n\n\n"
+        "@dataclasses.dataclass\nclass Child(Base):\n    y: str\n"
+    )
+    out = tmp_path / "out"
+    scan("scanpkg", out, workers=1)
+
+    # changing a base class in another module regenerates its subclasses
+    base = package / "base.py"
+    base.write_text(base.read_text().replace("x: int", "x: str"))
+    reimport()
+    result = scan("scanpkg", out, workers=1)
+    assert result.generated == ["scanpkg.base:Base", "scanpkg.child:Child"]
+    child = json.loads((out / "scanpkg.child.Child.json").read_text())
+    assert child["properties"]["x"] == {"type": "string"}
+
+
+def test_scan_bundle(package, tmp_path, capsys):
+    out = tmp_path / "out"
+
+    cli.main(["scan", "scanpkg", "--out", str(out), "--bundle", "--workers", "1"])
+    assert "3 dataclasses in 3 modules: 3 generated, 0 unchanged" in (
+        capsys.readouterr().out
+    )
+    bundle = json.loads((out / "bundle.json").read_text())
+    assert sorted(bundle["$defs"]) == [
+        "scanpkg.common.Currency",
+        "scanpkg.common.Money",
+        "scanpkg.models.Customer",
+        "scanpkg.models.Order",
+    ]
+
+    cli.main(["scan", "scanpkg", "--out", str(out), "--bundle"])
+    assert "0 generated, 3 unchanged" in capsys.readouterr().out
+
+
+def test_scan_dedupe_options(package, tmp_path):
+    out = tmp_path / "out"
+
+    assert len(scan("scanpkg", out, workers=1).generated) == 3
+    # changing options regenerates everything
+    assert len(scan("scanpkg", out, workers=1, dedupe=True).generated) == 3
+    assert scan("scanpkg", out, workers=1, dedupe=True).generated == []
+    assert len(scan("scanpkg", out, workers=1).generated) == 3
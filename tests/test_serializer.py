@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import enum
+import json
+import typing as t
+import uuid
+
+from dc_schema import SchemaAnnotation  # noqa: TCH001
+from dc_schema.serializer import compile_serializer, serializer_handlers
+from dc_schema.validator import compile_validator
+
+
+class Color(enum.Enum):
+    RED = "red"
+    GREEN = "green"
+
+
+@dataclasses.dataclass
+class Tag:
+    name: str
+    created: datetime.date
+
+
+@dataclasses.dataclass
+class Item:
+    id: int  # noqa: A003
+    price: t.Annotated[float, SchemaAnnotation(minimum=0)]
+    color: Color
+    at: datetime.datetime
+    tags: list[Tag]
+    dims: tuple[int, float]
+    sizes: tuple[Color, ...]
+    labels: set[str]
+    by_name: dict[str, Tag]
+    value: t.Union[int, Color, Tag, None]
+    parent: t.Optional[Item] = None
+    anything: t.Any = None
+
+
+def make_item(**kwargs):
+    tag = Tag("a", datetime.date(2020, 1, 2))
+    return Item(
+        **{
+            "id": 1,
+            "price": 2.5,
+            "color": Color.RED,
+            "at": datetime.datetime(2020, 1, 2, 3, 4, 5),
+            "tags": [tag],
+            "dims": (1, 2.0),
+            "sizes": (Color.GREEN,),
+            "labels": {"x"},
+            "by_name": {"a": tag},
+            "value": Color.GREEN,
+            **kwargs,
+        }
+    )
+
+
+def test_compile_serializer():
+    serialize = compile_serializer(Item)
+    item = make_item(
+        parent=make_item(value=make_item().tags[0]),
+        anything={"when": datetime.date(2021, 1, 1), "ids": (uuid.UUID(int=1),)},
+    )
+
+    data = serialize(item)
+    print(data)
+    assert data == {
+        "id": 1,
+        "price": 2.5,
+        "color": "red",
+        "at": "2020-01-02T03:04:05",
+        "tags": [{"name": "a", "created": "2020-01-02"}],
+        "dims": [1, 2.0],
+        "sizes": ["green"],
+        "labels": ["x"],
+        "by_name": {"a": {"name": "a", "created": "2020-01-02"}},
+        "value": "green",
+        "parent": {
+            **serialize(make_item()),
+            "value": {"name": "a", "created": "2020-01-02"},
+        },
+        "anything": {
+            "when": "2021-01-01",
+            "ids": ["00000000-0000-0000-0000-000000000001"],
+        },
+    }
+    compile_validator(Item)(data)
+
+    assert json.loads(serialize.dumps(item)) == data
+    assert compile_serializer(Item) is serialize
+
+
+def test_compile_serializer_union_dispatch():
+    serialize = compile_serializer(Item)
+
+    assert serialize(make_item(value=1))["value"] == 1
+    assert serialize(make_item(value=None))["value"] is None
+    tag = Tag("b", datetime.date(2020, 1, 1))
+    assert serialize(make_item(value=tag))["value"] == {
+        "name": "b",
+        "created": "2020-01-01",
+    }
+
+
+def test_compile_serializer_custom_handler():
+    @dataclasses.dataclass
+    class DC:
+        id: uuid.UUID  # noqa: A003
+
+    registry = serializer_handlers.copy()
+    registry.register(uuid.UUID, lambda compiler, type_, x: f"{x}.hex")
+
+    assert compile_serializer(DC, registry=registry)(DC(uuid.UUID(int=1))) == {
+        "id": "00000000000000000000000000000001"
+    }
+    # without a handler, values are converted at runtime
+    assert compile_serializer(DC)(DC(uuid.UUID(int=1))) == {
+        "id": "00000000-0000-0000-0000-000000000001"
+    }
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import gzip
+import http.client
+import json
+import threading
+import urllib.parse
+
+import pytest
+
+from dc_schema.serve import INDEX, SchemaRegistry, make_server
+
+
+@pytest.fixture()
+def server(package):
+    server = make_server(SchemaRegistry.from_package("scanpkg"), port=0, quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _get(server, path, method="GET", **headers):
+    connection = http.client.HTTPConnection(*server.server_address[:2])
+    try:
+        connection.request(method, path, headers=headers)
+        response = connection.getresponse()
+        return response, response.read()
+    finally:
+        connection.close()
+
+
+def test_schema_registry(package):
+    registry = SchemaRegistry.from_package("scanpkg")
+
+    assert set(registry.documents) == {
+        INDEX,
+        "scanpkg.common.Money.json",
+        "scanpkg.models.Customer.json",
+        "scanpkg.models.Order.json",
+    }
+    order = registry.schemas["scanpkg.models.Order.json"]
+    assert order["properties"]["total"] == {
+        "allOf": [{"$ref": "scanpkg.common.Money.json"}]
+    }
+    assert "$defs" not in order
+    money = registry.schemas["scanpkg.common.Money.json"]
+    assert list(money["$defs"]) == ["Currency"]
+    assert json.loads(registry.documents[INDEX].encoded.compact) == {
+        "scanpkg.common:Money": "scanpkg.common.Money.json",
+        "scanpkg.models:Customer": "scanpkg.models.Customer.json",
+        "scanpkg.models:Order": "scanpkg.models.Order.json",
+    }
+
+
+def test_serve(server):
+    response, body = _get(server, "/scanpkg.models.Order.json")
+    assert response.status == 200
+    assert response.getheader("Content-Type") == "application/schema+json"
+    assert response.getheader("Content-Encoding") is None
+    order = json.loads(body)
+    assert order["title"] == "Order"
+    etag = response.getheader("ETag")
+
+    # relative $refs resolve against the URL of the document
+    ref = order["properties"]["total"]["allOf"][0]["$ref"]
+    _, body = _get(server, urllib.parse.urljoin("/scanpkg.models.Order.json", ref))
+    assert json.loads(body)["title"] == "Money"
+
+    response, body = _get(
+        server, "/scanpkg.models.Order.json", **{"Accept-Encoding": "br, gzip"}
+    )
+    assert response.getheader("Content-Encoding") == "gzip"
+    assert json.loads(gzip.decompress(body)) == order
+    gzip_etag = response.getheader("ETag")
+    assert gzip_etag != etag
+
+    for tag in (etag, gzip_etag, f'"other", W/{etag}', "*"):
+        response, body = _get(
+            server, "/scanpkg.models.Order.json", **{"If-None-Match": tag}
+        )
+        assert response.status == 304
+        assert body == b""
+    response, _ = _get(server, "/scanpkg.models.Order.json", **{"If-None-Match": '"x"'})
+    assert response.status == 200
+
+    response, body = _get(server, "/scanpkg.models.Order.json", method="HEAD")
+    assert response.status == 200
+    assert int(response.getheader("Content-Length")) > 0
+    assert body == b""
+
+    response, body = _get(server, "/")
+    assert "scanpkg.models:Order" in json.loads(body)
+    response, _ = _get(server, "/missing.json")
+    assert response.status == 404
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import pytest
+
+from dc_schema.cli import main
+from dc_schema.stream import LineError, validate_stream
+from tests.test_serializer import Tag
+
+LINES = [
+    '{"name": "a", "created": "2020-01-02"}\n',
+    "\n",
+    '{"name": 1, "created": "2020-01-02"}\n',
+    '{"name": "a"\n',
+    '{"name": "a", "created": "2020-01-02"}\n',
+    "{}\n",
+]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_validate_stream(workers):
+    errors = list(validate_stream(LINES * 3, Tag, workers=workers, chunk_size=4))
+
+    assert [(e.line, e.path) for e in errors[:4]] == [
+        (3, ("name",)),
+        (4, ()),
+        (6, ()),
+        (6, ()),
+    ]
+    assert str(errors[0]) == "line 3: name: 1 is not of type 'string'"
+    assert errors[1].message.startswith("Invalid JSON: ")
+    assert str(errors[2]) == "line 6: 'name' is a required property"
+    assert [e.line for e in errors[4:]] == [9, 10, 12, 12, 15, 16, 18, 18]
+
+
+def test_validate_stream_bytes():
+    lines = [line.encode() for line in LINES[:3]]
+    assert list(validate_stream(lines, Tag, workers=1)) == [
+        LineError(3, "1 is not of type 'string'", ("name",))
+    ]
+
+
+def test_validate_stream_constants():
+    schema = {"properties": {"a": {"type": "number", "multipleOf": 0.5}}}
+    lines = ['{"a": Infinity}\n', '{"a": NaN}\n', '{"a": 1.25}\n']
+    errors = list(validate_stream(lines, schema, workers=1))
+    assert [(e.line, e.message) for e in errors] == [
+        (1, "Invalid JSON: Infinity is not valid JSON"),
+        (2, "Invalid JSON: NaN is not valid JSON"),
+        (3, "1.25 is not a multiple of 0.5"),
+    ]
+
+
+def test_validate_stream_interleaved():
+    tags = validate_stream(LINES, Tag, workers=1, chunk_size=1)
+    names = validate_stream(['{"a": 1}\n', "[]\n"], {"type": "object"}, workers=1)
+    assert next(tags).line == 3
+    assert next(names) == LineError(2, "[] is not of type 'object'")
+    assert [e.line for e in tags] == [4, 6, 6]
+
+
+def test_validate_command(tmp_path, capsys):
+    path = tmp_path / "tags.ndjson"
+    path.write_text("".join(LINES))
+
+    assert main(["validate", "tests.test_serializer:Tag", str(path), "-j", "1"]) == 1
+    out, err = capsys.readouterr()
+    assert out.splitlines()[0] == "line 3: name: 1 is not of type 'string'"
+    assert len(out.splitlines()) == 4
+    assert err.startswith("4 errors in 6 lines")
+
+    path.write_text(LINES[0])
+    assert main(["validate", "tests.test_serializer:Tag", str(path)]) == 0
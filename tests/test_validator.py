@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import dataclasses
+import enum
+import typing as t
+
+import pytest
+from jsonschema.validators import Draft202012Validator
+
+from dc_schema import SchemaAnnotation, get_schema
+from dc_schema.validator import ValidationError, compile_validator
+
+
+class Color(enum.Enum):
+    RED = "red"
+    GREEN = "green"
+
+
+@dataclasses.dataclass
+class Tag:
+    name: t.Annotated[str, SchemaAnnotation(min_length=1, pattern=r"^[a-z]+$")]
+
+
+@dataclasses.dataclass
+class Item:
+    id: t.Annotated[int, SchemaAnnotation(minimum=1)]  # noqa: A003
+    price: t.Annotated[float, SchemaAnnotation(exclusive_minimum=0, multiple_of=0.5)]
+    color: Color
+    tags: t.Annotated[list[Tag], SchemaAnnotation(max_items=2)]
+    size: t.Literal["s", "m", "l", 1] = "m"
+    parent: t.Optional[Item] = None
+    dims: tuple[int, int] = (0, 0)
+    extra: t.Annotated[
+        dict[str, t.Union[int, str]],
+        SchemaAnnotation(
+            additional_properties=False,
+            pattern_properties={"^i_": {"type": "integer"}, "^s_": {"type": "string"}},
+        ),
+    ] = dataclasses.field(default_factory=dict)
+    labels: t.Annotated[set[str], SchemaAnnotation(min_items=0)] = dataclasses.field(
+        default_factory=set
+    )
+    anything: t.Any = None
+
+    class SchemaConfig:
+        annotation = SchemaAnnotation(additional_properties=False)
+
+
+VALID = {
+    "id": 1,
+    "price": 9.5,
+    "color": "red",
+    "tags": [{"name": "a"}],
+    "size": 1,
+    "parent": {"id": 2, "price": 1, "color": "green", "tags": []},
+    "dims": [1, 2],
+    "extra": {"i_a": 1, "s_b": "x"},
+    "labels": ["a", "b"],
+    "anything": {"x": [1]},
+}
+
+PAYLOADS: list[t.Any] = [
+    VALID,
+    {**VALID, "id": 0},
+    {**VALID, "id": 1.0},
+    {**VALID, "id": True},
+    {**VALID, "id": "1"},
+    {**VALID, "price": 0},
+    {**VALID, "price": 9.3},
+    {**VALID, "color": "blue"},
+    {**VALID, "tags": [{"name": ""}]},
+    {**VALID, "tags": [{"name": "A"}]},
+    {**VALID, "tags": [{"name": "a"}, {"name": "b"}, {"name": "c"}]},
+    {**VALID, "tags": [{}]},
+    {**VALID, "size": True},
+    {**VALID, "size": "xl"},
+    {**VALID, "parent": {"id": 2}},
+    {**VALID, "parent": {**VALID, "parent": {**VALID, "color": 1}}},
+    {**VALID, "dims": [1]},
+    {**VALID, "dims": [1, "2"]},
+    {**VALID, "extra": {"i_a": "1"}},
+    {**VALID, "extra": {"x": 1}},
+    {**VALID, "labels": ["a", "a"]},
+    {**VALID, "unknown": 1},
+    {k: v for k, v in VALID.items() if k != "color"},
+    [],
+    None,
+]
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_compile_validator_agrees_with_jsonschema(payload):
+    validator = compile_validator(Item)
+    expected = Draft202012Validator(get_schema(Item)).is_valid(payload)
+
+    assert validator.is_valid(payload) == expected
+    assert (not validator.errors(payload)) == expected
+    if not expected:
+        with pytest.raises(ValidationError):
+            validator(payload)
+
+
+def test_compile_validator_errors():
+    validator = compile_validator(Item)
+    payload = {
+        **VALID,
+        "id": 0,
+        "tags": [{"name": "a"}, {"name": "B"}],
+        "parent": {**VALID, "color": "blue"},
+        "unknown": 1,
+    }
+
+    with pytest.raises(ValidationError) as exc_info:
+        validator(payload)
+    assert exc_info.value.path == ("id",)
+    assert str(exc_info.value) == "id: 0 is less than the minimum of 1"
+
+    errors = validator.errors(payload)
+    assert [(e.path, e.message) for e in errors] == [
+        (("id",), "0 is less than the minimum of 1"),
+        (("tags", 1, "name"), "'B' does not match '^[a-z]+$'"),
+        (("parent", "color"), "'blue' is not one of ['red', 'green']"),
+        ((), "Additional properties are not allowed ('unknown' was unexpected)"),
+    ]
+
+
+def test_compile_validator_from_schema():
+    validator = compile_validator({"type": "array", "items": {"type": "integer"}})
+
+    validator([1, 2])
+    assert [e.path for e in validator.errors([1, "a", None])] == [(1,), (2,)]
+
+
+def test_compile_validator_deep_nesting():
+    type_ = int
+    for _ in range(30):
+        type_ = list[dict[str, type_]]
+    DC = dataclasses.make_dataclass("DC", [("a", type_)])
+    validator = compile_validator(DC)
+
+    valid, invalid = 1, "1"
+    for _ in range(30):
+        valid, invalid = [{"b": valid}], [{"b": invalid}]
+    validator({"a": valid})
+    assert [e.path for e in validator.errors({"a": invalid})] == [("a", *[0, "b"] * 30)]
+    assert Draft202012Validator(get_schema(DC)).is_valid({"a": valid})
+
+
+def test_compile_validator_multiple_of_overflow():
+    schema = {"type": "number", "multipleOf": 0.5}
+    validator = compile_validator(schema)
+    for value in (1e308, 1.25e308, 3, 3.5, 3.25):
+        assert validator.is_valid(value) == Draft202012Validator(schema).is_valid(
+            value
+        ), value
+    assert validator.is_valid(1e308)
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import json
+import os
+
+from dc_schema.watch import Watcher
+
+MONEY = "scanpkg.common:Money"
+ORDER = "scanpkg.models:Order"
+CUSTOMER = "scanpkg.models:Customer"
+
+
+def _edit(path, old, new):
+    st = os.stat(path)
+    text = path.read_text()
+    assert old in text
+    path.write_text(text.replace(old, new))
+    # make the change visible even on file systems with a coarse mtime
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_watch(package, tmp_path):
+    out = tmp_path / "out"
+    watcher = Watcher("scanpkg", out)
+
+    result = watcher.update()
+    assert result.error is None
+    assert result.regenerated == result.written == [MONEY, CUSTOMER, ORDER]
+    assert watcher.depends[ORDER] == {ORDER, MONEY, "scanpkg.common:Currency"}
+    assert watcher.update().changed == []
+
+    # a changed enum regenerates the dataclasses using it
+    customer_mtime = os.stat(out / "scanpkg.models.Customer.json").st_mtime_ns
+    _edit(package / "common.py", 'USD = "USD"', 'USD = "USD"\n    GBP = "GBP"')
+    result = watcher.update()
+    assert result.changed == [str(package / "common.py")]
+    assert result.regenerated == result.written == [MONEY, ORDER]
+    order = json.loads((out / "scanpkg.models.Order.json").read_text())
+    assert order["$defs"]["Currency"]["enum"] == ["EUR", "USD", "GBP"]
+    assert os.stat(out / "scanpkg.models.Customer.json").st_mtime_ns == customer_mtime
+
+    # changes outside of class definitions regenerate nothing
+    _edit(package / "models.py", "import dataclasses", "import dataclasses  # x")
+    result = watcher.update()
+    assert result.regenerated == result.written == []
+
+    # a schema that comes out the same is not written
+    _edit(package / "models.py", "    id: int", "    # the order id\n    id: int")
+    result = watcher.update()
+    assert result.regenerated == [ORDER]
+    assert result.written == []
+
+    # annotations imported from another module
+    (package / "constraints.py").write_text(
+        "from dc_schema import SchemaAnnotation\n\n"
+        "POSITIVE = SchemaAnnotation(minimum=0)\n"
+    )
+    _edit(
+        package / "common.py",
+        "    amount: float",
+        "    amount: t.Annotated[float, POSITIVE]",
+    )
+    _edit(
+        package / "common.py",
+        "import enum",
+        "import enum\nimport typing as t\n\nfrom scanpkg.constraints import POSITIVE",
+    )
+    assert watcher.update().written == [MONEY, ORDER]
+    _edit(package / "constraints.py", "minimum=0", "minimum=1")
+    result = watcher.update()
+    assert result.changed == [str(package / "constraints.py")]
+    assert result.written == [MONEY, ORDER]
+    money = json.loads((out / "scanpkg.common.Money.json").read_text())
+    assert money["properties"]["amount"]["minimum"] == 1
+
+    # errors are reported and retried on the next change
+    _edit(package / "models.py", "class Customer:", "class Customer")
+    result = watcher.update()
+    assert result.error.startswith("SyntaxError")
+    assert result.written == []
+    _edit(package / "models.py", "class Customer", "class Customer:")
+    assert watcher.update().error is None
+
+    # removed dataclasses have their file removed
+    _edit(
+        package / "models.py",
+        "@dataclasses.dataclass\nclass Customer:",
+        "class Customer:",
+    )
+    result = watcher.update()
+    assert result.removed == [CUSTOMER]
+    assert not (out / "scanpkg.models.Customer.json").exists()
+
+
+def test_watch_base_class(package, tmp_path):
+    (package / "base.py").write_text(
+        "import dataclasses\n\n\n@dataclasses.dataclass\nclass Base:\n    x: int\n"
+    )
+    (package / "child.py").write_text(
+        "import dataclasses\n\nfrom scanpkg.base import Base\n\n\n"
+        "@dataclasses.dataclass\nclass Child(Base):\n    y: str\n"
+    )
+    out = tmp_path / "out"
+    watcher = Watcher("scanpkg", out)
+    watcher.update()
+
+    # a changed base class in another module regenerates its subclasses
+    _edit(package / "base.py", "x: int", "x: str")
+    result = watcher.update()
+    assert result.written == ["scanpkg.base:Base", "scanpkg.child:Child"]
+    child = json.loads((out / "scanpkg.child.Child.json").read_text())
+    assert child["properties"]["x"] == {"type": "string"}